@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+"""
+账户数据缓存 - 按条目数和字节数限制大小的 LRU 缓存，超过硬过期时间的条目自动淘汰
+长时间运行、监控地址不断轮换时内存保持稳定
+"""
+import json
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from typing import Callable, Dict, Iterable, List, Optional
+
+
+class AccountCache:
+    """有界的账户数据缓存（线程安全）
+
+    条目格式与 PositionManager 一致：{'data': {...}, 'timestamp': float, 'fills': [...]}。
+    超过条目数或字节预算时淘汰最久未使用的地址；条目大小 = 账户数据大小 + 待对账成交数 × FILL_BYTES，
+    账户数据大小按序列化后的长度估算，只在写入新快照时计算，成交增量更新沿用上一次的大小
+    """
+
+    # 每笔待对账成交的估算大小（字节）
+    FILL_BYTES = 300
+
+    def __init__(
+        self,
+        max_entries: int = 5000,
+        max_bytes: int = 256 * 1024 * 1024,
+        ttl: Optional[float] = None,
+        on_evict: Optional[Callable[[str], None]] = None
+    ):
+        """
+        Args:
+            max_entries: 最大地址数
+            max_bytes: 最大总字节数（估算值）
+            ttl: 条目的最长保留时间（秒，按写入快照的时间计算），为空时不按时间淘汰
+            on_evict: 地址被淘汰后的回调 on_evict(address)，用于清理相关状态
+        """
+        self.max_entries = max(1, max_entries)
+        self.max_bytes = max(1, max_bytes)
+        self.ttl = ttl
+        self.on_evict = on_evict
+
+        self._lock = threading.RLock()
+        self._entries: "OrderedDict[str, Dict]" = OrderedDict()
+        self._sizes: Dict[str, int] = {}
+        # {address: 账户数据的估算大小}（不含待对账成交）
+        self._data_sizes: Dict[str, int] = {}
+        self._bytes = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions: Dict[str, int] = defaultdict(int)
+
+    def __contains__(self, address: str) -> bool:
+        return self.peek(address) is not None
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, address: str) -> Optional[Dict]:
+        """读取条目（计入命中率，并标记为最近使用）"""
+        with self._lock:
+            entry = self._live_entry(address)
+            self._record_lookup(address, entry is not None)
+            return entry
+
+    def touch(self, address: str, hit: bool):
+        """记录一次在缓存之外完成的读取（如从版本化快照读取）：计入命中率，命中时标记为最近使用"""
+        with self._lock:
+            self._record_lookup(address, hit and address in self._entries)
+
+    def peek(self, address: str) -> Optional[Dict]:
+        """读取条目（不计入命中率，不改变使用顺序）"""
+        with self._lock:
+            return self._live_entry(address)
+
+    def __getitem__(self, address: str) -> Dict:
+        entry = self.peek(address)
+        if entry is None:
+            raise KeyError(address)
+        return entry
+
+    def __setitem__(self, address: str, entry: Dict):
+        self.put(address, entry, self.estimate_data_size(entry.get('data')))
+
+    def put(self, address: str, entry: Dict, data_size: Optional[int] = None):
+        """写入条目
+
+        Args:
+            address: 用户地址
+            entry: 缓存条目
+            data_size: 账户数据的估算大小（见 estimate_data_size）；为空表示增量更新，
+                沿用该地址上一次的大小（地址不在缓存中时重新估算）
+        """
+        if data_size is None:
+            data_size = self._data_sizes.get(address)
+            if data_size is None:
+                data_size = self.estimate_data_size(entry.get('data'))
+        size = data_size + len(entry.get('fills') or []) * self.FILL_BYTES
+        evicted = []
+        with self._lock:
+            self._data_sizes[address] = data_size
+            self._bytes += size - self._sizes.get(address, 0)
+            self._sizes[address] = size
+            self._entries[address] = entry
+            self._entries.move_to_end(address)
+
+            while len(self._entries) > self.max_entries:
+                evicted.append(self._evict_oldest('lru'))
+            while self._bytes > self.max_bytes and len(self._entries) > 1:
+                evicted.append(self._evict_oldest('bytes'))
+        self._notify(evicted)
+
+    def pop(self, address: str, reason: str = 'removed') -> Optional[Dict]:
+        """移除地址"""
+        with self._lock:
+            entry = self._remove(address)
+            if entry is not None:
+                self.evictions[reason] += 1
+        if entry is not None:
+            self._notify([address])
+        return entry
+
+    def retain(self, addresses: Iterable[str]) -> List[str]:
+        """只保留指定地址，淘汰其他地址（不再监控的地址）
+
+        Returns:
+            被淘汰的地址
+        """
+        keep = set(addresses)
+        with self._lock:
+            evicted = [address for address in self._entries if address not in keep]
+            for address in evicted:
+                self._remove(address)
+                self.evictions['unmonitored'] += 1
+        self._notify(evicted)
+        return evicted
+
+    def prune(self) -> List[str]:
+        """淘汰超过 ttl 的条目
+
+        Returns:
+            被淘汰的地址
+        """
+        if self.ttl is None:
+            return []
+        cutoff = time.time() - self.ttl
+        with self._lock:
+            evicted = [a for a, e in self._entries.items() if e['timestamp'] < cutoff]
+            for address in evicted:
+                self._remove(address)
+                self.evictions['ttl'] += 1
+        self._notify(evicted)
+        return evicted
+
+    def stats(self) -> Dict:
+        """缓存统计：条目数、估算字节数、命中率、按原因统计的淘汰数"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_entries': self.max_entries,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': self.hits / lookups if lookups else 0.0,
+                'evictions': dict(self.evictions),
+            }
+
+    def format(self) -> str:
+        """单行文本，用于日志输出"""
+        s = self.stats()
+        evictions = ", ".join(f"{k}={v}" for k, v in sorted(s['evictions'].items())) or "0"
+        return (
+            f"{s['entries']}/{s['max_entries']} 个地址 | {s['bytes'] / 1024 / 1024:.1f}MB | "
+            f"命中率 {s['hit_ratio']:.1%} ({s['hits']}/{s['hits'] + s['misses']}) | 淘汰 {evictions}"
+        )
+
+    def _live_entry(self, address: str) -> Optional[Dict]:
+        """未超过 ttl 的条目（调用方需持有锁）；超过 ttl 的条目视为不存在，由 prune 移除"""
+        entry = self._entries.get(address)
+        if entry is None:
+            return None
+        if self.ttl is not None and time.time() - entry['timestamp'] >= self.ttl:
+            return None
+        return entry
+
+    def _record_lookup(self, address: str, hit: bool):
+        """计入命中率（调用方需持有锁）"""
+        if hit:
+            self.hits += 1
+            self._entries.move_to_end(address)
+        else:
+            self.misses += 1
+
+    def _evict_oldest(self, reason: str) -> str:
+        address = next(iter(self._entries))
+        self._remove(address)
+        self.evictions[reason] += 1
+        return address
+
+    def _remove(self, address: str) -> Optional[Dict]:
+        entry = self._entries.pop(address, None)
+        self._bytes -= self._sizes.pop(address, 0)
+        self._data_sizes.pop(address, None)
+        return entry
+
+    def _notify(self, addresses: List[str]):
+        if self.on_evict is None:
+            return
+        for address in addresses:
+            self.on_evict(address)
+
+    @staticmethod
+    def estimate_data_size(data: Optional[Dict]) -> int:
+        """账户数据的估算大小（序列化后的长度，O(账户大小)，每个快照只应计算一次）"""
+        try:
+            return len(json.dumps(data, default=str))
+        except (TypeError, ValueError):
+            return 0
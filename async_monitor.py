@@ -0,0 +1,353 @@
+#!/usr/bin/env python3
+"""
+监控Hyperliquid大户交易活动 (asyncio模式)
+单个事件循环处理WebSocket帧、REST刷新、断线重连和交易通知，不再依赖SDK回调线程
+"""
+import asyncio
+import logging
+import time
+from typing import Dict, List, Optional
+
+import aiohttp
+
+from monitor_utils import Config
+from monitor_whales import WhaleMonitor
+from reconnect_supervisor import AddressState, compute_backoff
+from price_board import ALL_MIDS_SUBSCRIPTION, parse_all_mids
+from ws_pool import ConnectionHealth, api_url_to_ws_url, build_subscription, parse_ws_message
+
+
+class AsyncWhaleMonitor(WhaleMonitor):
+    """大户监控器 (asyncio模式)
+
+    与 WhaleMonitor 共用持仓追踪、交易识别和通知格式，
+    连接、心跳、重连、定期刷新和通知都以协程运行在同一个事件循环中
+    """
+
+    use_position_service = False
+
+    def __init__(self, addresses: List[str], config: Config):
+        super().__init__(addresses, config)
+
+        self.subscriptions_per_connection = max(
+            1, config.get('websocket', 'subscriptions_per_connection', default=50)
+        )
+        self.max_reconnect_attempts = config.get('websocket', 'max_reconnect_attempts', default=0)
+        self.ping_interval = config.get('websocket', 'ping_interval', default=20)
+        self.ping_timeout = config.get('websocket', 'ping_timeout', default=10)
+
+        # {address.lower(): address}，服务端推送的地址为小写
+        self._canonical = {addr.lower(): addr for addr in self.addresses}
+
+        # 以下对象都属于 run() 所在的事件循环，在 run() 中创建
+        self.session: Optional[aiohttp.ClientSession] = None
+        self.notify_queue: Optional[asyncio.Queue] = None
+        self.reconnect_slots: Optional[asyncio.Semaphore] = None
+        # {address: AddressState}
+        self.address_states: Dict[str, AddressState] = {}
+
+    def start_monitoring(self):
+        """开始监控（阻塞直到停止）"""
+        if not self.sdk_available:
+            logging.error("SDK不可用，无法启动监控")
+            return
+
+        self.running = True
+        self._start_recorder()
+        try:
+            asyncio.run(self.run())
+        except KeyboardInterrupt:
+            logging.info("\n收到停止信号，正在关闭...")
+        finally:
+            self.running = False
+            self._stop_recorder()
+            logging.info("监控已停止")
+
+    async def run(self):
+        """监控主协程"""
+        print(f"\n{'='*80}")
+        print(f"开始监控 {len(self.addresses)} 个大户地址 (asyncio模式)")
+        print(f"{'='*80}\n")
+
+        for i, addr in enumerate(self.addresses, 1):
+            print(f"{i}. {addr}")
+
+        print(f"\n{'='*80}")
+        print("正在获取用户初始仓位信息...")
+        print(f"{'='*80}\n")
+
+        # 初始数据与后续刷新共用同一个事件循环
+        all_account_data = await self._load_initial_account_data()
+        self._init_tracker_positions(all_account_data)
+
+        # 以订阅开始时间作为成交水位线的起点，之后断线的地址从水位线开始补齐
+        start_ms = int(time.time() * 1000)
+        for address in self.addresses:
+            self.fill_watermarks.touch(address, start_ms)
+
+        self.notify_queue = asyncio.Queue()
+        # 限制同时进行的连接/重连数量，网络抖动时不会同时冲击API
+        self.reconnect_slots = asyncio.Semaphore(max(1, self.max_concurrent_reconnects))
+        self.session = aiohttp.ClientSession()
+
+        url = api_url_to_ws_url(self.base_url)
+        n = self.subscriptions_per_connection
+        groups = [self.addresses[i:i + n] for i in range(0, len(self.addresses), n)]
+
+        background_tasks = [
+            asyncio.create_task(self._periodic_data_update()),
+            asyncio.create_task(self._notification_worker()),
+            asyncio.create_task(self._load_pnl_histories()),
+            asyncio.create_task(self._status_loop()),
+        ]
+        if self.price_board is not None:
+            background_tasks.append(asyncio.create_task(self._mids_loop(url)))
+        connection_tasks = [
+            asyncio.create_task(self._connection_loop(conn_id, url, group))
+            for conn_id, group in enumerate(groups, 1)
+        ]
+        logging.info(f"✅ 已启动 {len(connection_tasks)} 条WebSocket连接 (每条最多 {n} 个订阅)")
+
+        print(f"🎯 监控中... (按Ctrl+C停止)\n")
+
+        try:
+            await asyncio.gather(*connection_tasks)
+            logging.error("所有连接均已停止重连，退出...")
+        finally:
+            self.running = False
+            all_tasks = background_tasks + connection_tasks
+            for task in all_tasks:
+                task.cancel()
+            await asyncio.gather(*all_tasks, return_exceptions=True)
+            await self.session.close()
+            await self.position_manager.close()
+
+    async def _connection_loop(self, conn_id: int, url: str, addresses: List[str]):
+        """单条连接的生命周期：连接、订阅、读取，断开后指数退避重连
+
+        Args:
+            conn_id: 连接编号
+            url: WebSocket地址
+            addresses: 该连接承载的地址
+        """
+        attempt = 0
+
+        while self.running:
+            try:
+                async with self.reconnect_slots:
+                    if attempt > 0:
+                        self._set_state(addresses, AddressState.RECONNECTING)
+                    ws = await self.session.ws_connect(url)
+                    try:
+                        for address in addresses:
+                            await self.subscribe_limiter.acquire_async()
+                            await ws.send_json({"method": "subscribe", "subscription": build_subscription(address)})
+                    except Exception:
+                        await ws.close()
+                        raise
+
+                async with ws:
+                    self._set_state(addresses, AddressState.CONNECTED)
+                    if attempt > 0:
+                        logging.info(f"✅ 连接 #{conn_id} 重连成功 ({len(addresses)} 个地址)")
+                        # 订阅已恢复，补齐断线期间（截至此刻）遗漏的成交
+                        asyncio.create_task(self._backfill_async(addresses, int(time.time() * 1000)))
+                    else:
+                        logging.info(f"✅ 连接 #{conn_id} 订阅成功 ({len(addresses)} 个地址)")
+                    attempt = 0
+
+                    health = ConnectionHealth(self.ping_interval, self.ping_timeout)
+                    ping_task = asyncio.create_task(self._ping_loop(ws, health))
+                    try:
+                        while True:
+                            try:
+                                # 心跳按 ping_interval 发送，超过 stale_after 仍无任何消息即为僵尸连接
+                                msg = await ws.receive(timeout=health.stale_after)
+                            except asyncio.TimeoutError:
+                                logging.warning(
+                                    f"🧟 连接 #{conn_id} 已 {health.silence():.1f} 秒无消息，"
+                                    f"判定为僵尸连接，强制重连"
+                                )
+                                break
+
+                            health.mark_message()
+                            if msg.type == aiohttp.WSMsgType.TEXT:
+                                self._on_frame(msg.data)
+                            elif msg.type in (
+                                aiohttp.WSMsgType.CLOSE,
+                                aiohttp.WSMsgType.CLOSING,
+                                aiohttp.WSMsgType.CLOSED,
+                                aiohttp.WSMsgType.ERROR,
+                            ):
+                                break
+                    finally:
+                        ping_task.cancel()
+
+                logging.warning(f"⚠️  连接 #{conn_id} 已断开")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logging.warning(f"⚠️  连接 #{conn_id} 出错: {e}")
+
+            if not self.running:
+                break
+
+            # 检查是否超过最大重连次数
+            if self.max_reconnect_attempts > 0 and attempt >= self.max_reconnect_attempts:
+                self._set_state(addresses, AddressState.FAILED)
+                logging.error(
+                    f"❌ 连接 #{conn_id} 已达到最大重连次数 ({self.max_reconnect_attempts})，停止重连"
+                )
+                return
+
+            # 指数退避 + 随机抖动
+            self._set_state(addresses, AddressState.BACKING_OFF)
+            sleep_time = compute_backoff(attempt, self.reconnect_delay, self.max_reconnect_delay)
+            attempt += 1
+
+            logging.warning(f"⚠️  连接 #{conn_id} 将在 {sleep_time:.2f} 秒后尝试重连 (第 {attempt} 次)...")
+            await asyncio.sleep(sleep_time)
+
+    async def _backfill_async(self, addresses: List[str], until_ms: int):
+        """补齐一组地址断线期间遗漏的成交
+
+        Args:
+            addresses: 地址列表
+            until_ms: 补齐的结束时间（毫秒）
+        """
+        for address in addresses:
+            missed = await asyncio.to_thread(self._fetch_missed_fills, address, until_ms)
+            self._apply_backfill(address, missed)
+
+    def _set_state(self, addresses: List[str], state: AddressState):
+        """更新一组地址的连接状态"""
+        for address in addresses:
+            self.address_states[address] = state
+
+    def state_counts(self) -> Dict[str, int]:
+        """各状态的地址数量"""
+        counts = {state.value: 0 for state in AddressState}
+        for state in self.address_states.values():
+            counts[state.value] += 1
+        return counts
+
+    async def _status_loop(self):
+        """每10秒检查一次连接状态，有地址未连接时输出各状态的地址数"""
+        while self.running:
+            await asyncio.sleep(10)
+            counts = self.state_counts()
+            if counts['connected'] < len(self.addresses):
+                logging.info(
+                    f"🔌 连接状态: 已连接 {counts['connected']} | 退避中 {counts['backing_off']} | "
+                    f"重连中 {counts['reconnecting']} | 已放弃 {counts['failed']}"
+                )
+
+    async def _mids_loop(self, url: str):
+        """allMids 行情订阅：写入价格看板，断开后指数退避重连"""
+        attempt = 0
+        while self.running:
+            try:
+                async with self.session.ws_connect(url, heartbeat=None) as ws:
+                    await ws.send_json(ALL_MIDS_SUBSCRIPTION)
+                    logging.info("📈 已订阅 allMids 行情")
+                    attempt = 0
+                    health = ConnectionHealth(self.ping_interval, self.ping_timeout)
+                    ping_task = asyncio.create_task(self._ping_loop(ws, health))
+                    try:
+                        while True:
+                            try:
+                                msg = await ws.receive(timeout=health.stale_after)
+                            except asyncio.TimeoutError:
+                                logging.warning(
+                                    f"🧟 行情连接已 {health.silence():.1f} 秒无消息，判定为僵尸连接，强制重连"
+                                )
+                                break
+                            if msg.type != aiohttp.WSMsgType.TEXT:
+                                break
+                            health.mark_message()
+                            mids = parse_all_mids(msg.data)
+                            if mids:
+                                self.price_board.update_prices(mids)
+                    finally:
+                        ping_task.cancel()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logging.warning(f"⚠️  行情连接出错: {e}")
+
+            if not self.running:
+                break
+            delay = compute_backoff(attempt, self.reconnect_delay, self.max_reconnect_delay)
+            attempt += 1
+            logging.warning(f"⚠️  行情连接断开，{delay:.1f}秒后重连...")
+            await asyncio.sleep(delay)
+
+    async def _ping_loop(self, ws: aiohttp.ClientWebSocketResponse, health: ConnectionHealth):
+        """应用层心跳"""
+        while not ws.closed:
+            await asyncio.sleep(health.ping_interval)
+            try:
+                await ws.send_json({"method": "ping"})
+                health.mark_ping()
+            except Exception as e:
+                logging.debug(f"发送心跳失败: {e}")
+                return
+
+    def _on_frame(self, raw: str):
+        """处理一帧WebSocket消息（在事件循环中同步执行）"""
+        if self.recorder:
+            self.recorder.record(raw)
+
+        parsed = self._parse_frame(raw)
+        if parsed is None:
+            return
+
+        address, event = parsed
+        try:
+            self._handle_user_event(address, event)
+        except Exception as e:
+            logging.error(f"处理 {address[:10]}... 的事件失败: {e}", exc_info=True)
+
+    def _parse_frame(self, raw: str) -> Optional[tuple]:
+        """解析原始帧为 (地址, 事件)，非成交消息返回 None"""
+        parsed = parse_ws_message(raw)
+        if parsed is None:
+            return None
+        user, event = parsed
+        return self._canonical.get(user, user), event
+
+    def _notify_trade(self, trade_info: Dict):
+        """交易通知放入队列，由通知协程按顺序输出"""
+        self.notify_queue.put_nowait(trade_info)
+
+    async def _notification_worker(self):
+        """按成交顺序输出交易通知"""
+        while True:
+            trade_info = await self.notify_queue.get()
+            try:
+                await self._notify_trade_async(trade_info)
+            except Exception as e:
+                logging.error(f"输出交易通知失败: {e}")
+            finally:
+                self.notify_queue.task_done()
+
+    async def _notify_trade_async(self, trade_info: Dict):
+        """获取币种名称和账户汇总后输出通知"""
+        coin = trade_info['coin']
+        if coin.startswith('@') and coin not in self.asset_name_cache:
+            # 元数据查询只在每个资产首次出现时发生一次
+            coin_name = await asyncio.to_thread(self._get_coin_name, coin)
+        else:
+            coin_name = self._get_coin_name(coin)
+
+        account_data = None
+        if self.config.get('notification', 'console', default=True):
+            try:
+                account_data = await asyncio.wait_for(
+                    self.position_manager.get_account_data_swr(trade_info['user']),
+                    timeout=5
+                )
+            except Exception as e:
+                logging.debug(f"获取账户汇总信息失败: {e}")
+
+        self._emit_trade_notification(trade_info, coin_name, account_data)
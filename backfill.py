@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+成交补齐 - 断线重连后按时间范围补回断线期间遗漏的成交
+"""
+import logging
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+
+def fill_key(fill: Dict) -> str:
+    """成交的唯一标识（优先使用 tid，其次使用 hash + oid）"""
+    tid = fill.get('tid')
+    if tid is not None:
+        return str(tid)
+    return f"{fill.get('hash')}:{fill.get('oid')}:{fill.get('time')}"
+
+
+class FillWatermarks:
+    """每个地址已处理成交的时间水位线
+
+    水位线 = 最后处理的成交时间；同一毫秒内可能有多笔成交，因此同时记录该时间点已处理的成交标识。
+    地址有成交丢失（如事件队列溢出）时冻结水位线，直到补齐完成，之后的成交不会把水位线推过丢失的成交
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # {address: 时间戳(毫秒)}
+        self._time: Dict[str, int] = {}
+        # {address: 水位线时间点上已处理的成交标识}
+        self._keys: Dict[str, set] = {}
+        # 水位线被冻结的地址
+        self._held: set = set()
+
+    def get(self, address: str) -> Optional[int]:
+        """获取地址的水位线（毫秒），没有记录返回 None"""
+        return self._time.get(address)
+
+    def touch(self, address: str, ts_ms: int):
+        """将水位线至少推进到指定时间（如订阅开始的时间）"""
+        with self._lock:
+            if ts_ms > self._time.get(address, 0):
+                self._time[address] = ts_ms
+                self._keys[address] = set()
+
+    def hold(self, address: str):
+        """冻结地址的水位线（有成交丢失，等待补齐）"""
+        with self._lock:
+            self._held.add(address)
+
+    def release(self, address: str):
+        """解除冻结（补齐已拉取）"""
+        with self._lock:
+            self._held.discard(address)
+
+    def is_held(self, address: str) -> bool:
+        with self._lock:
+            return address in self._held
+
+    def advance(self, address: str, fill: Dict):
+        """用已处理的成交推进水位线（水位线冻结时不推进）"""
+        ts = fill.get('time')
+        if ts is None:
+            return
+        with self._lock:
+            if address in self._held:
+                return
+            current = self._time.get(address, 0)
+            if ts > current:
+                self._time[address] = ts
+                self._keys[address] = {fill_key(fill)}
+            elif ts == current:
+                self._keys.setdefault(address, set()).add(fill_key(fill))
+
+    def is_processed(self, address: str, fill: Dict) -> bool:
+        """成交是否早于水位线（已处理或早于监控开始）"""
+        ts = fill.get('time')
+        if ts is None:
+            return False
+        with self._lock:
+            current = self._time.get(address)
+            if current is None or ts > current:
+                return False
+            if ts < current:
+                return True
+            return fill_key(fill) in self._keys.get(address, ())
+
+
+class FillBackfiller:
+    """按时间范围拉取用户成交（userFillsByTime），分页、去重并按时间排序"""
+
+    # userFillsByTime 单次请求最多返回的成交数
+    PAGE_LIMIT = 2000
+
+    def __init__(self, info_provider: Callable[[], object], max_window: float = 3600):
+        """
+        Args:
+            info_provider: 返回 Info 实例的函数（用于REST查询）
+            max_window: 最大补齐时间窗口（秒），断线再久也只补最近这段时间
+        """
+        self.info_provider = info_provider
+        self.max_window = max_window
+
+    def fetch(self, address: str, start_ms: int, end_ms: Optional[int] = None) -> List[Dict]:
+        """拉取时间范围内的成交
+
+        Args:
+            address: 用户地址
+            start_ms: 开始时间（毫秒，包含）
+            end_ms: 结束时间（毫秒），默认为当前时间
+
+        Returns:
+            按时间排序、去重后的成交列表
+        """
+        end_ms = end_ms or int(time.time() * 1000)
+        earliest = end_ms - int(self.max_window * 1000)
+        if start_ms < earliest:
+            logging.warning(
+                f"⚠️  {address[:10]}... 断线时间超过 {self.max_window:.0f} 秒，只补齐最近的成交"
+            )
+            start_ms = earliest
+
+        info = self.info_provider()
+        fills_by_key: Dict[str, Dict] = {}
+        cursor = start_ms
+
+        while cursor <= end_ms:
+            page = info.user_fills_by_time(address, cursor, end_ms) or []
+            for fill in page:
+                fills_by_key[fill_key(fill)] = fill
+
+            if len(page) < self.PAGE_LIMIT:
+                break
+
+            # 翻页：下一页从本页最后的成交时间开始（同一毫秒的重复成交由去重处理）
+            next_cursor = max(fill.get('time', cursor) for fill in page)
+            if next_cursor <= cursor:
+                next_cursor = cursor + 1
+            cursor = next_cursor
+
+        return sorted(fills_by_key.values(), key=lambda f: (f.get('time', 0), f.get('tid', 0)))
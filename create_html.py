@@ -4,10 +4,12 @@ HTML报告生成模块
 负责生成持仓监控的HTML报告
 """
 import logging
-from typing import Dict, List
+from typing import Dict, List, Optional
 from datetime import datetime
 from pathlib import Path
 
+from snapshot_diff import format_change
+
 
 def generate_position_table_html(address: str, account_data: Dict) -> str:
     """生成单个地址的持仓表格HTML
@@ -281,12 +283,46 @@ def generate_position_table_html(address: str, account_data: Dict) -> str:
     return html
 
 
-def generate_html_report(all_account_data: Dict[str, Dict], output_file: Path):
+def generate_changes_html(changes: List[Dict]) -> str:
+    """生成最近快照变化的HTML列表
+    
+    Args:
+        changes: SnapshotDiffer.recent() 返回的变化（新的在前）
+    
+    Returns:
+        HTML 字符串，没有变化时返回空字符串
+    """
+    if not changes:
+        return ""
+    
+    items = []
+    for change in changes:
+        detected_at = datetime.fromtimestamp(change['detected_at']).strftime('%H:%M:%S')
+        items.append(
+            f"        <li><span class=\"stat-label\">{detected_at}</span> "
+            f"{change['address']} | {format_change(change)}</li>"
+        )
+    
+    return f"""
+<!-- 最近变化 -->
+<div class="address-section">
+    <div class="address-header">
+        <h3>最近变化 (最近 {len(changes)} 条)</h3>
+    </div>
+    <ul>
+{chr(10).join(items)}
+    </ul>
+</div>
+"""
+
+
+def generate_html_report(all_account_data: Dict[str, Dict], output_file: Path, changes: Optional[List[Dict]] = None):
     """生成完整的HTML报告
     
     Args:
         all_account_data: 所有地址的账户数据
         output_file: 输出文件路径
+        changes: 最近的快照变化（显示在各地址持仓之前）
     """
     # 计算汇总统计
     total_addresses = len(all_account_data)
@@ -615,7 +651,7 @@ def generate_html_report(all_account_data: Dict[str, Dict], output_file: Path):
         address_htmls.append(address_html)
     
     # 完整HTML
-    html_content = html_header + '\n'.join(address_htmls) + "\n</body>\n</html>"
+    html_content = html_header + generate_changes_html(changes or []) + '\n'.join(address_htmls) + "\n</body>\n</html>"
     
     # 写入文件
     try:
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+成交去重 - 每个地址一个按时间窗口淘汰的有界索引
+重订阅快照、断线补齐和实时推送可能包含同一笔成交，去重后每笔成交只处理一次
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict
+
+from backfill import fill_key
+
+
+class FillDeduplicator:
+    """成交去重索引
+
+    每个地址维护一个按插入顺序排列的环（OrderedDict），超过时间窗口或数量上限的旧记录从头部淘汰，
+    查询和插入都是 O(1)，内存占用上限为 地址数 × max_per_address
+    """
+
+    def __init__(self, window: float = 3600, max_per_address: int = 10000):
+        """
+        Args:
+            window: 去重时间窗口（秒）
+            max_per_address: 每个地址最多保留的成交标识数
+        """
+        self.window = window
+        self.max_per_address = max(1, max_per_address)
+
+        self._lock = threading.Lock()
+        # {address: OrderedDict{成交标识: 记录时间}}
+        self._seen: Dict[str, OrderedDict] = {}
+        self.duplicates = 0
+
+    def add(self, address: str, fill: Dict) -> bool:
+        """记录成交
+
+        Args:
+            address: 用户地址
+            fill: 成交数据
+
+        Returns:
+            True 表示首次出现，False 表示重复成交
+        """
+        key = fill_key(fill)
+        now = time.monotonic()
+
+        with self._lock:
+            seen = self._seen.get(address)
+            if seen is None:
+                seen = self._seen[address] = OrderedDict()
+
+            self._evict(seen, now)
+
+            if key in seen:
+                self.duplicates += 1
+                return False
+
+            seen[key] = now
+            if len(seen) > self.max_per_address:
+                seen.popitem(last=False)
+            return True
+
+    def forget(self, address: str):
+        """移除地址的去重记录（地址不再监控时调用）"""
+        with self._lock:
+            self._seen.pop(address, None)
+
+    def stats(self) -> Dict:
+        """去重统计"""
+        with self._lock:
+            return {
+                'addresses': len(self._seen),
+                'entries': sum(len(seen) for seen in self._seen.values()),
+                'duplicates': self.duplicates,
+            }
+
+    def _evict(self, seen: OrderedDict, now: float):
+        """淘汰超出时间窗口的记录（调用方需持有锁）"""
+        cutoff = now - self.window
+        while seen:
+            oldest_key = next(iter(seen))
+            if seen[oldest_key] >= cutoff:
+                break
+            del seen[oldest_key]
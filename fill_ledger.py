@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+成交驱动的持仓更新 - 用成交（startPosition、sz、px、side、closedPnl）增量计算持仓
+仓位大小、加权平均入场价、已实现盈亏随成交实时更新，REST快照作为定期对账的基准
+"""
+from typing import Dict, Optional
+
+
+class UnknownEntryError(ValueError):
+    """成交之前已有仓位，但入场价未知（没有本地持仓），无法增量计算入场价和未实现盈亏"""
+
+
+def is_perp_coin(coin: Optional[str]) -> bool:
+    """是否为永续合约（现货以 @ 开头，或形如 PURR/USDC）"""
+    return bool(coin) and not coin.startswith('@') and '/' not in coin
+
+
+def apply_fill(position: Optional[Dict], fill: Dict) -> Optional[Dict]:
+    """把一笔成交应用到持仓上
+
+    Args:
+        position: 当前持仓（PositionManager.parse_position 的格式），没有持仓为 None
+        fill: 成交数据
+
+    Returns:
+        新的持仓字典（不修改传入的持仓），平仓后返回 None
+
+    Raises:
+        UnknownEntryError: 成交前的仓位不为0但没有入场价（加仓或减仓无法计算），应等待REST快照
+    """
+    size = float(fill.get('sz', 0))
+    price = float(fill.get('px', 0))
+    delta = size if fill.get('side') == 'B' else -size
+
+    start = fill.get('startPosition')
+    try:
+        start = float(start) if start is not None else None
+    except (TypeError, ValueError):
+        start = None
+    if start is None:
+        start = position['raw_szi'] if position else 0.0
+
+    new_szi = start + delta
+    if abs(new_szi) < 1e-12:
+        return None
+
+    old_entry = (position.get('entry_px') or 0.0) if position else 0.0
+    opened = abs(start) < 1e-12 or start * new_szi < 0
+    if not opened and old_entry <= 0:
+        raise UnknownEntryError(f"{fill.get('coin')} 成交前仓位 {start} 的入场价未知")
+    if opened:
+        # 开仓或反向：入场价为本次成交价
+        entry_px = price
+    elif abs(new_szi) > abs(start):
+        # 加仓：按数量加权平均
+        entry_px = (old_entry * abs(start) + price * size) / abs(new_szi)
+    else:
+        # 减仓：入场价不变
+        entry_px = old_entry
+
+    updated = dict(position) if position else {
+        'coin': fill.get('coin'),
+        'leverage': 0,
+        'cumulative_funding': 0,
+        'liquidation_px': 0,
+        'realized_pnl': 0,
+    }
+    updated.update({
+        'direction': "做多 (Long)" if new_szi > 0 else "做空 (Short)",
+        'direction_short': "Long" if new_szi > 0 else "Short",
+        'size': abs(new_szi),
+        'raw_szi': new_szi,
+        'entry_px': entry_px,
+        # 以最新成交价作为标记价格估算，下一次REST快照对账时校正
+        'position_value': abs(new_szi) * price,
+        'unrealized_pnl': (price - entry_px) * new_szi,
+        'realized_pnl': updated.get('realized_pnl', 0) + float(fill.get('closedPnl', 0)),
+        'fill_time': fill.get('time'),
+    })
+    if opened:
+        # 新仓位的爆仓价未知，等待REST快照对账
+        updated['liquidation_px'] = 0
+    return updated
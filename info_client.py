@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+"""
+/info 接口HTTP客户端 - 共享连接池（keep-alive），统计每个接口的请求延迟，
+请求前按接口权重在全局预算（WeightBudget）内等待
+- InfoHttpClient: 同步客户端（requests），接口与 SDK 的 Info 保持一致，可直接替换
+- AsyncInfoClient: 异步客户端（aiohttp），请求不占用线程
+"""
+import asyncio
+import threading
+import time
+from collections import defaultdict, deque
+from typing import Any, Dict, List, Optional, Tuple
+
+import aiohttp
+import requests
+from requests.adapters import HTTPAdapter
+
+from rate_limiter import WeightBudget
+
+
+class LatencyStats:
+    """按接口统计请求延迟（线程安全）"""
+
+    # 每个接口保留的最近延迟样本数（用于计算分位数）
+    MAX_SAMPLES = 1000
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._samples: Dict[str, deque] = defaultdict(lambda: deque(maxlen=self.MAX_SAMPLES))
+        self._counts: Dict[str, int] = defaultdict(int)
+        self._errors: Dict[str, int] = defaultdict(int)
+        self._total: Dict[str, float] = defaultdict(float)
+
+    def record(self, endpoint: str, elapsed: float, ok: bool = True):
+        """记录一次请求
+
+        Args:
+            endpoint: 接口名（/info 请求的 type）
+            elapsed: 耗时（秒）
+            ok: 请求是否成功
+        """
+        with self._lock:
+            self._samples[endpoint].append(elapsed)
+            self._counts[endpoint] += 1
+            self._total[endpoint] += elapsed
+            if not ok:
+                self._errors[endpoint] += 1
+
+    def snapshot(self) -> Dict[str, Dict]:
+        """各接口的统计：请求数、错误数、平均/分位数延迟（毫秒）"""
+        with self._lock:
+            result = {}
+            for endpoint, samples in self._samples.items():
+                ordered = sorted(samples)
+                count = self._counts[endpoint]
+
+                def pct(p):
+                    return ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))] * 1000
+
+                result[endpoint] = {
+                    'count': count,
+                    'errors': self._errors[endpoint],
+                    'avg_ms': self._total[endpoint] / count * 1000,
+                    'p50_ms': pct(50),
+                    'p95_ms': pct(95),
+                    'max_ms': ordered[-1] * 1000,
+                }
+            return result
+
+    def format(self) -> str:
+        """单行文本，用于日志输出"""
+        parts = [
+            f"{endpoint} n={s['count']} err={s['errors']} avg={s['avg_ms']:.0f}ms "
+            f"p50={s['p50_ms']:.0f}ms p95={s['p95_ms']:.0f}ms max={s['max_ms']:.0f}ms"
+            for endpoint, s in sorted(self.snapshot().items())
+        ]
+        return " | ".join(parts)
+
+
+class InfoHttpClient:
+    """共享连接池的 /info 客户端（线程安全）"""
+
+    def __init__(self, base_url: str, pool_size: int = 20, timeout: float = 10,
+                 budget: Optional[WeightBudget] = None):
+        """
+        Args:
+            base_url: API地址，如 https://api.hyperliquid.xyz
+            pool_size: 连接池大小（同一主机保持的最大keep-alive连接数）
+            timeout: 请求超时（秒）
+            budget: 全局API权重预算（为空时不限速）
+        """
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+        self.budget = budget
+        self.latency = LatencyStats()
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, pool_block=False)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.session.headers.update({"Content-Type": "application/json"})
+
+    def post(self, payload: Dict) -> Any:
+        """发送 /info 请求并记录延迟
+
+        Raises:
+            requests.RequestException: 网络错误或非2xx响应
+        """
+        endpoint = payload.get('type', 'unknown')
+        if self.budget is not None:
+            self.budget.acquire(endpoint)
+        started = time.perf_counter()
+        ok = False
+        try:
+            response = self.session.post(f"{self.base_url}/info", json=payload, timeout=self.timeout)
+            response.raise_for_status()
+            result = response.json()
+            ok = True
+            if self.budget is not None:
+                self.budget.charge_items(endpoint, result)
+            return result
+        finally:
+            self.latency.record(endpoint, time.perf_counter() - started, ok)
+
+    def user_state(self, address: str) -> Dict:
+        return self.post({"type": "clearinghouseState", "user": address})
+
+    def open_orders(self, address: str) -> List[Dict]:
+        return self.post({"type": "openOrders", "user": address})
+
+    def portfolio(self, address: str) -> List:
+        return self.post({"type": "portfolio", "user": address})
+
+    def meta(self) -> Dict:
+        return self.post({"type": "meta"})
+
+    def spot_meta(self) -> Dict:
+        return self.post({"type": "spotMeta"})
+
+    def user_fills_by_time(self, address: str, start_time: int, end_time: Optional[int] = None) -> List[Dict]:
+        payload = {"type": "userFillsByTime", "user": address, "startTime": start_time}
+        if end_time is not None:
+            payload["endTime"] = end_time
+        return self.post(payload)
+
+    def close(self):
+        self.session.close()
+
+
+class AsyncInfoClient:
+    """异步 /info 客户端（aiohttp 连接池）
+
+    每个事件循环使用各自的会话（aiohttp 会话只能在创建它的事件循环中使用和关闭），
+    会话在该循环的首次请求时创建，由 close() 在同一个循环中关闭
+    """
+
+    def __init__(self, base_url: str, pool_size: int = 20, timeout: float = 10,
+                 latency: Optional[LatencyStats] = None, budget: Optional[WeightBudget] = None):
+        """
+        Args:
+            base_url: API地址，如 https://api.hyperliquid.xyz
+            pool_size: 最大并发连接数
+            timeout: 请求超时（秒）
+            latency: 延迟统计（可与同步客户端共用）
+            budget: 全局API权重预算（应与同步客户端共用，为空时不限速）
+        """
+        self.base_url = base_url.rstrip('/')
+        self.pool_size = pool_size
+        self.timeout = aiohttp.ClientTimeout(total=timeout)
+        self.latency = latency or LatencyStats()
+        self.budget = budget
+        # {事件循环: 会话}
+        self._sessions: Dict[asyncio.AbstractEventLoop, aiohttp.ClientSession] = {}
+        self._sessions_lock = threading.Lock()
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        loop = asyncio.get_running_loop()
+        with self._sessions_lock:
+            session = self._sessions.get(loop)
+            if session is None or session.closed:
+                # 不再保留已关闭的事件循环的会话
+                for closed_loop in [l for l in self._sessions if l.is_closed()]:
+                    del self._sessions[closed_loop]
+                connector = aiohttp.TCPConnector(limit=self.pool_size, keepalive_timeout=60)
+                session = self._sessions[loop] = aiohttp.ClientSession(connector=connector, timeout=self.timeout)
+            return session
+
+    async def post(self, payload: Dict) -> Any:
+        """发送 /info 请求并记录延迟
+
+        Raises:
+            aiohttp.ClientError: 网络错误或非2xx响应
+            asyncio.TimeoutError: 请求超时
+        """
+        endpoint = payload.get('type', 'unknown')
+        if self.budget is not None:
+            await self.budget.acquire_async(endpoint)
+        started = time.perf_counter()
+        ok = False
+        try:
+            async with self._get_session().post(f"{self.base_url}/info", json=payload) as response:
+                response.raise_for_status()
+                result = await response.json(content_type=None)
+            ok = True
+            if self.budget is not None:
+                self.budget.charge_items(endpoint, result)
+            return result
+        finally:
+            self.latency.record(endpoint, time.perf_counter() - started, ok)
+
+    async def user_state(self, address: str) -> Dict:
+        return await self.post({"type": "clearinghouseState", "user": address})
+
+    async def open_orders(self, address: str) -> List[Dict]:
+        return await self.post({"type": "openOrders", "user": address})
+
+    async def portfolio(self, address: str) -> List:
+        return await self.post({"type": "portfolio", "user": address})
+
+    async def user_state_and_orders(self, address: str) -> Tuple[Dict, Any]:
+        """并发获取用户状态和挂单
+
+        Returns:
+            (用户状态, 挂单列表或异常)；用户状态获取失败时直接抛出异常
+        """
+        user_state, open_orders = await asyncio.gather(
+            self.user_state(address),
+            self.open_orders(address),
+            return_exceptions=True
+        )
+        if isinstance(user_state, BaseException):
+            raise user_state
+        return user_state, open_orders
+
+    async def close(self):
+        """关闭当前事件循环的会话；其他仍在运行的事件循环中的会话在各自的循环中关闭"""
+        loop = asyncio.get_running_loop()
+        with self._sessions_lock:
+            sessions, self._sessions = self._sessions, {}
+        for session_loop, session in sessions.items():
+            if session.closed:
+                continue
+            if session_loop is loop:
+                await session.close()
+            elif session_loop.is_running():
+                asyncio.run_coroutine_threadsafe(session.close(), session_loop)
@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+"""
+事件接收队列 - WebSocket回调只入队，由工作线程池处理
+慢通知（如等待账户数据的REST调用）只会占用工作线程，不会阻塞连接的读取和心跳
+"""
+import hashlib
+import logging
+import threading
+import time
+from collections import deque
+from typing import Callable, Dict, List, Optional
+
+
+class OverflowPolicy:
+    """队列满时的处理策略"""
+    BLOCK = "block"               # 回调线程等待空位（最多 block_timeout 秒，超时后丢弃新事件），
+                                  # 等待期间阻塞WebSocket读线程，同一连接上的心跳和其他订阅都会停顿
+    DROP_OLDEST = "drop_oldest"   # 丢弃队列中最旧的事件，保留最新事件
+    DROP_NEWEST = "drop_newest"   # 丢弃新到达的事件
+
+    ALL = (DROP_OLDEST, DROP_NEWEST, BLOCK)
+
+
+class _Shard:
+    """一个工作线程及其有界队列"""
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.items: deque = deque()
+        self.cond = threading.Condition()
+        self.busy = False
+
+
+class IngestQueue:
+    """有界事件队列 + 工作线程池
+
+    事件按地址哈希分配到固定的工作线程，同一地址的事件始终按到达顺序处理；
+    队列容量在各工作线程之间平均分配。被丢弃的事件通过 on_drop 回调交给调用方补救（如补齐成交）
+    """
+
+    # 丢弃事件时警告日志的最小间隔（秒）
+    DROP_LOG_INTERVAL = 10
+
+    def __init__(
+        self,
+        handler: Callable[[str, Dict], None],
+        max_size: int = 10000,
+        workers: int = 4,
+        overflow_policy: str = OverflowPolicy.DROP_OLDEST,
+        block_timeout: float = 1.0,
+        on_drop: Optional[Callable[[str, Dict], None]] = None
+    ):
+        """
+        Args:
+            handler: 事件处理函数 handler(address, event)
+            max_size: 队列总容量
+            workers: 工作线程数
+            overflow_policy: 队列满时的处理策略，见 OverflowPolicy（默认丢弃最旧的事件，由 on_drop 安排补齐，
+                不阻塞回调线程）
+            block_timeout: BLOCK 策略下回调线程最多等待的时间（秒）
+            on_drop: 事件被丢弃时的回调 on_drop(address, event)，在入队线程中持有队列锁时调用，不应阻塞
+        """
+        if overflow_policy not in OverflowPolicy.ALL:
+            raise ValueError(f"未知的队列溢出策略: {overflow_policy}")
+
+        self.handler = handler
+        self.overflow_policy = overflow_policy
+        self.block_timeout = block_timeout
+        self.on_drop = on_drop
+
+        workers = max(1, workers)
+        capacity = max(1, max_size // workers)
+        self._shards: List[_Shard] = [_Shard(capacity) for _ in range(workers)]
+        self._threads: List[threading.Thread] = []
+        self._running = False
+
+        self._stats_lock = threading.Lock()
+        self.enqueued = 0
+        self.processed = 0
+        self.dropped = 0
+        self.errors = 0
+        self.max_depth = 0
+        self._last_drop_log = 0.0
+
+    def start(self):
+        """启动工作线程"""
+        if self._running:
+            return
+        self._running = True
+        for idx, shard in enumerate(self._shards):
+            thread = threading.Thread(target=self._worker, args=(shard,), name=f"ingest-{idx}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self, timeout: float = 5.0):
+        """停止工作线程（队列中剩余的事件会先处理完）"""
+        self._running = False
+        for shard in self._shards:
+            with shard.cond:
+                shard.cond.notify_all()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def put(self, address: str, event: Dict) -> bool:
+        """事件入队（WebSocket回调中调用，不做任何处理）
+
+        Returns:
+            True 表示已入队，False 表示因队列已满被丢弃
+        """
+        shard = self._shard_for(address)
+
+        # on_drop 在持有队列锁时调用：同一地址排在后面的事件被处理之前，调用方已经知道有事件丢失
+        with shard.cond:
+            if len(shard.items) >= shard.capacity:
+                if self.overflow_policy == OverflowPolicy.DROP_OLDEST:
+                    self._record_drop(*shard.items.popleft())
+                elif self.overflow_policy == OverflowPolicy.BLOCK:
+                    shard.cond.wait_for(lambda: len(shard.items) < shard.capacity, self.block_timeout)
+
+                if len(shard.items) >= shard.capacity:
+                    self._record_drop(address, event)
+                    return False
+
+            shard.items.append((address, event))
+            depth = len(shard.items)
+            shard.cond.notify_all()
+
+        with self._stats_lock:
+            self.enqueued += 1
+            if depth > self.max_depth:
+                self.max_depth = depth
+        return True
+
+    def depth(self) -> int:
+        """当前排队的事件数"""
+        return sum(len(shard.items) for shard in self._shards)
+
+    def stats(self) -> Dict:
+        """队列统计"""
+        depths = [len(shard.items) for shard in self._shards]
+        with self._stats_lock:
+            return {
+                'depth': sum(depths),
+                'max_shard_depth': max(depths),
+                'capacity': sum(shard.capacity for shard in self._shards),
+                'high_watermark': self.max_depth,
+                'busy_workers': sum(1 for shard in self._shards if shard.busy),
+                'workers': len(self._shards),
+                'enqueued': self.enqueued,
+                'processed': self.processed,
+                'dropped': self.dropped,
+                'errors': self.errors,
+            }
+
+    def _shard_for(self, address: str) -> _Shard:
+        # 使用稳定哈希（内置 hash 对字符串加盐，跨进程不稳定，不影响正确性但不便排查）
+        digest = hashlib.md5(address.encode()).digest()
+        return self._shards[int.from_bytes(digest[:4], 'little') % len(self._shards)]
+
+    def _record_drop(self, address: str, event: Dict):
+        if self.on_drop is not None:
+            try:
+                self.on_drop(address, event)
+            except Exception as e:
+                logging.error(f"处理被丢弃的事件失败: {e}", exc_info=True)
+        with self._stats_lock:
+            self.dropped += 1
+            dropped = self.dropped
+            now = time.monotonic()
+            should_log = now - self._last_drop_log >= self.DROP_LOG_INTERVAL
+            if should_log:
+                self._last_drop_log = now
+        if should_log:
+            logging.warning(
+                f"⚠️  事件队列已满（策略: {self.overflow_policy}），已丢弃 {dropped} 个事件，"
+                f"最近: {address[:10]}..."
+            )
+
+    def _worker(self, shard: _Shard):
+        while True:
+            with shard.cond:
+                shard.cond.wait_for(lambda: shard.items or not self._running)
+                if not shard.items:
+                    return
+                address, event = shard.items.popleft()
+                shard.busy = True
+                # 唤醒 BLOCK 策略下等待空位的回调线程
+                shard.cond.notify_all()
+
+            try:
+                self.handler(address, event)
+            except Exception as e:
+                with self._stats_lock:
+                    self.errors += 1
+                logging.error(f"处理 {address[:10]}... 的事件失败: {e}", exc_info=True)
+            finally:
+                shard.busy = False
+                with self._stats_lock:
+                    self.processed += 1
@@ -0,0 +1,494 @@
+#!/usr/bin/env python3
+"""
+本地模拟 Hyperliquid 服务 - 用于离线压测 WhaleMonitor / PositionManager
+
+提供:
+- POST /info: clearinghouseState, openOrders, portfolio, meta, spotMeta, userFillsByTime
+- GET  /ws:   userFills / userEvents / allMids 订阅、ping/pong，按配置速率推送合成成交和行情
+
+合成成交会同步更新模拟账户的持仓，因此成交中的 startPosition 与 clearinghouseState 保持一致
+
+用法:
+    # 启动服务，每秒推送 500 笔成交，并生成 2000 个地址的地址文件
+    python3 mock_server.py --port 8080 --rate 500 --addresses 2000 --write-addresses jsons/mock_addresses.json
+
+    # 在 jsons/config.json 中设置:
+    #   "api": {"base_url": "http://127.0.0.1:8080"}
+    #   "monitor": {"addresses_file": "jsons/mock_addresses.json", "max_addresses": 2000}
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import logging
+import math
+import random
+import time
+from collections import defaultdict, deque
+from typing import Dict, List, Optional
+
+from aiohttp import WSMsgType, web
+
+
+# 模拟的永续合约: (名称, 数量精度, 初始价格)
+PERP_ASSETS = [
+    ("BTC", 5, 67000.0),
+    ("ETH", 4, 2600.0),
+    ("SOL", 2, 150.0),
+    ("HYPE", 2, 35.0),
+    ("DOGE", 0, 0.12),
+    ("ARB", 1, 0.55),
+    ("AVAX", 2, 27.0),
+    ("LINK", 1, 11.0),
+]
+
+# 模拟的现货交易对: (索引, 名称, 初始价格)
+SPOT_ASSETS = [
+    (0, "PURR/USDC", 0.2),
+    (107, "HYPE/USDC", 35.0),
+    (142, "UBTC/USDC", 67000.0),
+]
+
+
+def generate_addresses(count: int, seed: str = "mock") -> List[str]:
+    """生成确定性的模拟地址"""
+    return [
+        "0x" + hashlib.sha256(f"{seed}-{i}".encode()).hexdigest()[:40]
+        for i in range(count)
+    ]
+
+
+class MockExchange:
+    """模拟交易所状态：价格、各地址持仓、成交历史"""
+
+    # 每个地址保留的成交历史条数（用于快照和 userFillsByTime）
+    MAX_HISTORY = 2000
+
+    def __init__(self, seed: int = 42):
+        self.random = random.Random(seed)
+        self.mids: Dict[str, float] = {name: px for name, _, px in PERP_ASSETS}
+        self.mids.update({f"@{idx}": px for idx, _, px in SPOT_ASSETS})
+        self.sz_decimals = {name: dec for name, dec, _ in PERP_ASSETS}
+
+        # {address: {coin: {'szi': float, 'entry_px': float, 'leverage': int, 'funding': float}}}
+        self.positions: Dict[str, Dict[str, Dict]] = defaultdict(dict)
+        # {address: deque[fill]}
+        self.fills: Dict[str, deque] = defaultdict(lambda: deque(maxlen=self.MAX_HISTORY))
+        # {address: [order]}
+        self.orders: Dict[str, List[Dict]] = {}
+        self.next_tid = 1
+        self.next_oid = 1
+
+    def _seed_account(self, address: str):
+        """首次访问时为地址生成确定性的初始持仓和挂单"""
+        if address in self.orders:
+            return
+        rng = random.Random(address)
+        for name, dec, _ in rng.sample(PERP_ASSETS, rng.randint(0, 4)):
+            px = self.mids[name]
+            notional = rng.uniform(10_000, 5_000_000)
+            szi = round(notional / px, dec) * rng.choice((1, -1))
+            if szi:
+                self.positions[address][name] = {
+                    'szi': szi,
+                    'entry_px': px * rng.uniform(0.9, 1.1),
+                    'leverage': rng.choice((3, 5, 10, 20)),
+                    'funding': rng.uniform(-5000, 5000),
+                }
+
+        orders = []
+        for name, dec, _ in rng.sample(PERP_ASSETS, rng.randint(0, 3)):
+            side = rng.choice(("B", "A"))
+            px = self.mids[name] * (0.95 if side == "B" else 1.05)
+            orders.append({
+                'coin': name,
+                'side': side,
+                'limitPx': f"{px:.4f}",
+                'sz': f"{round(rng.uniform(1_000, 500_000) / px, dec)}",
+                'origSz': f"{round(rng.uniform(1_000, 500_000) / px, dec)}",
+                'oid': self._next_oid(),
+                'timestamp': int(time.time() * 1000),
+            })
+        self.orders[address] = orders
+
+    def _next_oid(self) -> int:
+        oid = self.next_oid
+        self.next_oid += 1
+        return oid
+
+    def tick_prices(self):
+        """价格随机游走"""
+        for coin, px in self.mids.items():
+            self.mids[coin] = max(px * (1 + self.random.gauss(0, 0.0005)), 1e-6)
+
+    def generate_fill(self, address: str) -> Dict:
+        """为地址生成一笔成交，并更新其持仓"""
+        self._seed_account(address)
+
+        if self.random.random() < 0.1:
+            idx, _, _ = self.random.choice(SPOT_ASSETS)
+            coin, dec = f"@{idx}", 2
+        else:
+            coin, dec, _ = self.random.choice(PERP_ASSETS)
+
+        px = self.mids[coin]
+        side = self.random.choice(("B", "A"))
+        sz = max(round(self.random.uniform(100, 200_000) / px, dec), 10 ** -dec)
+        delta = sz if side == "B" else -sz
+
+        pos = self.positions[address].get(coin)
+        start = pos['szi'] if pos else 0.0
+        new = round(start + delta, dec)
+
+        closed_pnl = 0.0
+        if pos and start * delta < 0:
+            closed_qty = min(abs(delta), abs(start))
+            closed_pnl = (px - pos['entry_px']) * closed_qty * (1 if start > 0 else -1)
+
+        if new == 0:
+            self.positions[address].pop(coin, None)
+        elif pos is None or start * new < 0:
+            self.positions[address][coin] = {'szi': new, 'entry_px': px, 'leverage': 10, 'funding': 0.0}
+        else:
+            if abs(new) > abs(start):
+                pos['entry_px'] = (pos['entry_px'] * abs(start) + px * sz) / abs(new)
+            pos['szi'] = new
+
+        if start == 0:
+            direction = "Open Long" if delta > 0 else "Open Short"
+        elif start * new < 0:
+            direction = "Long > Short" if start > 0 else "Short > Long"
+        elif abs(new) > abs(start):
+            direction = "Open Long" if start > 0 else "Open Short"
+        else:
+            direction = "Close Long" if start > 0 else "Close Short"
+
+        tid = self.next_tid
+        self.next_tid += 1
+        fill = {
+            'coin': coin,
+            'px': f"{px:.6f}",
+            'sz': f"{sz}",
+            'side': side,
+            'time': int(time.time() * 1000),
+            'startPosition': f"{start}",
+            'dir': direction,
+            'closedPnl': f"{closed_pnl:.6f}",
+            'hash': "0x" + hashlib.sha256(str(tid).encode()).hexdigest(),
+            'oid': self._next_oid(),
+            'crossed': True,
+            'fee': f"{px * sz * 0.00035:.6f}",
+            'tid': tid,
+            'feeToken': "USDC",
+        }
+        self.fills[address].append(fill)
+        return fill
+
+    def clearinghouse_state(self, address: str) -> Dict:
+        """构造 clearinghouseState 响应"""
+        self._seed_account(address)
+
+        asset_positions = []
+        total_ntl = 0.0
+        total_upnl = 0.0
+        margin_used = 0.0
+        for coin, pos in self.positions[address].items():
+            if coin.startswith('@'):
+                continue
+            px = self.mids[coin]
+            szi = pos['szi']
+            value = abs(szi) * px
+            upnl = (px - pos['entry_px']) * szi
+            margin = value / pos['leverage']
+            liq_px = pos['entry_px'] * (1 - 0.9 / pos['leverage'] * (1 if szi > 0 else -1))
+            total_ntl += value
+            total_upnl += upnl
+            margin_used += margin
+            asset_positions.append({
+                'type': "oneWay",
+                'position': {
+                    'coin': coin,
+                    'szi': f"{szi}",
+                    'entryPx': f"{pos['entry_px']:.6f}",
+                    'positionValue': f"{value:.6f}",
+                    'unrealizedPnl': f"{upnl:.6f}",
+                    'returnOnEquity': f"{upnl / margin if margin else 0:.6f}",
+                    'leverage': {'type': "cross", 'value': pos['leverage']},
+                    'liquidationPx': f"{liq_px:.6f}",
+                    'marginUsed': f"{margin:.6f}",
+                    'maxLeverage': 50,
+                    'cumFunding': {
+                        'allTime': f"{pos['funding']:.6f}",
+                        'sinceOpen': f"{pos['funding']:.6f}",
+                        'sinceChange': "0.0",
+                    },
+                },
+            })
+
+        account_value = margin_used * 2 + total_upnl + 10_000
+        summary = {
+            'accountValue': f"{account_value:.6f}",
+            'totalNtlPos': f"{total_ntl:.6f}",
+            'totalRawUsd': f"{account_value - total_upnl:.6f}",
+            'totalMarginUsed': f"{margin_used:.6f}",
+        }
+        return {
+            'assetPositions': asset_positions,
+            'marginSummary': summary,
+            'crossMarginSummary': dict(summary),
+            'crossMaintenanceMarginUsed': f"{margin_used / 2:.6f}",
+            'withdrawable': f"{max(account_value - margin_used, 0):.6f}",
+            'time': int(time.time() * 1000),
+        }
+
+    def open_orders(self, address: str) -> List[Dict]:
+        self._seed_account(address)
+        return self.orders[address]
+
+    def user_fills_by_time(self, address: str, start_time: int, end_time: Optional[int]) -> List[Dict]:
+        end_time = end_time or int(time.time() * 1000)
+        fills = [f for f in self.fills.get(address, ()) if start_time <= f['time'] <= end_time]
+        return fills[:MockExchange.MAX_HISTORY]
+
+    @staticmethod
+    def portfolio(address: str) -> List:
+        """构造 portfolio 响应：各时间窗口的累计PnL序列（窗口越长采样越稀疏）"""
+        rng = random.Random(address)
+        amplitude = rng.uniform(1e5, 5e6)
+        trend = rng.uniform(-2e5, 5e5)  # 每天
+        phase = rng.uniform(0, 2 * math.pi)
+        day_ms = 24 * 3600 * 1000
+        now = int(time.time() * 1000)
+
+        def pnl(ts: int) -> float:
+            days = ts / day_ms
+            return amplitude * math.sin(days / 3 + phase) + trend * days
+
+        def window(span_ms: int, step_ms: int) -> Dict:
+            start = now - span_ms
+            points = list(range(start, now, step_ms)) + [now]
+            return {
+                'accountValueHistory': [],
+                'pnlHistory': [[ts, f"{pnl(ts) - pnl(start):.2f}"] for ts in points],
+                'vlm': "0.0",
+            }
+
+        return [
+            ['day', window(day_ms, 15 * 60 * 1000)],
+            ['week', window(7 * day_ms, 3600 * 1000)],
+            ['month', window(30 * day_ms, 6 * 3600 * 1000)],
+            ['allTime', window(200 * day_ms, day_ms)],
+        ]
+
+    @staticmethod
+    def meta() -> Dict:
+        return {
+            'universe': [
+                {'name': name, 'szDecimals': dec, 'maxLeverage': 50}
+                for name, dec, _ in PERP_ASSETS
+            ]
+        }
+
+    @staticmethod
+    def spot_meta() -> Dict:
+        return {
+            'universe': [
+                {'name': name, 'tokens': [i + 1, 0], 'index': idx, 'isCanonical': idx == 0}
+                for i, (idx, name, _) in enumerate(SPOT_ASSETS)
+            ],
+            'tokens': [{'name': "USDC", 'szDecimals': 8, 'weiDecimals': 8, 'index': 0}] + [
+                {'name': name.split('/')[0], 'szDecimals': 2, 'weiDecimals': 8, 'index': i + 1}
+                for i, (_, name, _) in enumerate(SPOT_ASSETS)
+            ],
+        }
+
+
+class MockServer:
+    """模拟服务：REST /info + WebSocket /ws"""
+
+    def __init__(self, exchange: MockExchange, rate: float, addresses: List[str]):
+        """
+        Args:
+            exchange: 模拟交易所状态
+            rate: 每秒推送的成交数（所有地址合计）
+            addresses: 未被订阅时也会产生成交的地址（用于 userFillsByTime 补齐场景）
+        """
+        self.exchange = exchange
+        self.rate = rate
+        self.addresses = addresses
+
+        # {address(小写): {ws: 频道}}
+        self.subscribers: Dict[str, Dict[web.WebSocketResponse, str]] = defaultdict(dict)
+        # allMids 订阅者
+        self.mids_subscribers: set = set()
+        self.stats = defaultdict(int)
+
+    def build_app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_post('/info', self.handle_info)
+        app.router.add_get('/ws', self.handle_ws)
+        app.on_startup.append(self._start_background)
+        app.on_cleanup.append(self._stop_background)
+        return app
+
+    async def _start_background(self, app: web.Application):
+        app['emitter'] = asyncio.create_task(self._emit_loop())
+
+    async def _stop_background(self, app: web.Application):
+        app['emitter'].cancel()
+
+    async def handle_info(self, request: web.Request) -> web.Response:
+        try:
+            body = await request.json()
+        except ValueError:
+            return web.json_response({'error': "invalid json"}, status=400)
+
+        req_type = body.get('type')
+        user = (body.get('user') or "").lower()
+        self.stats[f"info:{req_type}"] += 1
+
+        if req_type == 'clearinghouseState':
+            return web.json_response(self.exchange.clearinghouse_state(user))
+        if req_type == 'openOrders':
+            return web.json_response(self.exchange.open_orders(user))
+        if req_type == 'portfolio':
+            return web.json_response(self.exchange.portfolio(user))
+        if req_type == 'meta':
+            return web.json_response(self.exchange.meta())
+        if req_type == 'spotMeta':
+            return web.json_response(self.exchange.spot_meta())
+        if req_type == 'userFillsByTime':
+            return web.json_response(
+                self.exchange.user_fills_by_time(user, body.get('startTime', 0), body.get('endTime'))
+            )
+        return web.json_response({'error': f"unsupported type: {req_type}"}, status=400)
+
+    async def handle_ws(self, request: web.Request) -> web.WebSocketResponse:
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+        self.stats['ws:connections'] += 1
+        subscribed = set()
+
+        try:
+            async for msg in ws:
+                if msg.type != WSMsgType.TEXT:
+                    continue
+                try:
+                    payload = json.loads(msg.data)
+                except ValueError:
+                    continue
+
+                method = payload.get('method')
+                if method == 'ping':
+                    await ws.send_json({'channel': "pong"})
+                elif method in ('subscribe', 'unsubscribe'):
+                    subscription = payload.get('subscription') or {}
+                    user = (subscription.get('user') or "").lower()
+                    channel = subscription.get('type')
+                    if channel == 'allMids':
+                        if method == 'subscribe':
+                            self.mids_subscribers.add(ws)
+                            await ws.send_json({'channel': "subscriptionResponse", 'data': payload})
+                        else:
+                            self.mids_subscribers.discard(ws)
+                        continue
+                    if channel not in ('userFills', 'userEvents') or not user:
+                        continue
+
+                    if method == 'subscribe':
+                        self.subscribers[user][ws] = channel
+                        subscribed.add(user)
+                        self.stats['ws:subscriptions'] += 1
+                        await ws.send_json({'channel': "subscriptionResponse", 'data': payload})
+                        if channel == 'userFills':
+                            # 与真实服务一致：订阅后先推送最近成交快照
+                            await ws.send_json({
+                                'channel': "userFills",
+                                'data': {'isSnapshot': True, 'user': user,
+                                         'fills': list(self.exchange.fills.get(user, ()))[-100:]},
+                            })
+                    else:
+                        self.subscribers[user].pop(ws, None)
+                        subscribed.discard(user)
+        finally:
+            for user in subscribed:
+                self.subscribers[user].pop(ws, None)
+            self.mids_subscribers.discard(ws)
+        return ws
+
+    async def _emit_loop(self):
+        """按速率生成成交并推送给订阅者"""
+        tick = 0.05
+        carry = 0.0
+        ticks = 0
+        while True:
+            await asyncio.sleep(tick)
+            self.exchange.tick_prices()
+
+            # 每 0.5 秒推送一次 allMids
+            ticks += 1
+            if ticks % 10 == 0 and self.mids_subscribers:
+                frame = {'channel': "allMids",
+                         'data': {'mids': {coin: f"{px:.6f}" for coin, px in self.exchange.mids.items()}}}
+                for ws in list(self.mids_subscribers):
+                    try:
+                        await ws.send_json(frame)
+                    except Exception:
+                        self.mids_subscribers.discard(ws)
+
+            carry += self.rate * tick
+            count, carry = int(carry), carry - int(carry)
+            if not count:
+                continue
+
+            candidates = [user for user, subs in self.subscribers.items() if subs] or self.addresses
+            if not candidates:
+                continue
+
+            # 同一连接上的多笔成交合并成一帧
+            frames: Dict[web.WebSocketResponse, Dict[str, List[Dict]]] = defaultdict(lambda: defaultdict(list))
+            for _ in range(count):
+                user = self.exchange.random.choice(candidates)
+                fill = self.exchange.generate_fill(user)
+                self.stats['fills'] += 1
+                for ws in self.subscribers.get(user, {}):
+                    frames[ws][user].append(fill)
+
+            for ws, by_user in frames.items():
+                for user, fills in by_user.items():
+                    channel = self.subscribers[user].get(ws)
+                    if channel == 'userFills':
+                        frame = {'channel': "userFills", 'data': {'user': user, 'fills': fills}}
+                    else:
+                        frame = {'channel': "user", 'data': {'fills': fills}}
+                    try:
+                        await ws.send_json(frame)
+                    except Exception:
+                        pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description="本地模拟 Hyperliquid 服务")
+    parser.add_argument('--host', default="127.0.0.1")
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--rate', type=float, default=100, help="每秒推送的成交数（所有地址合计）")
+    parser.add_argument('--addresses', type=int, default=1000, help="模拟地址数量")
+    parser.add_argument('--write-addresses', default=None, help="将模拟地址写入地址文件（格式同 top_traders_addresses.json）")
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s | %(levelname)s | %(message)s')
+
+    addresses = generate_addresses(args.addresses)
+    if args.write_addresses:
+        with open(args.write_addresses, 'w', encoding='utf-8') as f:
+            json.dump({'addresses': addresses, 'details': []}, f, indent=2)
+        logging.info(f"✅ 已写入 {len(addresses)} 个模拟地址: {args.write_addresses}")
+
+    server = MockServer(MockExchange(seed=args.seed), args.rate, addresses)
+    logging.info(f"🧪 模拟服务启动: http://{args.host}:{args.port} (成交速率: {args.rate}/秒)")
+    web.run_app(server.build_app(), host=args.host, port=args.port, print=None)
+
+
+if __name__ == "__main__":
+    main()
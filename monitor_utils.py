@@ -86,15 +86,64 @@ class Config:
                 "notify_on_reverse": True,
                 "notify_on_add": True,
                 "notify_on_reduce": True,
-                "min_position_size": 0
+                "min_position_size": 0,
+                "engine": "threaded",
+                "dedup_window": 3600,
+                "dedup_max_per_address": 10000,
+                "addresses_file": "jsons/top_traders_addresses.json",
+                "notify_snapshot_changes": [
+                    "position_opened", "position_closed", "position_resized",
+                    "leverage_changed", "liquidation_moved"
+                ],
+                "liquidation_move_threshold": 0.01
             },
             "websocket": {
                 "reconnect_delay": 5,
-                "max_reconnect_delay": 60
+                "max_reconnect_delay": 60,
+                "max_reconnect_attempts": 0,
+                "max_concurrent_reconnects": 4,
+                "subscribe_concurrency": 16,
+                "subscribe_rate": 10,
+                "subscribe_burst": 20,
+                "backfill_max_window": 3600,
+                "backfill_batch_size": 100,
+                "record_traffic": False,
+                "record_dir": "recordings",
+                "ingest_queue_size": 10000,
+                "ingest_workers": 4,
+                "ingest_overflow_policy": "drop_oldest",
+                "ingest_block_timeout": 1.0,
+                "price_feed": True,
+                "ping_interval": 20,
+                "ping_timeout": 10,
+                "subscriptions_per_connection": 50,
+                "max_connections": 10
             },
             "polling": {
                 "interval": 30,
-                "enable_html_report": True
+                "enable_html_report": True,
+                "cache_ttl": 300,
+                "cache_hard_expiry": 1800,
+                "pnl_history_interval": 600,
+                "snapshot_db": "data/snapshots.db",
+                "snapshot_flush_interval": 1.0,
+                "cache_max_entries": 5000,
+                "cache_max_mb": 256,
+                "keep_raw_state": False
+            },
+            "scheduler": {
+                "min_interval": 60,
+                "base_interval": 300,
+                "max_interval": 1200,
+                "request_budget": 2.0
+            },
+            "api": {
+                "base_url": "https://api.hyperliquid.xyz",
+                "http_pool_size": 20,
+                "http_timeout": 10,
+                "fetch_concurrency": 10,
+                "weight_limit": 1200,
+                "weight_window": 60
             },
             "notification": {
                 "console": True,
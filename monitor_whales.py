@@ -6,9 +6,9 @@
 import json
 import time
 import logging
+import threading
 import os
 import asyncio
-import random
 from typing import Dict, List, Optional
 from collections import defaultdict
 from datetime import datetime
@@ -18,10 +18,29 @@ from pathlib import Path
 from monitor_utils import Config, AddressFilter, load_addresses_from_file, filter_addresses, setup_logging
 # 导入持仓管理器
 from position_manager import PositionManager
+from position_service import PositionService
+from info_client import AsyncInfoClient, InfoHttpClient
+from refresh_scheduler import RefreshScheduler
+# 导入重连管理器
+from reconnect_supervisor import AddressState, ReconnectSupervisor
+from rate_limiter import Priority, TokenBucket, WeightBudget, request_priority
+# 导入断线成交补齐
+from backfill import FillBackfiller, FillWatermarks
+# 导入成交去重
+from fill_dedup import FillDeduplicator
+from ingest_queue import IngestQueue
+from fill_ledger import UnknownEntryError, apply_fill
+from price_board import MidsFeed, PriceBoard
+from snapshot_diff import SnapshotDiffer, format_change
+from snapshot_store import SnapshotStore
+from versioned_store import VersionedStore
 
 
 class PositionTracker:
-    """持仓状态追踪器"""
+    """持仓状态追踪器
+    
+    positions / position_details 只在持有该地址事件处理锁的工作线程中读写
+    """
     
     def __init__(self, config: Config):
         self.config = config
@@ -30,6 +49,11 @@ class PositionTracker:
         # 结构: {user_address: {coin: {'entry_px': float, 'unrealized_pnl': float}}}
         self.position_details: Dict[str, Dict[str, Dict]] = defaultdict(lambda: defaultdict(dict))
     
+    def reset(self, user: str):
+        """清除地址的仓位"""
+        self.positions.pop(user, None)
+        self.position_details.pop(user, None)
+    
     def init_positions_from_state(self, user: str, user_state: Dict):
         """从用户状态初始化仓位信息
         
@@ -103,6 +127,23 @@ class PositionTracker:
         # 更新仓位
         self.positions[user][coin] = new_position
         
+        # 用成交增量更新入场价和未实现盈亏（加权平均入场价）
+        detail = self.position_details[user].get(coin)
+        current = {'raw_szi': old_position, 'entry_px': detail.get('entry_px', 0)} if detail else None
+        try:
+            updated = apply_fill(current, fill_data)
+        except UnknownEntryError as e:
+            # 入场价未知时不猜测，通知中不显示入场价和未实现盈亏
+            logging.debug(f"仓位详情未知，跳过增量计算 {user[:10]}...: {e}")
+            updated = None
+        if updated:
+            self.position_details[user][coin] = {
+                'entry_px': updated['entry_px'],
+                'unrealized_pnl': updated['unrealized_pnl']
+            }
+        else:
+            self.position_details[user].pop(coin, None)
+        
         # 判断交易类型
         action_type = self._identify_action(old_position, new_position)
         
@@ -210,6 +251,11 @@ class PositionTracker:
 class WhaleMonitor:
     """大户监控器 V2 (WebSocket模式)"""
     
+    # 是否维护账户数据（持仓管理器、刷新调度、本地快照）；离线回放时关闭，不访问API
+    track_accounts = True
+    # 是否使用持仓服务线程（常驻事件循环）；asyncio 模式的账户数据直接在主事件循环中获取
+    use_position_service = True
+    
     def __init__(self, addresses: List[str], config: Config):
         """初始化监控器"""
         self.config = config
@@ -222,6 +268,8 @@ class WhaleMonitor:
             addresses = addresses[:max_addresses]
         
         self.addresses = addresses
+        # 版本化快照存储：持仓管理器写入，报告、通知、看板无锁读取一致的版本
+        self.state_store = VersionedStore()
         self.tracker = PositionTracker(config)
         
         # 尝试导入SDK
@@ -237,14 +285,121 @@ class WhaleMonitor:
             logging.error("请运行: pip3 install hyperliquid-python-sdk")
             self.sdk_available = False
         
+        # API地址（默认主网，可指向 mock_server.py 本地模拟服务进行压测）
+        self.base_url = config.get('api', 'base_url', default=None)
+        if self.sdk_available and not self.base_url:
+            self.base_url = self.constants.MAINNET_API_URL
+        
+        # 批量刷新账户数据时的并发请求数（异步客户端不占用线程，可按连接池大小调高）
+        self.fetch_concurrency = config.get('api', 'fetch_concurrency', default=10)
+        
+        # 全局API权重预算：所有 /info 请求按接口权重在同一个滚动窗口内限速，
+        # 优先级：成交补齐 > 通知刷新 > 定期刷新
+        self.api_budget = WeightBudget(
+            limit=config.get('api', 'weight_limit', default=1200),
+            window=config.get('api', 'weight_window', default=60)
+        )
+        
+        # 共享连接池的 /info 客户端：持仓管理器、币种名称查询、成交补齐、刷新调度共用
+        self.http_client = InfoHttpClient(
+            self.base_url or "https://api.hyperliquid.xyz",
+            pool_size=config.get('api', 'http_pool_size', default=20),
+            timeout=config.get('api', 'http_timeout', default=10),
+            budget=self.api_budget
+        )
+        
+        # 账户快照持久化：缓存写穿到本地 SQLite，重启时先加载快照再后台重新验证
+        snapshot_db = config.get('polling', 'snapshot_db', default="data/snapshots.db")
+        self.snapshot_store = SnapshotStore(
+            snapshot_db,
+            flush_interval=config.get('polling', 'snapshot_flush_interval', default=1.0)
+        ) if snapshot_db and self.sdk_available and self.track_accounts else None
+        self._revalidate_task = None
+        
         # 创建持仓管理器（带缓存）
-        if self.sdk_available:
-            self.position_manager = PositionManager(self.Info, self.constants)
+        if self.sdk_available and self.track_accounts:
+            self.position_manager = PositionManager(
+                self.Info,
+                self.constants,
+                base_url=self.base_url,
+                cache_ttl=config.get('polling', 'cache_ttl', default=300),
+                hard_expiry=config.get('polling', 'cache_hard_expiry', default=1800),
+                http_client=self.http_client,
+                async_client=AsyncInfoClient(
+                    self.base_url,
+                    pool_size=config.get('api', 'http_pool_size', default=20),
+                    timeout=config.get('api', 'http_timeout', default=10),
+                    latency=self.http_client.latency,
+                    budget=self.api_budget
+                ),
+                pnl_history_interval=config.get('polling', 'pnl_history_interval', default=600),
+                snapshot_store=self.snapshot_store,
+                cache_max_entries=config.get('polling', 'cache_max_entries', default=5000),
+                cache_max_bytes=int(config.get('polling', 'cache_max_mb', default=256) * 1024 * 1024),
+                keep_raw_state=config.get('polling', 'keep_raw_state', default=False),
+                state_store=self.state_store
+            )
+            # 快照差异：定期刷新发现的、推送成交之外的变化（杠杆、爆仓价、遗漏的成交等）
+            self.position_manager.snapshot_differ = SnapshotDiffer(
+                liquidation_threshold=config.get('monitor', 'liquidation_move_threshold', default=0.01)
+            )
+            self.position_manager.on_account_changes = self._on_account_changes
+            self.notify_change_types = set(config.get(
+                'monitor', 'notify_snapshot_changes',
+                default=["position_opened", "position_closed", "position_resized", "leverage_changed", "liquidation_moved"]
+            ))
+            # 常驻事件循环：PositionManager 的所有异步调用都在该循环中执行
+            self.position_service = (
+                PositionService(self.position_manager) if self.use_position_service else None
+            )
+            # 按活跃度和持仓规模分配每个地址的刷新间隔，在全局请求预算内匀速刷新
+            self.refresh_scheduler = RefreshScheduler(
+                lambda address: self.position_manager.get_account_data_async(address, force_refresh=True),
+                request_cost=self.position_manager.refresh_cost,
+                min_interval=config.get('scheduler', 'min_interval', default=60),
+                base_interval=config.get('scheduler', 'base_interval', default=300),
+                max_interval=config.get('scheduler', 'max_interval', default=1200),
+                request_budget=config.get('scheduler', 'request_budget', default=2.0),
+                max_concurrent=self.fetch_concurrency
+            )
         else:
             self.position_manager = None
+            self.position_service = None
+            self.refresh_scheduler = None
+        
+        # 实时标记价格看板：allMids 行情驱动，持仓估值随行情实时更新
+        self.price_board = None
+        self.mids_feed = None
+        if self.position_manager is not None and config.get('websocket', 'price_feed', default=True):
+            # 超过一个心跳周期没有行情（连接断开或僵尸连接）时不再用看板估值，退回REST快照的数值
+            self.price_board = PriceBoard(max_age=(
+                config.get('websocket', 'ping_interval', default=20) + config.get('websocket', 'ping_timeout', default=10)
+            ))
+            self.position_manager.price_board = self.price_board
+        
+        # WebSocket连接池：多个地址的订阅复用少量连接（在 start_monitoring 中创建）
+        self.ws_pool = None
+        
+        # 断线成交补齐：记录每个地址已处理成交的水位线，重连后从水位线开始补齐
+        self.fill_watermarks = FillWatermarks()
+        self.backfiller = FillBackfiller(
+            self._get_rest_info,
+            max_window=config.get('websocket', 'backfill_max_window', default=3600)
+        )
+        self.backfill_batch_size = max(1, config.get('websocket', 'backfill_batch_size', default=100))
+        
+        # 成交去重：快照重放、补齐与实时推送中的重复成交只处理一次
+        self.fill_dedup = FillDeduplicator(
+            window=config.get('monitor', 'dedup_window', default=3600),
+            max_per_address=config.get('monitor', 'dedup_max_per_address', default=10000)
+        )
         
-        # 为每个用户创建独立的Info实例（解决多用户订阅问题）
-        self.info_instances = {}
+        # WebSocket流量录制（websocket.record_traffic 开启时在启动监控时创建）
+        self.recorder = None
+        
+        # 每个地址的事件处理锁（实时推送与补齐可能来自不同线程）
+        self._user_locks: Dict[str, threading.Lock] = {}
+        self._user_locks_guard = threading.Lock()
         
         # 资产名称缓存 {asset_id: coin_name}
         self.asset_name_cache = {}
@@ -252,7 +407,31 @@ class WhaleMonitor:
         # WebSocket 重连配置
         self.reconnect_delay = config.get('websocket', 'reconnect_delay', default=5)
         self.max_reconnect_delay = config.get('websocket', 'max_reconnect_delay', default=60)
-        self.reconnect_attempts = {}  # {address: attempt_count}
+        self.max_reconnect_attempts = config.get('websocket', 'max_reconnect_attempts', default=0)
+        self.max_concurrent_reconnects = config.get('websocket', 'max_concurrent_reconnects', default=4)
+        # 重连管理器：统一调度所有地址的重连（在 start_monitoring 中创建）
+        self.supervisor = None
+        
+        # 订阅限速：启动订阅和重连共用一个令牌桶，避免超出交易所限制
+        self.subscribe_concurrency = config.get('websocket', 'subscribe_concurrency', default=16)
+        self.subscribe_limiter = TokenBucket(
+            rate=config.get('websocket', 'subscribe_rate', default=10),
+            capacity=config.get('websocket', 'subscribe_burst', default=20)
+        )
+        
+        # 事件接收队列：WebSocket回调只入队，由工作线程处理成交和通知，慢通知不会阻塞连接读取
+        self.ingest_queue = IngestQueue(
+            self._handle_user_event,
+            max_size=config.get('websocket', 'ingest_queue_size', default=10000),
+            workers=config.get('websocket', 'ingest_workers', default=4),
+            overflow_policy=config.get('websocket', 'ingest_overflow_policy', default="drop_oldest"),
+            block_timeout=config.get('websocket', 'ingest_block_timeout', default=1.0),
+            on_drop=self._on_event_dropped
+        )
+        # 队列溢出丢失成交的地址 {address: 丢弃的事件数}，由补齐线程从冻结的水位线补回
+        self._dropped_fills: Dict[str, int] = {}
+        self._dropped_lock = threading.Lock()
+        self._dropped_signal = threading.Event()
         self.running = False  # 监控运行状态
         
         logging.info(f"监控器初始化完成，监控 {len(self.addresses)} 个地址")
@@ -291,6 +470,10 @@ class WhaleMonitor:
         else:                         # <= -$5M
             return "❄️❄️❄️❄️❄️"
     
+    def _get_rest_info(self):
+        """获取REST查询用的客户端（共享连接池）"""
+        return self.http_client
+    
     def _get_coin_name(self, coin_id: str) -> str:
         """获取币种名称
         
@@ -310,9 +493,8 @@ class WhaleMonitor:
         
         # 尝试通过API获取资产信息
         try:
-            if hasattr(self, 'Info') and self.info_instances:
-                # 使用任意一个info实例获取元数据
-                info = list(self.info_instances.values())[0]
+            if self.sdk_available:
+                info = self._get_rest_info()
                 meta = info.meta()
                 
                 # 查找资产ID对应的币种名称
@@ -340,172 +522,225 @@ class WhaleMonitor:
         # 如果无法获取，返回原始ID
         return coin_id
     
-    def _subscribe_address(self, address: str, max_retries: int = 5) -> bool:
-        """订阅单个地址的事件 (带指数退避重试逻辑)
+    def _subscribe_address(self, address: str) -> bool:
+        """订阅单个地址（单次尝试，失败由重连管理器在后台重试）
         
         Args:
             address: 用户地址
-            max_retries: 最大重试次数
         
         Returns:
             是否订阅成功
         """
-        base_delay = 4  # 基础延迟时间（秒）
-        max_delay = 60  # 最大延迟时间（秒）
-        
-        for attempt in range(max_retries):
-            try:
-                # 如果已存在连接，先关闭
-                if address in self.info_instances:
-                    try:
-                        old_info = self.info_instances[address]
-                        if hasattr(old_info, 'ws') and old_info.ws:
-                            old_info.ws.close()
-                    except:
-                        pass
-                
-                # 创建新的WebSocket连接
-                logging.debug(f"为 {address} 创建独立的Info实例...")
-                info = self.Info(self.constants.MAINNET_API_URL, skip_ws=False)
-                
-                # 保存Info实例
-                self.info_instances[address] = info
-                
-                # 创建订阅配置
-                subscription = {"type": "userEvents", "user": address}
-                logging.debug(f"订阅配置: {subscription}")
-                
-                # 执行订阅
-                info.subscribe(
-                    subscription,
-                    lambda data, addr=address: self._handle_user_event(addr, data)
-                )
-                
-                # 重置重连计数
-                self.reconnect_attempts[address] = 0
-                
+        try:
+            # 在连接池中订阅（连接池负责选择或新建连接，并按令牌桶限速）
+            if self.ws_pool.subscribe(address):
                 logging.info(f"✅ 订阅成功: {address}")
-                return True  # 成功后立即返回
-                
-            except Exception as e:
-                if attempt == max_retries - 1:
-                    # 达到最大重试次数，放弃
-                    logging.error(f"❌ 订阅失败 {address} 在尝试 {max_retries} 次后放弃。错误: {e}")
-                    logging.debug(f"详细错误信息: ", exc_info=True)
-                    return False
-                
-                # 计算下一次重试的延迟时间（指数增长: 4s, 8s, 16s...）
-                delay = base_delay * (2 ** attempt)
-                # 增加一点随机性 (jitter) 来防止所有失败的连接在同一时间重试
-                jitter = random.uniform(0, 1)
-                # 确保延迟时间不超过设定的最大值
-                sleep_time = min(delay + jitter, max_delay)
-                
-                logging.warning(
-                    f"⚠️  订阅失败 {address[:10]}... (尝试 {attempt + 1}/{max_retries})。"
-                    f"将在 {sleep_time:.2f} 秒后重试... 错误: {e}"
-                )
-                time.sleep(sleep_time)
+                return True
+        except Exception as e:
+            logging.debug(f"订阅 {address[:10]}... 出错: {e}", exc_info=True)
+        
+        logging.warning(f"⚠️  订阅失败 {address[:10]}...，将在后台重试")
+        return False
     
-    def _reconnect_address(self, address: str, max_reconnect_attempts: int = 10):
-        """重连单个地址 (带指数退避和最大重试限制)
+    def _subscribe_all(self) -> List[str]:
+        """并发订阅所有地址
+        
+        Returns:
+            订阅失败的地址列表
+        """
+        from concurrent.futures import ThreadPoolExecutor
+        
+        workers = max(1, min(self.subscribe_concurrency, len(self.addresses)))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="subscribe") as executor:
+            results = list(executor.map(self._subscribe_address, self.addresses))
+        
+        failed_addresses = []
+        for address, ok in zip(self.addresses, results):
+            if ok:
+                self.supervisor.mark_connected(address)
+            else:
+                failed_addresses.append(address)
+        return failed_addresses
+    
+    def _start_recorder(self):
+        """按配置启动WebSocket流量录制"""
+        if not self.config.get('websocket', 'record_traffic', default=False):
+            return
+        from ws_recorder import TrafficRecorder
+        self.recorder = TrafficRecorder(record_dir=self.config.get('websocket', 'record_dir', default="recordings"))
+        logging.info(f"📼 WebSocket流量录制已开启: {self.recorder.path}")
+    
+    def _stop_recorder(self):
+        """停止流量录制"""
+        if self.recorder:
+            self.recorder.close()
+            self.recorder = None
+    
+    def _resubscribe_address(self, address: str) -> bool:
+        """重新订阅单个地址（由重连管理器调用，退避和重试由重连管理器负责）
         
         Args:
             address: 用户地址
-            max_reconnect_attempts: 最大重连尝试次数（0表示无限重试）
+        
+        Returns:
+            是否订阅成功
         """
         if not self.running:
-            return
+            return False
+        return self.ws_pool.subscribe(address)
+    
+    def _backfill_address(self, address: str, until_ms: Optional[int] = None):
+        """补齐地址断线期间遗漏的成交（重连成功后调用）
         
-        attempt = self.reconnect_attempts.get(address, 0)
+        Args:
+            address: 用户地址
+            until_ms: 补齐的结束时间（毫秒），默认为当前时间
+        """
+        self._apply_backfill(address, self._fetch_missed_fills(address, until_ms))
+    
+    def _fetch_missed_fills(self, address: str, until_ms: Optional[int] = None) -> List[Dict]:
+        """拉取水位线之后尚未处理的成交（阻塞的REST调用）
         
-        # 检查是否超过最大重连次数
-        if max_reconnect_attempts > 0 and attempt >= max_reconnect_attempts:
-            logging.error(
-                f"❌ {address[:10]}... 已达到最大重连次数 ({max_reconnect_attempts})，停止重连"
-            )
-            return
+        Args:
+            address: 用户地址
+            until_ms: 结束时间（毫秒），默认为当前时间
         
-        self.reconnect_attempts[address] = attempt + 1
+        Returns:
+            按时间排序的遗漏成交
+        """
+        since_ms = self.fill_watermarks.get(address)
+        if since_ms is None:
+            return []
         
-        # 计算延迟（指数退避）
-        base_delay = self.reconnect_delay
-        delay = min(base_delay * (2 ** attempt), self.max_reconnect_delay)
-        # 添加随机抖动
-        jitter = random.uniform(0, 2)
-        sleep_time = min(delay + jitter, self.max_reconnect_delay)
+        try:
+            with request_priority(Priority.BACKFILL):
+                fills = self.backfiller.fetch(address, since_ms, until_ms)
+        except Exception as e:
+            logging.warning(f"⚠️  补齐 {address[:10]}... 的成交失败: {e}")
+            return []
         
-        logging.warning(
-            f"⚠️  {address[:10]}... 连接断开，将在 {sleep_time:.2f} 秒后尝试重连 "
-            f"(第 {attempt + 1} 次)..."
-        )
-        time.sleep(sleep_time)
+        return [fill for fill in fills if not self.fill_watermarks.is_processed(address, fill)]
+    
+    def _apply_backfill(self, address: str, missed: List[Dict]):
+        """按批次处理补齐的成交
         
-        # 使用带重试逻辑的订阅方法
-        if self._subscribe_address(address, max_retries=3):
-            logging.info(f"✅ {address[:10]}... 重连成功")
-        else:
-            # 递归重连
-            self._reconnect_address(address, max_reconnect_attempts)
+        Args:
+            address: 用户地址
+            missed: 遗漏的成交（已按时间排序）
+        """
+        if not missed:
+            logging.debug(f"{address[:10]}... 断线期间没有遗漏的成交")
+            return
+        
+        logging.info(f"🧩 补齐 {address[:10]}... 断线期间的 {len(missed)} 笔成交")
+        for i in range(0, len(missed), self.backfill_batch_size):
+            batch = missed[i:i + self.backfill_batch_size]
+            self._handle_user_event(address, {'channel': 'user', 'data': {'fills': batch, 'isBackfill': True}})
     
-    async def _periodic_data_update(self):
-        """定期更新账户数据（5分钟一次）"""
+    def _on_event_dropped(self, address: str, event: Dict):
+        """事件队列溢出丢弃了事件：包含成交时冻结该地址的水位线并安排补齐（持有队列锁，不能阻塞）"""
+        data = (event or {}).get('data')
+        if not isinstance(data, dict) or not data.get('fills'):
+            return
+        with self._dropped_lock:
+            self.fill_watermarks.hold(address)
+            self._dropped_fills[address] = self._dropped_fills.get(address, 0) + 1
+        self._dropped_signal.set()
+    
+    def _recover_dropped_fills(self):
+        """补齐线程：按冻结的水位线补回因队列溢出丢失的成交"""
         while self.running:
-            try:
-                # 等待5分钟
-                await asyncio.sleep(300)  # 300秒 = 5分钟
-                
-                if not self.running:
-                    break
-                
-                logging.info("🔄 定期更新账户数据（5分钟）...")
-                
-                # 更新所有地址的数据并生成报告
-                await self.position_manager.update_and_generate_report_async(
-                    self.addresses,
-                    max_concurrent=10,
-                    force_refresh=True
+            self._dropped_signal.wait(1.0)
+            self._dropped_signal.clear()
+            with self._dropped_lock:
+                dropped, self._dropped_fills = self._dropped_fills, {}
+            
+            for address, count in dropped.items():
+                logging.warning(
+                    f"⚠️  {address[:10]}... 有 {count} 个成交事件因队列已满被丢弃，从水位线补齐"
                 )
+                since_ms = self.fill_watermarks.get(address)
+                try:
+                    with request_priority(Priority.BACKFILL):
+                        fills = self.backfiller.fetch(address, since_ms) if since_ms is not None else []
+                except Exception as e:
+                    logging.warning(f"⚠️  补齐 {address[:10]}... 丢失的成交失败，稍后重试: {e}")
+                    with self._dropped_lock:
+                        self._dropped_fills[address] = self._dropped_fills.get(address, 0) + count
+                    continue
                 
-                logging.info("✅ 定期更新完成")
+                # 水位线仍冻结时过滤并处理补齐的成交（实时推送中已处理过的成交由去重索引跳过），
+                # 处理完之后才解除冻结，实时成交不会在此期间把水位线推过丢失的成交
+                self._apply_backfill(
+                    address, [fill for fill in fills if not self.fill_watermarks.is_processed(address, fill)]
+                )
                 
-            except asyncio.CancelledError:
-                logging.info("定期更新任务已取消")
-                break
-            except Exception as e:
-                logging.error(f"定期更新失败: {e}")
+                # 拉取期间又有事件被丢弃时保持冻结，下一轮再从同一水位线补齐
+                with self._dropped_lock:
+                    if address not in self._dropped_fills:
+                        self.fill_watermarks.release(address)
+                        if fills:
+                            self.fill_watermarks.advance(address, fills[-1])
     
-    def start_monitoring(self):
-        """开始监控"""
-        if not self.sdk_available:
-            logging.error("SDK不可用，无法启动监控")
-            return
-        
-        self.running = True
-        
-        print(f"\n{'='*80}")
-        print(f"开始监控 {len(self.addresses)} 个大户地址 (WebSocket模式)")
-        print(f"{'='*80}\n")
-        
-        for i, addr in enumerate(self.addresses, 1):
-            print(f"{i}. {addr}")
-        
-        # 获取初始仓位信息并生成positions.log
-        print(f"\n{'='*80}")
-        print("正在获取用户初始仓位信息...")
-        print(f"{'='*80}\n")
+    async def _periodic_data_update(self):
+        """定期更新账户数据
         
-        # 获取所有地址的持仓并生成HTML报告（使用异步版本以提升性能）
-        # 使用 asyncio.run() 来运行异步任务，避免 DeprecationWarning
-        all_account_data = asyncio.run(
-            self.position_manager.update_and_generate_report_async(
-                self.addresses, 
-                max_concurrent=10,
-                force_refresh=True
-            )
+        各地址由刷新调度器按活跃度分别刷新，这里每5分钟用缓存数据重新生成一次报告
+        """
+        self.refresh_scheduler.add_addresses(
+            self.addresses,
+            self.position_manager.get_cached_account_data_map(self.addresses)
         )
+        scheduler_task = asyncio.create_task(self.refresh_scheduler.run())
         
-        # 初始化追踪器的仓位数据
+        try:
+            while self.running:
+                try:
+                    # 等待5分钟
+                    await asyncio.sleep(300)  # 300秒 = 5分钟
+                    
+                    if not self.running:
+                        break
+                    
+                    # 用缓存数据生成报告（刷新由调度器完成）
+                    self.position_manager.generate_report_from_cache(self.addresses)
+                    
+                    stats = self.refresh_scheduler.stats()
+                    logging.info(
+                        f"🔄 刷新调度: 已刷新 {stats['refreshes']} 次 | 失败 {stats['failures']} | "
+                        f"平均间隔 {stats['avg_interval']:.0f}秒 | 最短间隔 {stats['min_interval']:.0f}秒"
+                    )
+                    logging.info(f"🌐 /info 请求延迟: {self.http_client.latency.format()}")
+                    logging.info(f"⚖️  API权重预算: {self.api_budget.format()}")
+                    
+                    # 淘汰不再监控和已硬过期的缓存条目
+                    self.position_manager.trim_cache(self.addresses)
+                    logging.info(f"🗄️  账户缓存: {self.position_manager.account_data_cache.format()}")
+                    diffs = self.position_manager.snapshot_differ.stats()
+                    logging.info(
+                        f"🔍 快照差异: 比较 {diffs['compared']} 次 | 指纹相同跳过 {diffs['skipped']} 次 | "
+                        f"变化 {sum(diffs['changes'].values())} 项"
+                    )
+                    flights = self.position_manager.singleflight.stats()
+                    logging.info(
+                        f"🔗 请求合并: 实际获取 {flights['executions']} 次 | 合并 {flights['coalesced']} 次 "
+                        f"({flights['coalesce_ratio']:.1%}) | 失败 {flights['errors']}"
+                    )
+                    
+                except asyncio.CancelledError:
+                    logging.info("定期更新任务已取消")
+                    break
+                except Exception as e:
+                    logging.error(f"定期更新失败: {e}")
+        finally:
+            scheduler_task.cancel()
+    
+    def _init_tracker_positions(self, all_account_data: Dict[str, Dict]):
+        """用账户数据初始化追踪器的仓位信息
+        
+        Args:
+            all_account_data: {address: account_data} 字典
+        """
         for address, data in all_account_data.items():
             positions = data.get('positions', [])
             if not positions:
@@ -526,34 +761,154 @@ class WhaleMonitor:
                 ]
             }
             self.tracker.init_positions_from_state(address, user_state)
+    
+    async def _load_initial_account_data(self) -> Dict[str, Dict]:
+        """获取初始账户数据并生成HTML报告
         
-        # 启动定期更新任务（在新线程中运行）
-        import threading
-        def run_periodic_update():
-            asyncio.run(self._periodic_data_update())
+        有本地快照的地址直接使用快照（随后在后台重新验证），只有没有快照的地址需要等待REST获取，
+        重启后可以立即开始订阅
         
-        update_thread = threading.Thread(target=run_periodic_update, daemon=True)
-        update_thread.start()
-        logging.info("✅ 定期更新任务已启动（后台线程）")
+        Returns:
+            {address: account_data} 字典
+        """
+        warm = self.position_manager.load_snapshots(self.addresses)
+        missing = [address for address in self.addresses if address not in warm]
+        if warm:
+            logging.info(f"💾 已从本地快照加载 {len(warm)} 个地址，{len(missing)} 个地址需要获取")
+        
+        all_account_data = dict(warm)
+        if missing:
+            # 冷启动的获取完成之前不会开始订阅，按通知优先级使用预算（不受定期刷新 70% 份额的限制）
+            all_account_data.update(await self.position_manager.update_and_generate_report_async(
+                missing,
+                max_concurrent=self.fetch_concurrency,
+                force_refresh=True,
+                priority=Priority.NOTIFY,
+                pnl_history=False
+            ))
+        if warm:
+            self.position_manager.generate_report_from_cache(self.addresses)
+            self._revalidate_task = asyncio.create_task(self._revalidate_snapshots(list(warm)))
+        return all_account_data
+    
+    async def _revalidate_snapshots(self, addresses: List[str]):
+        """后台重新获取从快照加载的地址，并用最新数据重建追踪器的仓位"""
+        semaphore = asyncio.Semaphore(self.fetch_concurrency)
+        
+        async def revalidate(address):
+            async with semaphore:
+                with request_priority(Priority.PERIODIC):
+                    data = await self.position_manager.get_account_data_async(address, force_refresh=True)
+            if data:
+                self._resync_tracker(address)
+            return data
+        
+        started = time.time()
+        results = await asyncio.gather(*(revalidate(a) for a in addresses), return_exceptions=True)
+        ok = sum(1 for r in results if r and not isinstance(r, BaseException))
+        logging.info(f"💾 快照重新验证完成: {ok}/{len(addresses)} 个地址，耗时 {time.time() - started:.1f}秒")
+    
+    async def _load_pnl_histories(self):
+        """订阅之后在后台补齐PnL历史（权重较高的 portfolio 请求不放在启动的关键路径上）"""
+        started = time.time()
+        updated = await self.position_manager.refresh_pnl_histories(
+            self.addresses, max_concurrent=self.fetch_concurrency
+        )
+        if updated:
+            self.position_manager.generate_report_from_cache(self.addresses)
+        logging.info(f"📈 PnL历史已补齐: {updated}/{len(self.addresses)} 个地址，耗时 {time.time() - started:.1f}秒")
+    
+    def _resync_tracker(self, address: str):
+        """用缓存的账户数据（已包含快照之后的成交）重建追踪器中该地址的仓位"""
+        with self._get_user_lock(address):
+            entry = self.position_manager.get_cached_entry(address)
+            if entry is None:
+                return
+            self.tracker.reset(address)
+            self._init_tracker_positions({address: entry[0]})
+    
+    def start_monitoring(self):
+        """开始监控"""
+        if not self.sdk_available:
+            logging.error("SDK不可用，无法启动监控")
+            return
+        
+        self.running = True
+        
+        from ws_pool import WebSocketPool
+        self.supervisor = ReconnectSupervisor(
+            self._resubscribe_address,
+            reconnect_delay=self.reconnect_delay,
+            max_reconnect_delay=self.max_reconnect_delay,
+            max_reconnect_attempts=self.max_reconnect_attempts,
+            max_concurrent=self.max_concurrent_reconnects,
+            on_reconnected=self._backfill_address
+        )
+        self._start_recorder()
+        self.ingest_queue.start()
+        threading.Thread(target=self._recover_dropped_fills, name="dropped-fills", daemon=True).start()
+        if self.price_board is not None:
+            self.mids_feed = MidsFeed(
+                self.base_url,
+                self.price_board.update_prices,
+                reconnect_delay=self.reconnect_delay,
+                max_reconnect_delay=self.max_reconnect_delay,
+                ping_interval=self.config.get('websocket', 'ping_interval', default=20),
+                ping_timeout=self.config.get('websocket', 'ping_timeout', default=10)
+            )
+            self.mids_feed.start()
+        self.ws_pool = WebSocketPool(
+            self.base_url,
+            on_event=self.ingest_queue.put,
+            on_disconnect=self.supervisor.mark_disconnected,
+            limiter=self.subscribe_limiter,
+            on_raw_frame=self.recorder.record if self.recorder else None,
+            subscriptions_per_connection=self.config.get('websocket', 'subscriptions_per_connection', default=50),
+            max_connections=self.config.get('websocket', 'max_connections', default=10),
+            ping_interval=self.config.get('websocket', 'ping_interval', default=20),
+            ping_timeout=self.config.get('websocket', 'ping_timeout', default=10)
+        )
+        
+        print(f"\n{'='*80}")
+        print(f"开始监控 {len(self.addresses)} 个大户地址 (WebSocket模式)")
+        print(f"{'='*80}\n")
+        
+        for i, addr in enumerate(self.addresses, 1):
+            print(f"{i}. {addr}")
+        
+        # 获取初始仓位信息并生成positions.log
+        print(f"\n{'='*80}")
+        print("正在获取用户初始仓位信息...")
+        print(f"{'='*80}\n")
+        
+        # 获取所有地址的持仓并生成HTML报告（在持仓服务的常驻事件循环中执行）
+        self.position_service.start()
+        all_account_data = self.position_service.run(self._load_initial_account_data())
+        
+        # 初始化追踪器的仓位数据
+        self._init_tracker_positions(all_account_data)
+        
+        # 启动定期更新任务（同样运行在持仓服务的事件循环中）
+        self.position_service.submit(self._periodic_data_update())
+        logging.info("✅ 定期更新任务已启动（持仓服务事件循环）")
         
         print(f"\n{'='*80}")
         print("正在订阅用户事件...")
         print(f"{'='*80}\n")
         
-        # 为每个地址创建独立的Info实例并订阅
-        success_count = 0
-        failed_addresses = []
+        # 通过连接池并发订阅所有地址（令牌桶限速）
+        start_time = time.time()
         
-        for idx, address in enumerate(self.addresses, 1):
-            logging.debug(f"[{idx}/{len(self.addresses)}] 准备订阅地址: {address}")
-            
-            if self._subscribe_address(address):
-                success_count += 1
-            else:
-                failed_addresses.append(address)
-            
-            # 添加短暂延迟，避免连接创建过快
-            time.sleep(0.2)
+        # 以订阅开始时间作为成交水位线的起点，之后断线的地址从水位线开始补齐
+        start_ms = int(start_time * 1000)
+        for address in self.addresses:
+            self.fill_watermarks.touch(address, start_ms)
+
+        failed_addresses = self._subscribe_all()
+        success_count = len(self.addresses) - len(failed_addresses)
+        logging.info(f"订阅耗时: {time.time() - start_time:.2f}秒")
+        if success_count:
+            self.position_service.submit(self._load_pnl_histories())
         
         print(f"📊 订阅✅ 成功: {success_count}/{len(self.addresses)}")
         if failed_addresses:
@@ -564,8 +919,19 @@ class WhaleMonitor:
         if success_count == 0:
             logging.error("没有成功订阅任何地址，退出...")
             self.running = False
+            self.ws_pool.close()
+            self.ingest_queue.stop()
+            if self.mids_feed is not None:
+                self.mids_feed.stop()
+            self.position_service.stop()
+            self._stop_recorder()
             return
         
+        # 启动重连管理器，订阅失败的地址在后台按退避策略重试
+        self.supervisor.start()
+        if failed_addresses:
+            self.supervisor.mark_disconnected(failed_addresses)
+        
         print(f"🎯 监控中... (按Ctrl+C停止)\n")
         
         # 保持运行并监控连接状态
@@ -573,41 +939,60 @@ class WhaleMonitor:
             while self.running:
                 time.sleep(10)  # 每10秒检查一次连接状态
                 
-                # 检查WebSocket连接状态
-                for address in self.addresses:
-                    if address not in self.info_instances:
-                        continue
-                    
-                    info = self.info_instances[address]
-                    # 检查WebSocket是否仍然连接
-                    if hasattr(info, 'ws') and info.ws:
-                        if not info.ws.connected:
-                            logging.warning(f"⚠️  检测到 {address} 连接断开")
-                            # 在新线程中重连，避免阻塞主循环
-                            import threading
-                            threading.Thread(
-                                target=self._reconnect_address, 
-                                args=(address,),
-                                daemon=True
-                            ).start()
+                # 兜底检查：连接池未通知到的断开同样交给重连管理器
+                lost = [
+                    address for address in self.addresses
+                    if self.supervisor.get_state(address) == AddressState.CONNECTED
+                    and not self.ws_pool.is_subscribed(address)
+                ]
+                if lost:
+                    self.supervisor.mark_disconnected(lost)
+                
+                counts = self.supervisor.state_counts()
+                if counts['connected'] < len(self.addresses):
+                    logging.info(
+                        f"🔌 连接状态: 已连接 {counts['connected']} | 退避中 {counts['backing_off']} | "
+                        f"重连中 {counts['reconnecting']} | 已放弃 {counts['failed']}"
+                    )
+                
+                queue_stats = self.ingest_queue.stats()
+                if queue_stats['depth'] or queue_stats['dropped']:
+                    logging.info(
+                        f"📥 事件队列: 积压 {queue_stats['depth']}/{queue_stats['capacity']} | "
+                        f"峰值 {queue_stats['high_watermark']} | 处理中 {queue_stats['busy_workers']}/{queue_stats['workers']} | "
+                        f"已处理 {queue_stats['processed']} | 已丢弃 {queue_stats['dropped']}"
+                    )
                         
         except KeyboardInterrupt:
             logging.info("\n收到停止信号，正在关闭...")
             self.running = False
             
-            # 关闭所有WebSocket连接
-            for address, info in self.info_instances.items():
-                try:
-                    if hasattr(info, 'ws') and info.ws:
-                        info.ws.close()
-                        logging.debug(f"已关闭 {address} 的WebSocket连接")
-                except:
-                    pass
+            # 停止重连并关闭连接池中的所有WebSocket连接
+            self.supervisor.stop()
+            self.ws_pool.close()
+            self.ingest_queue.stop()
+            if self.mids_feed is not None:
+                self.mids_feed.stop()
+            self.position_service.stop()
+            self._stop_recorder()
             
             logging.info("监控已停止")
     
+    def _get_user_lock(self, user: str) -> threading.Lock:
+        """获取地址的事件处理锁"""
+        with self._user_locks_guard:
+            lock = self._user_locks.get(user)
+            if lock is None:
+                lock = self._user_locks[user] = threading.Lock()
+            return lock
+    
     def _handle_user_event(self, user: str, event_data: Dict):
         """处理用户事件"""
+        with self._get_user_lock(user):
+            self._process_user_event(user, event_data)
+    
+    def _process_user_event(self, user: str, event_data: Dict):
+        """处理用户事件（调用方需持有该地址的事件处理锁）"""
         logging.debug(f"📨 收到用户事件 - 用户: {user}")
         logging.debug(f"📋 事件数据结构: {list(event_data.keys()) if event_data else 'None'}")
         
@@ -618,6 +1003,21 @@ class WhaleMonitor:
         data = event_data['data']
         logging.debug(f"📦 数据内容类型: {list(data.keys()) if isinstance(data, dict) else type(data)}")
         
+        # 订阅后服务端推送的快照：水位线之前的是历史成交，直接跳过；
+        # 重订阅时水位线之后的成交是断线期间遗漏的，与补齐结果一起经去重后处理
+        # （快照不推进水位线，避免补齐时漏掉快照之外的成交）
+        is_snapshot = data.get('isSnapshot', False)
+        if is_snapshot:
+            fills = [
+                fill for fill in data.get('fills', [])
+                if not self.fill_watermarks.is_processed(user, fill)
+            ]
+            if not fills:
+                logging.debug(f"📸 收到 {len(data.get('fills', []))} 个历史成交快照，跳过")
+                return
+            logging.info(f"📸 快照中包含 {user[:10]}... 的 {len(fills)} 笔未处理成交")
+            data = dict(data, fills=sorted(fills, key=lambda f: f.get('time', 0)))
+        
         # 处理fills事件（成交事件）
         if 'fills' in data:
             fills = data['fills']
@@ -636,7 +1036,18 @@ class WhaleMonitor:
                     f"币种: {coin_raw}, 方向: {side_display}, 数量: {size}"
                 )
                 
+                # 重复成交（快照重放 / 补齐重叠）只处理一次
+                if not self.fill_dedup.add(user, fill):
+                    logging.debug(f"♻️  重复成交 {fill.get('tid')}，已跳过")
+                    continue
+                
                 trade_info = self.tracker.process_fill(user, fill)
+                if self.position_manager is not None:
+                    self.position_manager.apply_fill(user, fill)
+                if self.refresh_scheduler is not None:
+                    self.refresh_scheduler.record_activity(user)
+                if not is_snapshot:
+                    self.fill_watermarks.advance(user, fill)
                 if trade_info:
                     logging.debug(f"✨ 交易信息已生成: {trade_info['action']}")
                     self._notify_trade(trade_info)
@@ -647,12 +1058,59 @@ class WhaleMonitor:
     
     def _notify_trade(self, trade_info: Dict):
         """通知交易事件"""
-        action = trade_info['action']
-        user_addr = trade_info['user']
-        
         # 获取币种名称（转换@ID格式）
         coin_name = self._get_coin_name(trade_info['coin'])
         
+        # 控制台输出时附带账户汇总信息
+        account_data = None
+        if self.config.get('notification', 'console', default=True):
+            account_data = self._get_account_summary(trade_info['user'])
+        
+        self._emit_trade_notification(trade_info, coin_name, account_data)
+    
+    def _get_account_summary(self, user_addr: str) -> Optional[Dict]:
+        """从缓存获取账户汇总信息（同步调用）
+        
+        有缓存时直接读取（过期数据在后台刷新）；未命中时由持仓服务在常驻事件循环中获取，最多等待5秒
+        
+        Args:
+            user_addr: 用户地址
+        
+        Returns:
+            账户数据，获取失败返回 None
+        """
+        if self.position_service is None:
+            return None
+        return self.position_service.get_account_summary(user_addr, timeout=5)
+    
+    def _on_account_changes(self, address: str, changes: List[Dict]):
+        """输出定期刷新发现的账户变化（只输出 notify_snapshot_changes 中的类型）
+        
+        Args:
+            address: 用户地址
+            changes: SnapshotDiffer 发现的变化
+        """
+        selected = [change for change in changes if change['type'] in self.notify_change_types]
+        if not selected:
+            return
+        
+        lines = [f"🔍 账户变化 {address}"] + [f"   {format_change(change)}" for change in selected]
+        if self.config.get('notification', 'console', default=True):
+            print("\n".join(lines))
+        for line in lines:
+            logging.info(line)
+    
+    def _emit_trade_notification(self, trade_info: Dict, coin_name: str, account_data: Optional[Dict]):
+        """输出交易通知（控制台 + 日志）
+        
+        Args:
+            trade_info: 交易信息
+            coin_name: 币种名称
+            account_data: 账户汇总数据（可为 None）
+        """
+        action = trade_info['action']
+        user_addr = trade_info['user']
+        
         # 控制台输出
         if self.config.get('notification', 'console', default=True):
             # 行为符号
@@ -715,27 +1173,8 @@ class WhaleMonitor:
                 upnl_status = '浮盈' if unrealized_pnl > 0 else '浮亏'
                 print(f"{upnl_symbol} 剩余持仓未实现盈亏: ${unrealized_pnl:,.2f} ({upnl_status})")
             
-            # 从缓存获取账户汇总信息
+            # 账户汇总信息
             try:
-                # 使用 asyncio.create_task 在当前事件循环中运行
-                account_data = None
-                try:
-                    # 尝试在现有事件循环中运行
-                    loop = asyncio.get_running_loop()
-                    # 创建任务并等待
-                    import concurrent.futures
-                    with concurrent.futures.ThreadPoolExecutor() as executor:
-                        future = executor.submit(
-                            asyncio.run,
-                            self.position_manager.get_account_data_async(user_addr, force_refresh=False)
-                        )
-                        account_data = future.result(timeout=5)
-                except RuntimeError:
-                    # 没有运行中的事件循环，直接运行
-                    account_data = asyncio.run(
-                        self.position_manager.get_account_data_async(user_addr, force_refresh=False)
-                    )
-                
                 if account_data:
                     account_value = account_data.get('account_value', 0)
                     total_position_value = account_data.get('total_position_value', 0)
@@ -747,7 +1186,9 @@ class WhaleMonitor:
                     
                     # 显示账户价值和PnL汇总
                     print(f"\n{'─' * 80}")
-                    print(f"📊 账户汇总信息 {fire_emoji}")
+                    data_age = account_data.get('data_age', 0)
+                    age_note = f" (数据更新于 {data_age:.0f} 秒前)" if data_age >= 60 else ""
+                    print(f"📊 账户汇总信息 {fire_emoji}{age_note}")
                     print(f"{'─' * 80}")
                     
                     print(f"💼 账户总价值: ${account_value:,.2f}")
@@ -759,11 +1200,14 @@ class WhaleMonitor:
                     
                     # 阶段性PnL（如果可用）
                     pnl_24h = pnl_summary.get('pnl_24h', 0)
+                    pnl_48h = pnl_summary.get('pnl_48h', 0)
                     pnl_7d = pnl_summary.get('pnl_7d', 0)
                     pnl_30d = pnl_summary.get('pnl_30d', 0)
                     
                     if pnl_24h != 0:
                         print(f"   24-Hour PnL: ${pnl_24h:,.2f}")
+                    if pnl_48h != 0:
+                        print(f"   48-Hour PnL: ${pnl_48h:,.2f}")
                     if pnl_7d != 0:
                         print(f"   7-Day PnL: ${pnl_7d:,.2f}")
                     if pnl_30d != 0:
@@ -820,7 +1264,7 @@ class WhaleMonitor:
                                 )
                     
             except Exception as e:
-                logging.debug(f"获取账户汇总信息失败: {e}")
+                logging.debug(f"输出账户汇总信息失败: {e}")
             
             # 底部分隔线
             print(f"{'━' * 80}\n")
@@ -866,7 +1310,8 @@ if __name__ == "__main__":
     address_filter = AddressFilter()
     
     # 从文件加载地址信息
-    address_infos = load_addresses_from_file()
+    addresses_file = config.get('monitor', 'addresses_file', default="jsons/top_traders_addresses.json")
+    address_infos = load_addresses_from_file(addresses_file)
     
     if not address_infos:
         logging.error("❌ 没有找到监控地址，退出...")
@@ -890,7 +1335,13 @@ if __name__ == "__main__":
     
     logging.info(f"\n✅ 将监控 {len(filtered_addresses)} 个地址\n")
     
-    # 创建并启动监控器
-    monitor = WhaleMonitor(filtered_addresses, config)
+    # 创建并启动监控器（monitor.engine: threaded / asyncio）
+    engine = config.get('monitor', 'engine', default='threaded')
+    if engine == 'asyncio':
+        from async_monitor import AsyncWhaleMonitor
+        monitor = AsyncWhaleMonitor(filtered_addresses, config)
+    else:
+        monitor = WhaleMonitor(filtered_addresses, config)
+    logging.info(f"⚙️  监控引擎: {engine}")
     monitor.start_monitoring()
 
@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""
+PnL历史缓存 - 由 portfolio 接口的 pnlHistory 计算 24h / 48h / 7d / 30d PnL
+
+portfolio 接口按时间窗口（day / week / month / allTime）返回累计PnL序列，窗口越长采样越稀疏。
+每个地址缓存一条合并后的序列：每次刷新只把新数据拼接到缓存上，已经从 day 窗口中滑出的细粒度历史点
+会保留在缓存中，不会被 week / month 的稀疏采样替换
+"""
+import bisect
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+# 由粗到细，细粒度序列覆盖粗粒度序列的重叠部分
+PERIODS = ('allTime', 'month', 'week', 'day')
+
+# 各阶段PnL对应的时间窗口（毫秒）
+WINDOWS_MS = {
+    'pnl_24h': 24 * 3600 * 1000,
+    'pnl_48h': 48 * 3600 * 1000,
+    'pnl_7d': 7 * 24 * 3600 * 1000,
+    'pnl_30d': 30 * 24 * 3600 * 1000,
+}
+
+# 缓存序列保留的时长（毫秒），略大于最长窗口
+RETENTION_MS = 35 * 24 * 3600 * 1000
+
+Series = List[Tuple[int, float]]
+
+
+def parse_portfolio(portfolio) -> Dict[str, Series]:
+    """解析 portfolio 响应为 {窗口: [(时间戳毫秒, 累计PnL), ...]}"""
+    result = {}
+    for item in portfolio or []:
+        if not isinstance(item, (list, tuple)) or len(item) != 2:
+            continue
+        period, data = item
+        if period not in PERIODS or not isinstance(data, dict):
+            continue
+        try:
+            series = sorted((int(ts), float(value)) for ts, value in data.get('pnlHistory', []))
+        except (TypeError, ValueError):
+            continue
+        if series:
+            result[period] = series
+    return result
+
+
+def value_at(series: Series, ts: int) -> float:
+    """序列在指定时间点的值（线性插值，超出范围时取端点值）"""
+    idx = bisect.bisect_left(series, (ts, float('-inf')))
+    if idx <= 0:
+        return series[0][1]
+    if idx >= len(series):
+        return series[-1][1]
+    t0, v0 = series[idx - 1]
+    t1, v1 = series[idx]
+    if t1 == t0:
+        return v1
+    return v0 + (v1 - v0) * (ts - t0) / (t1 - t0)
+
+
+def overlay(base: Series, fine: Series) -> Series:
+    """用细粒度序列覆盖基础序列的重叠时间段
+
+    各窗口的 pnlHistory 都从窗口起点开始累计，细粒度序列先平移到基础序列的基准上再拼接
+    """
+    if not base:
+        return list(fine)
+    start = fine[0][0]
+    offset = value_at(base, start) - fine[0][1]
+    return [p for p in base if p[0] < start] + [(t, v + offset) for t, v in fine]
+
+
+class PnlHistoryCache:
+    """每个地址的PnL历史序列缓存（线程安全）"""
+
+    def __init__(self, refresh_interval: float = 600):
+        """
+        Args:
+            refresh_interval: 同一地址重新请求 portfolio 的最小间隔（秒），间隔内直接使用缓存序列
+        """
+        self.refresh_interval = refresh_interval
+        self._lock = threading.Lock()
+        # {address: 合并后的序列}
+        self._series: Dict[str, Series] = {}
+        # {address: allTime 累计PnL}
+        self._total: Dict[str, float] = {}
+        # {address: 上次合并的时间（time.time()）}
+        self._updated_at: Dict[str, float] = {}
+
+    def needs_refresh(self, address: str) -> bool:
+        """是否需要重新请求 portfolio"""
+        updated_at = self._updated_at.get(address)
+        return updated_at is None or time.time() - updated_at >= self.refresh_interval
+
+    def mark_attempt(self, address: str):
+        """记录一次没有得到可用数据的请求（空响应、无法解析或请求失败），间隔内不再重复请求"""
+        with self._lock:
+            self._updated_at[address] = time.time()
+
+    def merge(self, address: str, portfolio):
+        """把 portfolio 响应合并到地址的缓存序列"""
+        periods = parse_portfolio(portfolio)
+        if not periods:
+            self.mark_attempt(address)
+            return
+
+        fresh: Series = []
+        for period in PERIODS:
+            if period in periods:
+                fresh = overlay(fresh, periods[period])
+        # 本次响应中最细粒度序列的起点，之前的部分优先使用缓存中的细粒度历史
+        fine_start = periods[next(p for p in reversed(PERIODS) if p in periods)][0][0]
+
+        with self._lock:
+            cached = self._series.get(address)
+            if cached:
+                cached_start = cached[0][0]
+                # 缓存与新序列的基准可能不同（如缺少 allTime），以细粒度起点对齐
+                offset = value_at(fresh, fine_start) - value_at(cached, fine_start)
+                merged = (
+                    [p for p in fresh if p[0] < cached_start]
+                    + [(t, v + offset) for t, v in cached if t < fine_start]
+                    + [p for p in fresh if p[0] >= fine_start]
+                )
+            else:
+                merged = fresh
+
+            cutoff = merged[-1][0] - RETENTION_MS
+            self._series[address] = [p for p in merged if p[0] >= cutoff] or merged[-1:]
+            if 'allTime' in periods:
+                self._total[address] = periods['allTime'][-1][1]
+            self._updated_at[address] = time.time()
+
+    def summary(self, address: str) -> Optional[Dict[str, float]]:
+        """阶段性PnL
+
+        Returns:
+            {'total_pnl'(可能缺失), 'pnl_24h', 'pnl_48h', 'pnl_7d', 'pnl_30d'}，没有历史数据返回 None
+        """
+        with self._lock:
+            series = self._series.get(address)
+            total = self._total.get(address)
+        if not series:
+            return None
+
+        latest_ts, latest_value = series[-1]
+        result = {
+            key: latest_value - value_at(series, latest_ts - window)
+            for key, window in WINDOWS_MS.items()
+        }
+        if total is not None:
+            result['total_pnl'] = total
+        return result
+
+    def forget(self, address: str):
+        """移除地址的历史缓存"""
+        with self._lock:
+            self._series.pop(address, None)
+            self._total.pop(address, None)
+            self._updated_at.pop(address, None)
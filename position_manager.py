@@ -6,34 +6,102 @@
 import json
 import logging
 import asyncio
+import threading
 import time
-from typing import Dict, List, Optional
+from typing import Callable, Dict, List, Optional, Tuple
+
+from account_cache import AccountCache
+from info_client import AsyncInfoClient, InfoHttpClient
+from pnl_history import PnlHistoryCache
+from fill_ledger import UnknownEntryError, apply_fill, is_perp_coin
+from rate_limiter import Priority, request_priority
+from singleflight import SingleFlight
+from snapshot_diff import SnapshotDiffer
+from snapshot_store import SnapshotStore
+from versioned_store import VersionedStore
 from datetime import datetime
 from pathlib import Path
-from collections import defaultdict
 
 
 class PositionManager:
     """持仓信息管理器（带缓存）"""
     
-    def __init__(self, info_class, constants):
+    # 每个地址在两次快照之间最多保留的已应用成交数
+    MAX_PENDING_FILLS = 1000
+    
+    def __init__(self, info_class, constants, base_url: Optional[str] = None,
+                 cache_ttl: float = 300, hard_expiry: float = 1800,
+                 http_client: Optional[InfoHttpClient] = None,
+                 async_client: Optional[AsyncInfoClient] = None,
+                 pnl_history_interval: float = 600,
+                 snapshot_store: Optional[SnapshotStore] = None,
+                 cache_max_entries: int = 5000,
+                 cache_max_bytes: int = 256 * 1024 * 1024,
+                 keep_raw_state: bool = False,
+                 state_store: Optional[VersionedStore] = None):
         """初始化持仓管理器
         
         Args:
             info_class: Hyperliquid Info 类
             constants: Hyperliquid 常量
+            base_url: API地址（默认主网，可指向本地模拟服务进行压测）
+            cache_ttl: 缓存有效期（秒），超过后读取时返回旧数据并在后台刷新
+            hard_expiry: 缓存硬过期时间（秒），超过后视为没有数据
+            http_client: 共享的 /info 同步客户端（为空时按 base_url 创建）
+            async_client: /info 异步客户端（为空时按 base_url 创建，与同步客户端共用延迟统计）
+            pnl_history_interval: 同一地址重新请求PnL历史（portfolio）的最小间隔（秒）
+            snapshot_store: 账户快照持久化存储（缓存写穿，重启时预热缓存）
+            cache_max_entries: 缓存的最大地址数
+            cache_max_bytes: 缓存的最大字节数（估算值）
+            keep_raw_state: 是否在账户数据中保留原始 user_state（默认只保留解析后的数据）
+            state_store: 版本化快照存储，缓存的每次写入都发布到 'accounts' 表
         """
         self.Info = info_class
         self.constants = constants
+        self.base_url = base_url or constants.MAINNET_API_URL
+        
+        # 共享连接池的 /info 客户端，所有请求复用keep-alive连接
+        self.http_client = http_client or InfoHttpClient(self.base_url)
+        # 异步客户端：账户数据请求不占用线程，状态和挂单并发获取
+        self.async_client = async_client or AsyncInfoClient(self.base_url, latency=self.http_client.latency)
         
         # 缓存配置
-        self.cache_ttl = 300  # 缓存时间：5分钟（300秒）
+        self.cache_ttl = cache_ttl  # 缓存时间：默认5分钟（300秒）
+        self.hard_expiry = max(hard_expiry, cache_ttl)
+        
+        # 阶段性PnL：每个地址缓存合并后的PnL历史序列，刷新时增量拼接
+        self.pnl_history = PnlHistoryCache(refresh_interval=pnl_history_interval)
+        
+        # 后台刷新任务（stale-while-revalidate）: {address: Task}
+        self.refresh_tasks: Dict[str, asyncio.Task] = {}
+        
+        # 数据缓存: {address: {'data': {...}, 'timestamp': float, 'fills': [...]}}
+        # fills 为上次REST快照之后已应用到缓存的成交，新快照到达时用于对账和重放；
+        # 按条目数和字节数限制大小（LRU），超过硬过期时间的条目定期淘汰
+        self.keep_raw_state = keep_raw_state
+        self.account_data_cache = AccountCache(
+            max_entries=cache_max_entries,
+            max_bytes=cache_max_bytes,
+            ttl=self.hard_expiry,
+            on_evict=self._on_evict
+        )
+        # 缓存写入锁：成交更新（工作线程）与REST快照（事件循环）都会改写同一地址的缓存
+        self._cache_lock = threading.Lock()
+        self.reconcile_mismatches = 0
+        # 缓存写穿到本地数据库，重启时预热
+        self.snapshot_store = snapshot_store
+        # 缓存的只读版本：报告和通知无锁读取一致的版本 {address: {'data', 'timestamp'}}
+        self.state_store = state_store or VersionedStore()
         
-        # 数据缓存: {address: {'data': {...}, 'timestamp': float}}
-        self.account_data_cache: Dict[str, Dict] = {}
+        # 快照差异：每次REST快照与之前的缓存比较（指纹相同直接跳过），变化交给回调并显示在报告中
+        self.snapshot_differ = SnapshotDiffer()
+        self.on_account_changes: Optional[Callable[[str, List[Dict]], None]] = None
         
-        # 更新锁，防止并发更新同一地址
-        self.update_locks: Dict[str, asyncio.Lock] = defaultdict(asyncio.Lock)
+        # 实时标记价格看板（可选，由监控器设置）：缓存持仓同步到看板，读取时用实时价格估值
+        self.price_board = None
+        
+        # 请求合并：同一地址的并发获取（来自任意线程或事件循环）只发出一次请求
+        self.singleflight = SingleFlight()
         
         # 使用positions目录，文件名使用时间戳
         positions_dir = Path("positions")
@@ -43,88 +111,397 @@ class PositionManager:
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         self.positions_log = positions_dir / f"positions_{timestamp}.html"
     
-    async def get_account_data_async(self, address: str, force_refresh: bool = False, retry_count: int = 3) -> Optional[Dict]:
+    async def close(self):
+        """关闭异步客户端（在使用它的事件循环中调用）并写入剩余快照"""
+        await self.async_client.close()
+        if self.snapshot_store is not None:
+            self.snapshot_store.close()
+    
+    def load_snapshots(self, addresses: List[str]) -> Dict[str, Dict]:
+        """从快照存储预热缓存（只加载硬过期之前的快照）
+        
+        Args:
+            addresses: 地址列表
+        
+        Returns:
+            {address: account_data}，已加载到缓存的账户数据
+        """
+        if self.snapshot_store is None:
+            return {}
+        
+        loaded = {}
+        published = {}
+        with self._cache_lock:
+            for address, (data, timestamp) in self.snapshot_store.load(addresses, max_age=self.hard_expiry).items():
+                if address in self.account_data_cache:
+                    continue
+                entry = {'data': data, 'timestamp': timestamp, 'fills': []}
+                self._write_entry(address, entry, persist=False, publish=False,
+                                  data_size=AccountCache.estimate_data_size(data))
+                published[address] = {'data': data, 'timestamp': timestamp}
+                loaded[address] = data
+            # 预热的地址作为一个版本发布（跳过预热过程中已被淘汰的地址）
+            published = {a: v for a, v in published.items() if a in self.account_data_cache}
+            if published:
+                self.state_store.publish('accounts', published)
+        return loaded
+    
+    def with_live_marks(self, address: str, account_data: Optional[Dict]) -> Optional[Dict]:
+        """用价格看板的实时估值替换持仓价值和未实现盈亏（没有看板或行情时原样返回）"""
+        if self.price_board is None or not account_data:
+            return account_data
+        return self.price_board.apply_to_account(address, account_data)
+    
+    def trim_cache(self, addresses: List[str]) -> int:
+        """淘汰不再监控的地址（同时删除其本地快照）和超过硬过期时间的条目
+        
+        Args:
+            addresses: 当前监控的地址列表
+        
+        Returns:
+            淘汰的地址数
+        """
+        unmonitored = self.account_data_cache.retain(addresses)
+        if unmonitored and self.snapshot_store is not None:
+            self.snapshot_store.delete(unmonitored)
+        return len(unmonitored) + len(self.account_data_cache.prune())
+    
+    def _on_evict(self, address: str):
+        """缓存淘汰地址后清理该地址的相关状态"""
+        self.state_store.put('accounts', address, None)
+        self.snapshot_differ.forget(address)
+        self.pnl_history.forget(address)
+        if self.price_board is not None:
+            self.price_board.remove(address)
+    
+    def get_cached_entry(self, address: str) -> Optional[Tuple[Dict, float]]:
+        """读取硬过期之前的缓存数据及其年龄（同步，不发起请求）
+        
+        Args:
+            address: 用户地址
+        
+        Returns:
+            (账户数据, 缓存年龄秒数)，缓存不存在或已硬过期返回 None
+        """
+        entry = self._live_entry(self.state_store.snapshot(), address)
+        self.account_data_cache.touch(address, entry is not None)
+        return entry
+    
+    def _live_entry(self, snapshot, address: str) -> Optional[Tuple[Dict, float]]:
+        """从版本化快照读取硬过期之前的数据及其年龄"""
+        cache_entry = snapshot.get('accounts', address)
+        if cache_entry is None:
+            return None
+        age = time.time() - cache_entry['timestamp']
+        if age >= self.hard_expiry:
+            return None
+        return cache_entry['data'], age
+    
+    async def get_account_data_swr(self, address: str) -> Optional[Dict]:
+        """获取账户数据（stale-while-revalidate）
+        
+        缓存过期但未硬过期时立即返回旧数据，同时在后台刷新；
+        没有缓存或已硬过期时等待获取新数据
+        
+        Returns:
+            账户数据副本，附带 data_age（缓存年龄，秒）
+        """
+        entry = self.get_cached_entry(address)
+        if entry is None:
+            data = await self.get_account_data_async(address)
+            return self.with_live_marks(address, dict(data, data_age=0.0)) if data else None
+        
+        data, age = entry
+        if age >= self.cache_ttl:
+            self.schedule_refresh(address)
+        return self.with_live_marks(address, dict(data, data_age=age))
+    
+    def schedule_refresh(self, address: str):
+        """在当前事件循环中后台刷新地址数据（同一地址同时只有一个刷新任务）"""
+        task = self.refresh_tasks.get(address)
+        if task is not None and not task.done():
+            return
+        task = asyncio.get_running_loop().create_task(self.get_account_data_async(address, force_refresh=True))
+        self.refresh_tasks[address] = task
+        
+        def on_done(done_task):
+            if self.refresh_tasks.get(address) is done_task:
+                del self.refresh_tasks[address]
+        
+        task.add_done_callback(on_done)
+    
+    async def get_account_data_async(self, address: str, force_refresh: bool = False, retry_count: int = 3,
+                                     pnl_history: bool = True) -> Optional[Dict]:
         """异步获取账户数据（带缓存和重试机制）
         
         Args:
             address: 用户地址
             force_refresh: 是否强制刷新缓存
             retry_count: 失败重试次数
+            pnl_history: 是否同时刷新PnL历史（portfolio，权重较高；冷启动时跳过，订阅之后再补）
         
         Returns:
             账户数据字典，包含：
-            - user_state: 用户状态（持仓等）
+            - positions: 解析后的持仓（keep_raw_state 开启时另含原始 user_state）
             - account_value: 账户总价值
             - pnl_summary: PnL汇总数据
             - open_orders: 挂单信息
             - timestamp: 数据时间戳
         """
-        async with self.update_locks[address]:
-            # 检查缓存
-            if not force_refresh and address in self.account_data_cache:
-                cache_entry = self.account_data_cache[address]
-                cache_age = time.time() - cache_entry['timestamp']
+        # 检查缓存
+        cache_entry = None if force_refresh else self.account_data_cache.get(address)
+        if cache_entry is not None:
+            cache_age = time.time() - cache_entry['timestamp']
+            
+            if cache_age < self.cache_ttl:
+                logging.debug(f"使用缓存数据: {address[:10]}... (缓存年龄: {cache_age:.1f}秒)")
+                return cache_entry['data']
+        
+        # 缓存过期或不存在：同一地址的并发调用（跨线程、跨事件循环）合并为一次获取
+        return await self.singleflight.do(
+            address, lambda: self._fetch_account_data(address, retry_count, pnl_history)
+        )
+    
+    async def _fetch_account_data(self, address: str, retry_count: int = 3,
+                                  pnl_history: bool = True) -> Optional[Dict]:
+        """通过REST获取账户数据并写入缓存（带重试）"""
+        for attempt in range(retry_count):
+            try:
+                if attempt > 0:
+                    logging.info(f"🔄 重试获取账户数据 ({attempt + 1}/{retry_count}): {address[:10]}...")
+                    await asyncio.sleep(2 ** attempt)  # 指数退避: 1s, 2s, 4s
+                else:
+                    logging.info(f"🔄 刷新账户数据: {address[:10]}...")
+                
+                # 并发获取用户状态、挂单和PnL历史（异步客户端，不占用线程）
+                if pnl_history:
+                    (user_state, open_orders), _ = await asyncio.gather(
+                        self.async_client.user_state_and_orders(address),
+                        self._refresh_pnl_history(address)
+                    )
+                else:
+                    user_state, open_orders = await self.async_client.user_state_and_orders(address)
                 
-                if cache_age < self.cache_ttl:
-                    logging.debug(f"使用缓存数据: {address[:10]}... (缓存年龄: {cache_age:.1f}秒)")
-                    return cache_entry['data']
+                if not user_state:
+                    logging.warning(f"无法获取用户状态: {address[:10]}...")
+                    if attempt < retry_count - 1:
+                        continue
+                    return None
+                
+                # 解析账户数据
+                account_data = self._parse_account_data(user_state, address)
+                
+                # 挂单信息（获取失败不影响账户数据）
+                if isinstance(open_orders, BaseException):
+                    logging.debug(f"获取挂单信息失败 {address[:10]}...: {open_orders}")
+                    account_data['open_orders'] = []
+                else:
+                    account_data['open_orders'] = open_orders or []
+                
+                # 更新缓存（REST快照作为对账基准，重放快照之后的成交）
+                account_data = self._store_snapshot(address, account_data)
+                
+                logging.info(f"✅ 账户数据已更新: {address[:10]}...")
+                return account_data
+                
+            except Exception as e:
+                if attempt < retry_count - 1:
+                    logging.warning(f"获取账户数据失败 {address[:10]}... (尝试 {attempt + 1}/{retry_count}): {e}")
+                else:
+                    logging.error(f"获取账户数据失败 {address[:10]}... (已重试{retry_count}次): {e}")
+                
+                # 最后一次尝试失败，返回None
+                if attempt == retry_count - 1:
+                    return None
+    
+    def apply_fill(self, address: str, fill: Dict) -> bool:
+        """用成交增量更新缓存中的持仓（仓位大小、加权平均入场价、已实现盈亏）
+        
+        Args:
+            address: 用户地址
+            fill: 成交数据
+        
+        Returns:
+            是否更新了缓存（没有缓存、现货成交、成交已包含在快照中或入场价未知时返回 False）
+        """
+        if not is_perp_coin(fill.get('coin')):
+            return False
+        
+        with self._cache_lock:
+            cache_entry = self.account_data_cache.peek(address)
+            if cache_entry is None:
+                return False
+            
+            snapshot_time = cache_entry['data'].get('snapshot_time') or 0
+            if fill.get('time', 0) <= snapshot_time:
+                return False
+            
+            fills = cache_entry.get('fills', [])
+            try:
+                data = self._apply_fill_to_data(cache_entry['data'], fill)
+            except UnknownEntryError as e:
+                # 缓存中没有该仓位的入场价：持仓保持不变，成交留在待重放列表中，下一次REST快照时再应用
+                logging.debug(f"跳过成交增量更新 {address[:10]}...: {e}")
+                data = None
+            self._write_entry(address, {
+                'data': data if data is not None else cache_entry['data'],
+                'timestamp': cache_entry['timestamp'],
+                'fills': (fills + [fill])[-self.MAX_PENDING_FILLS:],
+            }, persist=data is not None)
+            return data is not None
+    
+    def _apply_fill_to_data(self, data: Dict, fill: Dict) -> Dict:
+        """返回应用成交后的账户数据副本（不修改原数据）"""
+        coin = fill.get('coin')
+        positions = list(data.get('positions', []))
+        idx = next((i for i, p in enumerate(positions) if p['coin'] == coin), None)
+        
+        updated = apply_fill(positions[idx] if idx is not None else None, fill)
+        if idx is None:
+            if updated:
+                positions.append(updated)
+        elif updated:
+            positions[idx] = updated
+        else:
+            del positions[idx]
+        
+        unrealized = sum(p['unrealized_pnl'] for p in positions)
+        pnl_summary = dict(data.get('pnl_summary', {}))
+        if not pnl_summary.get('has_history'):
+            # 没有PnL历史时 Total PnL 即未实现盈亏
+            pnl_summary['total_pnl'] = unrealized
+        pnl_summary['unrealized_pnl'] = unrealized
+        pnl_summary['realized_pnl_since_snapshot'] = (
+            pnl_summary.get('realized_pnl_since_snapshot', 0) + float(fill.get('closedPnl', 0))
+        )
+        
+        return dict(
+            data,
+            positions=positions,
+            total_position_value=sum(p['position_value'] for p in positions),
+            pnl_summary=pnl_summary,
+            fills_applied=data.get('fills_applied', 0) + 1
+        )
+    
+    def _store_snapshot(self, address: str, account_data: Dict) -> Dict:
+        """写入REST快照并对账
+        
+        快照之前已应用的成交与快照比对仓位大小（记录不一致次数），
+        快照时间之后的成交重新应用到新快照上
+        
+        Returns:
+            写入缓存的账户数据
+        """
+        snapshot_time = account_data.get('snapshot_time') or 0
+        
+        with self._cache_lock:
+            previous = self.account_data_cache.peek(address)
+            pending = [
+                fill for fill in (previous or {}).get('fills', [])
+                if fill.get('time', 0) > snapshot_time
+            ]
             
-            # 缓存过期或不存在，获取新数据（带重试）
-            for attempt in range(retry_count):
+            if previous and previous['data'].get('fills_applied') and len(pending) < len(previous.get('fills', [])):
+                expected = {p['coin']: p['raw_szi'] for p in previous['data'].get('positions', [])}
+                actual = {p['coin']: p['raw_szi'] for p in account_data.get('positions', [])}
+                pending_coins = {fill.get('coin') for fill in pending}
+                mismatched = [
+                    coin for coin in set(expected) | set(actual)
+                    if coin not in pending_coins
+                    and abs(expected.get(coin, 0) - actual.get(coin, 0)) > 1e-9
+                ]
+                if mismatched:
+                    self.reconcile_mismatches += 1
+                    logging.debug(f"对账: {address[:10]}... 成交推算的仓位与快照不一致: {mismatched}，以快照为准")
+            
+            for fill in pending:
                 try:
-                    if attempt > 0:
-                        logging.info(f"🔄 重试获取账户数据 ({attempt + 1}/{retry_count}): {address[:10]}...")
-                        await asyncio.sleep(2 ** attempt)  # 指数退避: 1s, 2s, 4s
-                    else:
-                        logging.info(f"🔄 刷新账户数据: {address[:10]}...")
-                    
-                    # 获取当前事件循环
-                    loop = asyncio.get_running_loop()
-                    
-                    # 创建临时Info实例用于API调用
-                    info = self.Info(self.constants.MAINNET_API_URL, skip_ws=True)
-                    
-                    # 并发调用多个API
-                    user_state_task = loop.run_in_executor(None, info.user_state, address)
-                    
-                    # 获取用户状态
-                    user_state = await user_state_task
-                    
-                    if not user_state:
-                        logging.warning(f"无法获取用户状态: {address[:10]}...")
-                        if attempt < retry_count - 1:
-                            continue
-                        return None
-                    
-                    # 解析账户数据
-                    account_data = self._parse_account_data(user_state, address)
-                    
-                    # 获取挂单信息
-                    try:
-                        open_orders = await loop.run_in_executor(None, info.open_orders, address)
-                        account_data['open_orders'] = open_orders or []
-                    except Exception as e:
-                        logging.debug(f"获取挂单信息失败 {address[:10]}...: {e}")
-                        account_data['open_orders'] = []
-                    
-                    # 更新缓存
-                    self.account_data_cache[address] = {
-                        'data': account_data,
-                        'timestamp': time.time()
-                    }
-                    
-                    logging.info(f"✅ 账户数据已更新: {address[:10]}...")
-                    return account_data
-                    
-                except Exception as e:
-                    if attempt < retry_count - 1:
-                        logging.warning(f"获取账户数据失败 {address[:10]}... (尝试 {attempt + 1}/{retry_count}): {e}")
-                    else:
-                        logging.error(f"获取账户数据失败 {address[:10]}... (已重试{retry_count}次): {e}")
-                    
-                    # 最后一次尝试失败，返回None
-                    if attempt == retry_count - 1:
-                        return None
+                    account_data = self._apply_fill_to_data(account_data, fill)
+                except UnknownEntryError as e:
+                    logging.debug(f"快照缺少成交之前的仓位，跳过重放 {address[:10]}...: {e}")
+            
+            # 之前的缓存已包含推送的成交，差异只包含成交之外的变化（杠杆、爆仓价、挂单、遗漏的成交）
+            changes = self.snapshot_differ.compare(address, previous['data'] if previous else None, account_data)
+            
+            self._write_entry(address, {
+                'data': account_data,
+                'timestamp': time.time(),
+                'fills': pending,
+            }, data_size=AccountCache.estimate_data_size(account_data))
+        
+        if changes and self.on_account_changes is not None:
+            try:
+                self.on_account_changes(address, changes)
+            except Exception as e:
+                logging.error(f"处理快照变化失败: {e}")
+        return account_data
+    
+    def _write_entry(self, address: str, entry: Dict, persist: bool = True, publish: bool = True,
+                     data_size: Optional[int] = None):
+        """写入缓存条目并发布新版本、同步价格看板和本地快照（调用方需持有 _cache_lock）
+        
+        条目写入后不再修改，后续更新总是写入新的条目；publish=False 时由调用方批量发布。
+        data_size 为新快照的估算大小，成交增量更新时为空（沿用上一次的大小，不重新序列化整个账户）
+        """
+        self.account_data_cache.put(address, entry, data_size)
+        if publish:
+            self.state_store.put('accounts', address, {'data': entry['data'], 'timestamp': entry['timestamp']})
+        if self.price_board is not None:
+            self.price_board.set_positions(address, entry['data'].get('positions', []))
+        if persist and self.snapshot_store is not None:
+            self.snapshot_store.save(address, entry['data'], entry['timestamp'])
+    
+    async def _refresh_pnl_history(self, address: str):
+        """按间隔请求 portfolio 并合并到PnL历史缓存（失败时沿用缓存）"""
+        if not self.pnl_history.needs_refresh(address):
+            return
+        try:
+            portfolio = await self.async_client.portfolio(address)
+            self.pnl_history.merge(address, portfolio)
+        except Exception as e:
+            # 失败同样计入请求间隔，不在每次刷新时重复发起高权重的 portfolio 请求
+            self.pnl_history.mark_attempt(address)
+            logging.debug(f"获取PnL历史失败 {address[:10]}...: {e}")
+    
+    def pnl_history_summary(self, address: str) -> Dict:
+        """PnL历史汇总（没有历史时为空字典），has_history 表示 Total PnL 来自历史数据"""
+        summary = self.pnl_history.summary(address)
+        if not summary:
+            return {}
+        return dict(summary, has_history='total_pnl' in summary)
+    
+    async def refresh_pnl_histories(self, addresses: List[str], max_concurrent: int = 10) -> int:
+        """补齐缓存账户的PnL历史（冷启动跳过了 portfolio 请求，订阅之后在后台执行）
+        
+        只请求 portfolio，结果写入缓存条目的 pnl_summary，不重新获取账户状态
+        
+        Returns:
+            更新了PnL汇总的地址数
+        """
+        semaphore = asyncio.Semaphore(max_concurrent)
+        
+        async def refresh(address):
+            async with semaphore:
+                with request_priority(Priority.PERIODIC):
+                    await self._refresh_pnl_history(address)
+            summary = self.pnl_history_summary(address)
+            if not summary:
+                return False
+            with self._cache_lock:
+                entry = self.account_data_cache.peek(address)
+                if entry is None:
+                    return False
+                self._write_entry(address, {
+                    'data': dict(entry['data'], pnl_summary=dict(entry['data'].get('pnl_summary', {}), **summary)),
+                    'timestamp': entry['timestamp'],
+                    'fills': entry.get('fills', []),
+                })
+            return True
+        
+        results = await asyncio.gather(
+            *(refresh(a) for a in addresses if self.pnl_history.needs_refresh(a)), return_exceptions=True
+        )
+        return sum(1 for r in results if r is True)
     
     def _parse_account_data(self, user_state: Dict, address: str) -> Dict:
         """解析账户数据
@@ -140,41 +517,44 @@ class PositionManager:
         account_value = float(user_state.get('marginSummary', {}).get('accountValue', 0))
         
         # 解析持仓
-        asset_positions = user_state.get('assetPositions', [])
         positions = []
-        total_unrealized_pnl = 0
-        
-        for pos_data in asset_positions:
+        for pos_data in user_state.get('assetPositions', []):
             parsed_pos = self.parse_position(pos_data)
             if parsed_pos:
                 positions.append(parsed_pos)
-                total_unrealized_pnl += parsed_pos['unrealized_pnl']
+        
+        total_unrealized_pnl = sum(p['unrealized_pnl'] for p in positions)
         
         # 计算总持仓价值
         total_position_value = sum(p['position_value'] for p in positions)
         
-        # PnL汇总（注意：Hyperliquid API可能不直接提供24h/7d/30d PnL）
-        # 我们这里只能获取未实现盈亏，历史PnL需要通过其他接口
+        # PnL汇总：阶段性PnL来自 portfolio 接口的PnL历史（缓存），
+        # 没有历史数据时 Total PnL 退化为当前未实现盈亏（has_history 为 False，随成交和行情更新）
         pnl_summary = {
-            'total_pnl': total_unrealized_pnl,  # 当前未实现盈亏
+            'total_pnl': total_unrealized_pnl,
             'unrealized_pnl': total_unrealized_pnl,
-            # 这些数据需要从其他API获取或计算
             'pnl_24h': 0,
             'pnl_48h': 0,
             'pnl_7d': 0,
             'pnl_30d': 0,
+            'has_history': False,
         }
+        pnl_summary.update(self.pnl_history_summary(address))
         
-        return {
-            'user_state': user_state,
+        account_data = {
             'address': address,
             'account_value': account_value,
             'total_position_value': total_position_value,
             'positions': positions,
             'pnl_summary': pnl_summary,
             'open_orders': [],  # 将在外部填充
-            'timestamp': datetime.now().isoformat()
+            'timestamp': datetime.now().isoformat(),
+            # 快照时间（毫秒），早于此时间的成交已包含在快照中
+            'snapshot_time': user_state.get('time') or int(time.time() * 1000)
         }
+        if self.keep_raw_state:
+            account_data['user_state'] = user_state
+        return account_data
     
     def parse_position(self, position_data: Dict) -> Optional[Dict]:
         """解析单个持仓数据
@@ -308,7 +688,9 @@ class PositionManager:
         self, 
         addresses: List[str], 
         max_concurrent: int = 10,
-        force_refresh: bool = False
+        force_refresh: bool = False,
+        priority: Priority = Priority.PERIODIC,
+        pnl_history: bool = True
     ) -> Dict[str, Dict]:
         """更新所有地址数据并生成HTML报告
         
@@ -316,6 +698,8 @@ class PositionManager:
             addresses: 地址列表
             max_concurrent: 最大并发数
             force_refresh: 是否强制刷新缓存
+            priority: 请求在API权重预算中的优先级（启动时阻塞订阅的全量获取使用更高的优先级）
+            pnl_history: 是否同时获取PnL历史（启动时跳过，由 refresh_pnl_histories 在订阅之后补齐）
         
         Returns:
             {address: account_data} 字典
@@ -327,7 +711,9 @@ class PositionManager:
         
         async def fetch_with_semaphore(addr):
             async with semaphore:
-                return await self.get_account_data_async(addr, force_refresh)
+                # 批量获取在API权重预算中按指定优先级排队
+                with request_priority(priority):
+                    return await self.get_account_data_async(addr, force_refresh, pnl_history=pnl_history)
         
         # 并发获取所有地址数据
         start_time = time.time()
@@ -359,10 +745,43 @@ class PositionManager:
         
         # 生成HTML报告
         from create_html import generate_html_report
-        generate_html_report(all_account_data, self.positions_log)
+        generate_html_report(all_account_data, self.positions_log, self.snapshot_differ.recent(50))
+        
+        return all_account_data
+    
+    def get_cached_account_data_map(self, addresses: List[str]) -> Dict[str, Dict]:
+        """读取多个地址硬过期之前的缓存数据（不发起请求）
+        
+        所有地址来自同一个版本，不会混合更新前后的数据
+        
+        Returns:
+            {address: account_data} 字典（没有缓存的地址不包含在内）
+        """
+        snapshot = self.state_store.snapshot()
+        result = {}
+        for addr in addresses:
+            entry = self._live_entry(snapshot, addr)
+            if entry is not None:
+                result[addr] = self.with_live_marks(addr, entry[0])
+        return result
+    
+    def generate_report_from_cache(self, addresses: List[str]) -> Dict[str, Dict]:
+        """用缓存数据生成HTML报告（刷新由调度器负责，这里不发起请求）
+        
+        Returns:
+            {address: account_data} 字典
+        """
+        all_account_data = self.get_cached_account_data_map(addresses)
+        
+        from create_html import generate_html_report
+        generate_html_report(all_account_data, self.positions_log, self.snapshot_differ.recent(50))
         
         return all_account_data
     
+    def refresh_cost(self, address: str) -> int:
+        """刷新一个地址需要的请求数（状态 + 挂单，PnL历史到期时再加一次）"""
+        return 3 if self.pnl_history.needs_refresh(address) else 2
+    
     # ============== 向后兼容的旧接口 ==============
     
     async def fetch_and_log_positions_async(
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+持仓服务 - 在常驻事件循环中运行 PositionManager
+同步代码（WebSocket回调、工作线程）通过线程安全的接口提交任务或读取缓存，
+不再为每次查询创建事件循环和线程；同一地址的并发获取由 PositionManager 的 singleflight 合并
+"""
+import asyncio
+import concurrent.futures
+import logging
+import threading
+from typing import Any, Coroutine, Dict, Optional
+
+from position_manager import PositionManager
+
+
+class PositionService:
+    """拥有 PositionManager 的常驻事件循环（后台线程）"""
+
+    def __init__(self, position_manager: PositionManager):
+        """
+        Args:
+            position_manager: 持仓管理器（只在服务的事件循环中使用）
+        """
+        self.position_manager = position_manager
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+
+    @property
+    def running(self) -> bool:
+        return self.loop is not None and self.loop.is_running()
+
+    def start(self):
+        """启动事件循环线程（重复调用无副作用）"""
+        with self._start_lock:
+            if self._thread is not None:
+                return
+            self.loop = asyncio.new_event_loop()
+            ready = threading.Event()
+
+            def run_loop():
+                asyncio.set_event_loop(self.loop)
+                self.loop.call_soon(ready.set)
+                self.loop.run_forever()
+
+            self._thread = threading.Thread(target=run_loop, name="position-service", daemon=True)
+            self._thread.start()
+            ready.wait()
+            logging.debug("持仓服务事件循环已启动")
+
+    def stop(self, timeout: float = 5.0):
+        """取消未完成的任务并停止事件循环"""
+        with self._start_lock:
+            if self._thread is None:
+                return
+
+            async def shutdown():
+                tasks = [t for t in asyncio.all_tasks() if t is not asyncio.current_task()]
+                for task in tasks:
+                    task.cancel()
+                await asyncio.gather(*tasks, return_exceptions=True)
+                await self.position_manager.close()
+
+            try:
+                asyncio.run_coroutine_threadsafe(shutdown(), self.loop).result(timeout)
+            except Exception as e:
+                logging.debug(f"停止持仓服务时取消任务失败: {e}")
+
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            self._thread.join(timeout)
+            self.loop.close()
+            self._thread = None
+            self.loop = None
+
+    def submit(self, coro: Coroutine) -> concurrent.futures.Future:
+        """提交协程到服务事件循环（线程安全，不阻塞）"""
+        if self._thread is None:
+            self.start()
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def run(self, coro: Coroutine, timeout: Optional[float] = None) -> Any:
+        """提交协程并等待结果（不能在服务事件循环线程中调用）"""
+        return self.submit(coro).result(timeout)
+
+    def fetch_account_data(self, address: str, force_refresh: bool = False) -> concurrent.futures.Future:
+        """在后台获取账户数据（同一地址的并发获取合并为一次请求）"""
+        return self.submit(self.position_manager.get_account_data_async(address, force_refresh))
+
+    def get_account_summary(self, address: str, timeout: float = 5.0) -> Optional[Dict]:
+        """获取账户汇总信息（stale-while-revalidate）
+
+        硬过期之前的缓存直接读取（不经过事件循环），缓存已过期时同时提交后台刷新；
+        没有缓存或已硬过期时提交获取并最多等待 timeout 秒，超时返回 None，获取会在后台继续完成并写入缓存
+
+        Args:
+            address: 用户地址
+            timeout: 缓存未命中时最多等待的时间（秒）
+
+        Returns:
+            账户数据副本，附带 data_age（缓存年龄，秒）；获取失败或超时返回 None
+        """
+        entry = self.position_manager.get_cached_entry(address)
+        if entry is not None:
+            data, age = entry
+            if age >= self.position_manager.cache_ttl:
+                self.fetch_account_data(address, force_refresh=True)
+            return self.position_manager.with_live_marks(address, dict(data, data_age=age))
+
+        try:
+            data = self.fetch_account_data(address).result(timeout)
+            return self.position_manager.with_live_marks(address, dict(data, data_age=0.0)) if data else None
+        except concurrent.futures.TimeoutError:
+            logging.debug(f"获取账户汇总信息超时: {address[:10]}...")
+        except Exception as e:
+            logging.debug(f"获取账户汇总信息失败: {e}")
+        return None
@@ -0,0 +1,329 @@
+#!/usr/bin/env python3
+"""
+实时标记价格看板 - 订阅 allMids，按列存储价格并向量化重估所有持仓
+每次行情更新用一次 NumPy 计算所有地址的持仓价值和未实现盈亏，
+通知和报告读取的是实时估值，而不是最多几分钟前的REST快照
+"""
+import json
+import logging
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+import websocket
+
+from reconnect_supervisor import compute_backoff
+from ws_pool import ConnectionHealth, api_url_to_ws_url
+
+
+ALL_MIDS_SUBSCRIPTION = {"method": "subscribe", "subscription": {"type": "allMids"}}
+
+
+def parse_all_mids(raw: str) -> Optional[Dict[str, str]]:
+    """解析 allMids 推送，返回 {币种: 中间价}；其他消息返回 None"""
+    try:
+        message = json.loads(raw)
+    except ValueError:
+        return None
+    if not isinstance(message, dict) or message.get('channel') != 'allMids':
+        return None
+    data = message.get('data') or {}
+    return data.get('mids')
+
+
+class PriceBoard:
+    """按列存储的价格看板和持仓表（线程安全）
+
+    价格按资产（币种名或 @index）分配固定列号存放在数组中；
+    所有地址的持仓展开为 (地址行, 资产列, 有符号仓位, 入场价) 四个数组，按地址排序，
+    每次行情更新后一次向量化计算全部持仓的标记价格、持仓价值和未实现盈亏
+    """
+
+    def __init__(self, initial_capacity: int = 256, max_age: Optional[float] = None):
+        """
+        Args:
+            initial_capacity: 初始价格列数
+            max_age: 行情的最长有效时间（秒），超过后不再用看板估值（为空时不检查）
+        """
+        self._lock = threading.Lock()
+        self.max_age = max_age
+
+        # 价格列
+        self._asset_index: Dict[str, int] = {}
+        self._prices = np.full(initial_capacity, np.nan)
+
+        # 持仓表（按地址存放原始持仓，变更后懒重建数组）
+        self._positions: Dict[str, List[Dict]] = {}
+        self._dirty = True
+        self._rows: Dict[str, slice] = {}
+        self._coins: List[str] = []
+        self._asset_col = np.zeros(0, dtype=np.int64)
+        self._szi = np.zeros(0)
+        self._entry = np.zeros(0)
+
+        # 最近一次重估结果（与持仓表按行对应）
+        self._mark = np.zeros(0)
+        self._value = np.zeros(0)
+        self._upnl = np.zeros(0)
+
+        self.ticks = 0
+        self.updated_at: Optional[float] = None
+
+    def update_prices(self, mids: Dict[str, str]):
+        """写入一次行情并重估所有持仓"""
+        with self._lock:
+            cols = np.fromiter((self._column(coin) for coin in mids), dtype=np.int64, count=len(mids))
+            values = np.fromiter((float(px) for px in mids.values()), dtype=np.float64, count=len(mids))
+            self._prices[cols] = values
+            self.ticks += 1
+            self.updated_at = time.time()
+            self._revalue()
+
+    def set_positions(self, address: str, positions: List[Dict]):
+        """更新地址的持仓（PositionManager.parse_position 格式），空列表表示没有持仓"""
+        with self._lock:
+            self._positions[address] = [
+                {'coin': p['coin'], 'raw_szi': p['raw_szi'], 'entry_px': p['entry_px']}
+                for p in positions
+            ]
+            self._dirty = True
+
+    def remove(self, address: str):
+        """移除地址的持仓"""
+        with self._lock:
+            if self._positions.pop(address, None) is not None:
+                self._dirty = True
+
+    def is_fresh(self) -> bool:
+        """行情是否在有效期内"""
+        if self.updated_at is None:
+            return False
+        return self.max_age is None or time.time() - self.updated_at <= self.max_age
+
+    def get_price(self, coin: str) -> Optional[float]:
+        """最新中间价，没有行情返回 None"""
+        col = self._asset_index.get(coin)
+        if col is None:
+            return None
+        price = self._prices[col]
+        return None if np.isnan(price) else float(price)
+
+    def marks_for(self, address: str) -> Dict[str, Dict[str, float]]:
+        """地址各持仓的实时估值
+
+        Returns:
+            {币种: {'mark_px', 'position_value', 'unrealized_pnl'}}，没有行情的持仓不包含在内
+        """
+        with self._lock:
+            if self._dirty:
+                self._rebuild()
+                self._revalue()
+            rows = self._rows.get(address)
+            if rows is None:
+                return {}
+            result = {}
+            for i in range(rows.start, rows.stop):
+                if np.isnan(self._mark[i]):
+                    continue
+                result[self._coins[i]] = {
+                    'mark_px': float(self._mark[i]),
+                    'position_value': float(self._value[i]),
+                    'unrealized_pnl': float(self._upnl[i]),
+                }
+            return result
+
+    def apply_to_account(self, address: str, account_data: Dict) -> Dict:
+        """返回用实时估值替换持仓价值和未实现盈亏后的账户数据副本（没有行情或行情过期时原样返回）"""
+        if not self.is_fresh():
+            return account_data
+        marks = self.marks_for(address)
+        if not marks:
+            return account_data
+
+        positions = []
+        for pos in account_data.get('positions', []):
+            mark = marks.get(pos['coin'])
+            positions.append(dict(pos, **mark) if mark else pos)
+
+        unrealized = sum(p['unrealized_pnl'] for p in positions)
+        pnl_summary = dict(account_data.get('pnl_summary', {}))
+        if not pnl_summary.get('has_history'):
+            pnl_summary['total_pnl'] = unrealized
+        pnl_summary['unrealized_pnl'] = unrealized
+
+        return dict(
+            account_data,
+            positions=positions,
+            total_position_value=sum(p['position_value'] for p in positions),
+            pnl_summary=pnl_summary,
+            marked_at=self.updated_at
+        )
+
+    def stats(self) -> Dict:
+        return {
+            'assets': len(self._asset_index),
+            'positions': len(self._szi),
+            'addresses': len(self._positions),
+            'ticks': self.ticks,
+        }
+
+    def _column(self, coin: str) -> int:
+        """资产的列号，新资产分配新列（调用方需持有锁）"""
+        col = self._asset_index.get(coin)
+        if col is None:
+            col = self._asset_index[coin] = len(self._asset_index)
+            if col >= len(self._prices):
+                grown = np.full(len(self._prices) * 2, np.nan)
+                grown[:len(self._prices)] = self._prices
+                self._prices = grown
+        return col
+
+    def _rebuild(self):
+        """按地址重建持仓数组（调用方需持有锁）"""
+        coins, cols, szi, entry = [], [], [], []
+        self._rows = {}
+        for address, positions in self._positions.items():
+            start = len(coins)
+            for pos in positions:
+                coins.append(pos['coin'])
+                cols.append(self._column(pos['coin']))
+                szi.append(pos['raw_szi'])
+                entry.append(pos['entry_px'])
+            self._rows[address] = slice(start, len(coins))
+
+        self._coins = coins
+        self._asset_col = np.asarray(cols, dtype=np.int64)
+        self._szi = np.asarray(szi, dtype=np.float64)
+        self._entry = np.asarray(entry, dtype=np.float64)
+        self._dirty = False
+
+    def _revalue(self):
+        """向量化重估所有持仓（调用方需持有锁）"""
+        if self._dirty:
+            self._rebuild()
+        self._mark = self._prices[self._asset_col]
+        self._value = np.abs(self._szi) * self._mark
+        self._upnl = (self._mark - self._entry) * self._szi
+
+
+class MidsFeed:
+    """allMids 行情订阅（独立的WebSocket连接，断线按指数退避自动重连）
+
+    每条连接一个心跳线程（随连接关闭退出）：按 ping_interval 发送心跳，
+    超过 stale_after 没有任何消息时判定为僵尸连接，强制断开后重连
+    """
+
+    # 心跳线程的检查周期（秒）
+    HEALTH_CHECK_INTERVAL = 1
+
+    def __init__(
+        self,
+        base_url: str,
+        on_mids: Callable[[Dict[str, str]], None],
+        reconnect_delay: float = 5,
+        max_reconnect_delay: float = 60,
+        ping_interval: float = 20,
+        ping_timeout: float = 10
+    ):
+        """
+        Args:
+            base_url: REST API地址（自动转换为WebSocket地址）
+            on_mids: 收到行情时的回调 on_mids({币种: 中间价})
+            reconnect_delay: 初始重连延迟（秒）
+            max_reconnect_delay: 最大重连延迟（秒）
+            ping_interval: 心跳间隔（秒）
+            ping_timeout: 心跳超时（秒）
+        """
+        self.url = api_url_to_ws_url(base_url)
+        self.on_mids = on_mids
+        self.reconnect_delay = reconnect_delay
+        self.max_reconnect_delay = max_reconnect_delay
+        self.ping_interval = ping_interval
+        self.ping_timeout = ping_timeout
+
+        self.running = False
+        self.ws: Optional[websocket.WebSocketApp] = None
+        self.health = ConnectionHealth(ping_interval, ping_timeout)
+        self._thread: Optional[threading.Thread] = None
+        self._attempt = 0
+        self.stale_reconnects = 0
+
+    def start(self):
+        self.running = True
+        self._thread = threading.Thread(target=self._run, name="mids-feed", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self.running = False
+        if self.ws is not None:
+            try:
+                self.ws.close()
+            except Exception:
+                pass
+
+    def _run(self):
+        while self.running:
+            self.ws = websocket.WebSocketApp(
+                self.url,
+                on_open=self._on_open,
+                on_message=self._on_message,
+                on_error=lambda ws, error: logging.warning(f"⚠️  行情连接出错: {error}"),
+            )
+            self.health = ConnectionHealth(self.ping_interval, self.ping_timeout)
+            closed = threading.Event()
+            keepalive = threading.Thread(
+                target=self._keepalive_loop, args=(self.ws, self.health, closed),
+                name="mids-ping", daemon=True
+            )
+            keepalive.start()
+            try:
+                self.ws.run_forever()
+            finally:
+                closed.set()
+                keepalive.join()
+            if not self.running:
+                break
+
+            delay = compute_backoff(self._attempt, self.reconnect_delay, self.max_reconnect_delay)
+            self._attempt += 1
+            logging.warning(f"⚠️  行情连接断开，{delay:.1f}秒后重连...")
+            time.sleep(delay)
+
+    def _keepalive_loop(self, ws: websocket.WebSocketApp, health: ConnectionHealth, closed: threading.Event):
+        """单条连接的心跳：连接关闭（closed 被设置）时退出"""
+        while not closed.wait(self.HEALTH_CHECK_INTERVAL):
+            # 握手卡住（迟迟没有建立连接）同样按无消息处理
+            now = time.monotonic()
+            if health.is_stale(now):
+                self.stale_reconnects += 1
+                logging.warning(f"🧟 行情连接已 {health.silence(now):.1f} 秒无消息，判定为僵尸连接，强制重连")
+                try:
+                    if ws.sock:
+                        ws.sock.abort()
+                except Exception as e:
+                    logging.debug(f"强制断开行情连接失败: {e}")
+                return
+
+            if ws.sock and ws.sock.connected and health.ping_due(now):
+                try:
+                    ws.send(json.dumps({"method": "ping"}))
+                    health.mark_ping()
+                except Exception as e:
+                    logging.debug(f"行情连接发送心跳失败: {e}")
+
+    def _on_open(self, ws):
+        self._attempt = 0
+        self.health.mark_message()
+        self.health.mark_ping()
+        ws.send(json.dumps(ALL_MIDS_SUBSCRIPTION))
+        logging.info("📈 已订阅 allMids 行情")
+
+    def _on_message(self, ws, message):
+        self.health.mark_message()
+        mids = parse_all_mids(message)
+        if mids:
+            try:
+                self.on_mids(mids)
+            except Exception as e:
+                logging.error(f"处理行情失败: {e}")
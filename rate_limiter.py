@@ -0,0 +1,281 @@
+#!/usr/bin/env python3
+"""
+限速工具
+- TokenBucket: 令牌桶限速器
+- WeightBudget: 全局API权重预算（滚动窗口 + 请求优先级）
+同一个限速器可同时被线程（acquire）和协程（acquire_async）使用
+"""
+import asyncio
+import bisect
+import contextlib
+import contextvars
+import threading
+import time
+from collections import defaultdict, deque
+from enum import IntEnum
+from typing import Dict, List, Tuple
+
+
+class TokenBucket:
+    """令牌桶限速器
+
+    令牌按 rate 个/秒 匀速补充，最多积攒 capacity 个；
+    reserve 预留令牌并返回需要等待的时间，调用方各自等待，不会互相阻塞
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        """
+        Args:
+            rate: 每秒补充的令牌数
+            capacity: 桶容量（允许的突发数量）
+        """
+        self.rate = max(rate, 1e-9)
+        self.capacity = max(capacity, 1)
+        self._tokens = float(self.capacity)
+        self._updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, tokens: float = 1) -> float:
+        """预留令牌
+
+        Args:
+            tokens: 需要的令牌数
+
+        Returns:
+            需要等待的时间（秒），0 表示可以立即执行
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated_at) * self.rate)
+            self._updated_at = now
+
+            # 允许余额为负：后来者排在前面的预留之后
+            self._tokens -= tokens
+            if self._tokens >= 0:
+                return 0.0
+            return -self._tokens / self.rate
+
+    def acquire(self, tokens: float = 1):
+        """阻塞等待直到获得令牌（线程中使用）"""
+        wait = self.reserve(tokens)
+        if wait > 0:
+            time.sleep(wait)
+
+    async def acquire_async(self, tokens: float = 1):
+        """等待直到获得令牌（协程中使用）"""
+        wait = self.reserve(tokens)
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+
+class Priority(IntEnum):
+    """API请求优先级（数值越小越优先）"""
+    BACKFILL = 0   # 断线成交补齐
+    NOTIFY = 1     # 通知触发的账户刷新、资产名称查询
+    PERIODIC = 2   # 定期刷新、启动时的全量获取
+
+
+# 当前上下文的请求优先级：线程和协程各自独立，asyncio 任务创建时继承
+_current_priority: contextvars.ContextVar = contextvars.ContextVar('request_priority', default=Priority.NOTIFY)
+
+
+@contextlib.contextmanager
+def request_priority(priority: Priority):
+    """在 with 块内发出的API请求使用指定优先级"""
+    token = _current_priority.set(priority)
+    try:
+        yield
+    finally:
+        _current_priority.reset(token)
+
+
+def current_priority() -> Priority:
+    return _current_priority.get()
+
+
+class WeightBudget:
+    """全局API权重预算（滚动窗口）
+
+    每个 /info 请求按接口消耗权重，任意一个窗口内消耗的总权重不超过预算。
+    低优先级只能使用预算的一部分（PERIODIC 70%，NOTIFY 90%），剩余部分留给更高优先级，
+    因此定期刷新排队时，补齐和通知请求仍能立即发出。
+    预留时同时检查已排在更晚时刻的预留：新请求落入它们所在的窗口后，这些窗口也不能超过总预算
+    """
+
+    # 各接口的请求权重（参考交易所文档），未列出的接口为 DEFAULT_WEIGHT
+    ENDPOINT_WEIGHTS = {
+        'clearinghouseState': 2,
+        'spotClearinghouseState': 2,
+        'allMids': 2,
+        'l2Book': 2,
+        'orderStatus': 2,
+        'exchangeStatus': 2,
+        'userRole': 60,
+    }
+    DEFAULT_WEIGHT = 20
+    # 成交类接口按返回条数追加权重：每 ITEMS_PER_WEIGHT 条 +1
+    ITEMS_PER_WEIGHT = 20
+    ITEM_WEIGHTED_ENDPOINTS = ('userFills', 'userFillsByTime', 'historicalOrders', 'userFunding')
+
+    # 各优先级可使用的预算比例
+    SHARES = {
+        Priority.BACKFILL: 1.0,
+        Priority.NOTIFY: 0.9,
+        Priority.PERIODIC: 0.7,
+    }
+
+    def __init__(self, limit: float = 1200, window: float = 60):
+        """
+        Args:
+            limit: 窗口内允许的总权重
+            window: 滚动窗口长度（秒）
+        """
+        self.limit = max(limit, 1)
+        self.window = window
+        self._lock = threading.Lock()
+        # 按时间排序的 (计入时间, 权重)，计入时间可能在未来（已预留、正在等待的请求）
+        self._entries: List[Tuple[float, float]] = []
+
+        self._requests: Dict[Priority, int] = defaultdict(int)
+        self._weight: Dict[Priority, float] = defaultdict(float)
+        self._throttled: Dict[Priority, int] = defaultdict(int)
+        self._wait_total: Dict[Priority, float] = defaultdict(float)
+
+    @classmethod
+    def weight_of(cls, endpoint: str) -> float:
+        """接口的基础请求权重"""
+        return cls.ENDPOINT_WEIGHTS.get(endpoint, cls.DEFAULT_WEIGHT)
+
+    def reserve(self, weight: float, priority: Priority = Priority.NOTIFY) -> float:
+        """预留权重
+
+        Args:
+            weight: 请求权重
+            priority: 请求优先级
+
+        Returns:
+            需要等待的时间（秒），0 表示可以立即执行
+        """
+        with self._lock:
+            now = time.monotonic()
+            allowed = self.limit * self.SHARES.get(priority, 1.0)
+            weight = min(weight, allowed)
+            self._expire(now)
+
+            times = [ts for ts, _ in self._entries]
+            prefix = [0.0]
+            for _, w in self._entries:
+                prefix.append(prefix[-1] + w)
+
+            def window_weight(t: float) -> float:
+                """窗口 (t - window, t] 内的总权重"""
+                return prefix[bisect.bisect_right(times, t)] - prefix[bisect.bisect_right(times, t - self.window)]
+
+            # 已排在未来的预留，以及以它们为终点的窗口权重（按时间排序）
+            future = [(ts, window_weight(ts)) for ts in times if ts > now]
+            future_times = [ts for ts, _ in future]
+            # 滑动窗口最大值：候选时间递增时，[t, t + window) 内的未来预留区间单调右移
+            peaks: deque = deque()
+            hi = 0
+
+            # 候选开始时间：现在，或某条记录滑出窗口的时刻。
+            # 窗口 (t - window, t] 内的权重按本优先级的份额检查（排在更晚时刻的低优先级预留不计入，不会挡住本次请求）；
+            # 以 [t, t + window) 内的未来预留为终点的窗口会包含本次请求，按总预算检查
+            # 最后一个候选时间之后所有记录都已滑出窗口，循环总会找到开始时间
+            start = now
+            for t in [now] + sorted(ts + self.window for ts in times if ts + self.window > now):
+                while hi < len(future) and future_times[hi] < t + self.window:
+                    while peaks and future[peaks[-1]][1] <= future[hi][1]:
+                        peaks.pop()
+                    peaks.append(hi)
+                    hi += 1
+                while peaks and future_times[peaks[0]] < t:
+                    peaks.popleft()
+
+                if window_weight(t) + weight > allowed:
+                    continue
+                if peaks and future[peaks[0]][1] + weight > self.limit:
+                    continue
+                start = t
+                break
+
+            bisect.insort(self._entries, (start, weight))
+            wait = start - now
+
+            self._requests[priority] += 1
+            self._weight[priority] += weight
+            if wait > 0:
+                self._throttled[priority] += 1
+                self._wait_total[priority] += wait
+            return wait
+
+    def charge(self, weight: float):
+        """追加已发出请求的权重（如按返回条数计算的部分），不等待"""
+        if weight <= 0:
+            return
+        with self._lock:
+            bisect.insort(self._entries, (time.monotonic(), weight))
+
+    def acquire(self, endpoint: str):
+        """按接口权重和当前优先级阻塞等待（线程中使用）"""
+        wait = self.reserve(self.weight_of(endpoint), current_priority())
+        if wait > 0:
+            time.sleep(wait)
+
+    async def acquire_async(self, endpoint: str):
+        """按接口权重和当前优先级等待（协程中使用）"""
+        wait = self.reserve(self.weight_of(endpoint), current_priority())
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    def charge_items(self, endpoint: str, result):
+        """按返回条数追加成交类接口的权重"""
+        if endpoint in self.ITEM_WEIGHTED_ENDPOINTS and isinstance(result, list):
+            self.charge(len(result) // self.ITEMS_PER_WEIGHT)
+
+    def used(self) -> float:
+        """当前窗口内已消耗的权重（不含预留给等待中请求的部分）"""
+        with self._lock:
+            now = time.monotonic()
+            self._expire(now)
+            return sum(w for ts, w in self._entries if ts <= now)
+
+    def stats(self) -> Dict:
+        """预算统计：窗口内权重、利用率，以及各优先级的请求数、被限速次数和累计等待时间"""
+        used = self.used()
+        with self._lock:
+            by_priority = {
+                priority.name.lower(): {
+                    'requests': self._requests[priority],
+                    'weight': self._weight[priority],
+                    'throttled': self._throttled[priority],
+                    'wait_total': self._wait_total[priority],
+                }
+                for priority in Priority
+            }
+            pending = sum(1 for ts, _ in self._entries if ts > time.monotonic())
+        return {
+            'limit': self.limit,
+            'window': self.window,
+            'used': used,
+            'utilization': used / self.limit,
+            'pending': pending,
+            'priorities': by_priority,
+        }
+
+    def format(self) -> str:
+        """单行文本，用于日志输出"""
+        s = self.stats()
+        parts = [f"权重 {s['used']:.0f}/{s['limit']:.0f} ({s['utilization']:.0%}) 等待中 {s['pending']}"]
+        for name, p in s['priorities'].items():
+            parts.append(
+                f"{name} n={p['requests']} throttled={p['throttled']} wait={p['wait_total']:.1f}s"
+            )
+        return " | ".join(parts)
+
+    def _expire(self, now: float):
+        """移除已滑出窗口的记录（调用方需持有锁）"""
+        cutoff = now - self.window
+        idx = bisect.bisect_right(self._entries, (cutoff, float('inf')))
+        if idx:
+            del self._entries[:idx]
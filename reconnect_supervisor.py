@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+"""
+重连管理器 - 单线程调度所有地址的断线重连
+每个地址维护一个状态（已连接 / 退避等待 / 重连中 / 已放弃），并限制同时进行的重连数量
+"""
+import heapq
+import logging
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from enum import Enum
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+
+class AddressState(str, Enum):
+    """地址连接状态"""
+    CONNECTED = "connected"        # 已连接
+    BACKING_OFF = "backing_off"    # 退避等待中
+    RECONNECTING = "reconnecting"  # 正在重连
+    FAILED = "failed"              # 超过最大重连次数，已放弃
+
+
+def compute_backoff(attempt: int, base_delay: float, max_delay: float) -> float:
+    """计算指数退避延迟（带随机抖动）
+
+    Args:
+        attempt: 已失败的次数（从0开始）
+        base_delay: 初始延迟（秒）
+        max_delay: 最大延迟（秒）
+
+    Returns:
+        延迟时间（秒）
+    """
+    delay = min(base_delay * (2 ** attempt), max_delay)
+    # 随机抖动，防止大量地址在同一时刻重连
+    jitter = random.uniform(0, 2)
+    return min(delay + jitter, max_delay)
+
+
+class ReconnectSupervisor:
+    """重连管理器
+
+    所有断线地址进入同一个退避队列，由一个调度线程按到期时间取出，
+    再交给固定大小的线程池执行重连，因此一次网络抖动不会变成成百上千个重连线程
+    """
+
+    def __init__(
+        self,
+        resubscribe: Callable[[str], bool],
+        reconnect_delay: float = 5,
+        max_reconnect_delay: float = 60,
+        max_reconnect_attempts: int = 0,
+        max_concurrent: int = 4,
+        on_reconnected: Optional[Callable[[str], None]] = None
+    ):
+        """初始化重连管理器
+
+        Args:
+            resubscribe: 执行一次重新订阅的函数，返回是否成功（不应在内部重试或sleep）
+            reconnect_delay: 初始重连延迟（秒）
+            max_reconnect_delay: 最大重连延迟（秒）
+            max_reconnect_attempts: 最大重连次数（0表示无限重试）
+            max_concurrent: 同时进行的重连数量上限
+            on_reconnected: 重连成功后的回调
+        """
+        self.resubscribe = resubscribe
+        self.reconnect_delay = reconnect_delay
+        self.max_reconnect_delay = max_reconnect_delay
+        self.max_reconnect_attempts = max_reconnect_attempts
+        self.max_concurrent = max(1, max_concurrent)
+        self.on_reconnected = on_reconnected
+
+        self._cond = threading.Condition()
+        self._states: Dict[str, AddressState] = {}
+        self._attempts: Dict[str, int] = {}
+        # 退避队列: [(到期时间, 地址)]，同一地址以 _due_at 中的时间为准
+        self._due: List[Tuple[float, str]] = []
+        self._due_at: Dict[str, float] = {}
+        # 重连过程中再次收到断开通知的地址，本次重连结果视为失败
+        self._lost_during_attempt = set()
+        self._in_flight = 0
+        self._running = False
+
+        self._executor = ThreadPoolExecutor(max_workers=self.max_concurrent, thread_name_prefix="reconnect")
+        self._thread = threading.Thread(target=self._run, name="reconnect-supervisor", daemon=True)
+
+    def start(self):
+        """启动调度线程"""
+        self._running = True
+        self._thread.start()
+
+    def stop(self):
+        """停止调度（不等待进行中的重连）"""
+        with self._cond:
+            self._running = False
+            self._cond.notify_all()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def mark_connected(self, address: str):
+        """标记地址已连接"""
+        with self._cond:
+            self._states[address] = AddressState.CONNECTED
+            self._attempts[address] = 0
+            self._due_at.pop(address, None)
+
+    def mark_disconnected(self, addresses: Iterable[str]):
+        """标记地址断开，进入退避队列（已在退避或重连中的地址不会重复排队）"""
+        with self._cond:
+            for address in addresses:
+                state = self._states.get(address)
+                if state == AddressState.BACKING_OFF or state == AddressState.FAILED:
+                    continue
+                if state == AddressState.RECONNECTING:
+                    self._lost_during_attempt.add(address)
+                    continue
+                logging.warning(f"⚠️  检测到 {address[:10]}... 连接断开")
+                self._schedule(address)
+            self._cond.notify_all()
+
+    def get_state(self, address: str) -> Optional[AddressState]:
+        """获取地址当前状态"""
+        return self._states.get(address)
+
+    def state_counts(self) -> Dict[str, int]:
+        """各状态的地址数量"""
+        with self._cond:
+            counts = {state.value: 0 for state in AddressState}
+            for state in self._states.values():
+                counts[state.value] += 1
+            counts['in_flight'] = self._in_flight
+            return counts
+
+    def _schedule(self, address: str):
+        """按退避时间排队（调用方需持有锁）"""
+        attempt = self._attempts.get(address, 0)
+
+        # 检查是否超过最大重连次数
+        if self.max_reconnect_attempts > 0 and attempt >= self.max_reconnect_attempts:
+            self._states[address] = AddressState.FAILED
+            self._due_at.pop(address, None)
+            logging.error(
+                f"❌ {address[:10]}... 已达到最大重连次数 ({self.max_reconnect_attempts})，停止重连"
+            )
+            return
+
+        delay = compute_backoff(attempt, self.reconnect_delay, self.max_reconnect_delay)
+        due = time.monotonic() + delay
+        self._states[address] = AddressState.BACKING_OFF
+        self._due_at[address] = due
+        heapq.heappush(self._due, (due, address))
+
+        logging.warning(
+            f"⚠️  {address[:10]}... 将在 {delay:.2f} 秒后尝试重连 (第 {attempt + 1} 次)..."
+        )
+
+    def _run(self):
+        """调度线程：取出到期地址并在并发上限内提交重连"""
+        with self._cond:
+            while self._running:
+                now = time.monotonic()
+
+                # 丢弃已失效的队列项（地址已重新排队或已恢复）
+                while self._due and self._due_at.get(self._due[0][1]) != self._due[0][0]:
+                    heapq.heappop(self._due)
+
+                if self._due and self._due[0][0] <= now and self._in_flight < self.max_concurrent:
+                    _, address = heapq.heappop(self._due)
+                    del self._due_at[address]
+                    self._states[address] = AddressState.RECONNECTING
+                    self._lost_during_attempt.discard(address)
+                    self._in_flight += 1
+                    self._executor.submit(self._attempt, address)
+                    continue
+
+                if self._due and self._in_flight < self.max_concurrent:
+                    timeout = self._due[0][0] - now
+                else:
+                    timeout = None
+                self._cond.wait(timeout)
+
+    def _attempt(self, address: str):
+        """执行一次重连（在线程池中运行）"""
+        try:
+            ok = self.resubscribe(address)
+        except Exception as e:
+            logging.warning(f"⚠️  {address[:10]}... 重连出错: {e}")
+            ok = False
+
+        with self._cond:
+            self._in_flight -= 1
+            if ok and address in self._lost_during_attempt:
+                ok = False
+            self._lost_during_attempt.discard(address)
+
+            if ok:
+                self._states[address] = AddressState.CONNECTED
+                self._attempts[address] = 0
+            else:
+                self._attempts[address] = self._attempts.get(address, 0) + 1
+                if self._running:
+                    self._schedule(address)
+            self._cond.notify_all()
+
+        if ok:
+            logging.info(f"✅ {address[:10]}... 重连成功")
+            if self.on_reconnected:
+                try:
+                    self.on_reconnected(address)
+                except Exception as e:
+                    logging.error(f"处理重连成功回调失败: {e}")
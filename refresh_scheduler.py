@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+"""
+账户数据刷新调度器 - 按地址活跃度和持仓规模分配刷新间隔
+所有地址进入同一个按到期时间排序的优先队列，刷新请求在全局请求预算（令牌桶）内匀速发出，
+活跃的大户保持新鲜，长期不交易的地址降低刷新频率
+"""
+import asyncio
+import heapq
+import logging
+import math
+import threading
+import time
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+from rate_limiter import Priority, TokenBucket, request_priority
+
+
+class RefreshScheduler:
+    """按活跃度自适应的刷新调度器（运行在一个事件循环中，record_activity 可在任意线程调用）"""
+
+    # 活跃度半衰期（秒）：一笔成交对刷新间隔的影响每小时减半
+    ACTIVITY_HALF_LIFE = 3600
+
+    def __init__(
+        self,
+        refresh: Callable[[str], Awaitable[Optional[Dict]]],
+        request_cost: Callable[[str], float] = lambda address: 1,
+        min_interval: float = 60,
+        base_interval: float = 300,
+        max_interval: float = 1200,
+        request_budget: float = 2.0,
+        max_concurrent: int = 10
+    ):
+        """
+        Args:
+            refresh: 刷新一个地址的协程函数，返回账户数据（用于读取持仓规模）
+            request_cost: 一次刷新消耗的请求数
+            min_interval: 最短刷新间隔（秒），频繁交易的地址
+            base_interval: 基准刷新间隔（秒），无近期成交、持仓规模一般的地址
+            max_interval: 最长刷新间隔（秒），长期不交易且没有持仓的地址
+            request_budget: 全局请求预算（请求/秒）
+            max_concurrent: 同时进行的刷新数量上限
+        """
+        self.refresh = refresh
+        self.request_cost = request_cost
+        self.min_interval = min_interval
+        self.base_interval = base_interval
+        self.max_interval = max(max_interval, min_interval)
+        self.max_concurrent = max(1, max_concurrent)
+        self.budget = TokenBucket(rate=request_budget, capacity=max(request_budget, 1))
+
+        self._lock = threading.Lock()
+        # {address: (衰减后的成交数, 更新时间)}
+        self._activity: Dict[str, Tuple[float, float]] = {}
+        # {address: 最近一次刷新得到的持仓总价值}
+        self._position_value: Dict[str, float] = {}
+        # {address: 最近一次刷新完成时间}
+        self._refreshed_at: Dict[str, float] = {}
+
+        # 优先队列 (到期时间, 地址)；_due_at 记录每个地址当前有效的到期时间，过期条目在出队时丢弃
+        self._heap: List[Tuple[float, str]] = []
+        self._due_at: Dict[str, float] = {}
+        self._inflight: set = set()
+
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self.refreshes = 0
+        self.failures = 0
+
+    def add_addresses(self, addresses: List[str], account_data: Optional[Dict[str, Dict]] = None):
+        """加入调度的地址，首次刷新在一个基准间隔内均匀分布，避免同时发出
+
+        Args:
+            addresses: 地址列表
+            account_data: 已获取的账户数据（用于初始化持仓规模）
+        """
+        now = time.time()
+        account_data = account_data or {}
+        count = max(len(addresses), 1)
+        for i, address in enumerate(addresses):
+            data = account_data.get(address)
+            if data:
+                self._position_value[address] = data.get('total_position_value', 0)
+                self._refreshed_at[address] = now
+            self._schedule(address, now + self.base_interval * (i + 1) / count)
+
+    def record_activity(self, address: str):
+        """记录一笔成交（线程安全）：提高活跃度，必要时提前下一次刷新"""
+        now = time.time()
+        with self._lock:
+            self._activity[address] = (self._decayed_activity(address, now) + 1, now)
+
+        if self._loop is not None and not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(self._pull_forward, address)
+
+    def interval_for(self, address: str) -> float:
+        """地址当前的刷新间隔（秒）
+
+        近期成交越多间隔越短（按 1 / (1 + 活跃度) 缩短），持仓越大间隔越短，
+        没有持仓的地址间隔加倍
+        """
+        with self._lock:
+            activity = self._decayed_activity(address, time.time())
+        value = self._position_value.get(address)
+
+        if value is None:
+            size_factor = 1.0
+        elif value <= 0:
+            size_factor = 2.0
+        elif value >= 10_000_000:
+            size_factor = 0.5
+        elif value >= 1_000_000:
+            size_factor = 0.75
+        else:
+            size_factor = 1.0
+
+        interval = self.base_interval * size_factor / (1 + activity)
+        return min(self.max_interval, max(self.min_interval, interval))
+
+    def stats(self) -> Dict:
+        """调度统计"""
+        intervals = [self.interval_for(address) for address in self._due_at]
+        now = time.time()
+        return {
+            'addresses': len(self._due_at),
+            'inflight': len(self._inflight),
+            'refreshes': self.refreshes,
+            'failures': self.failures,
+            'min_interval': min(intervals) if intervals else 0,
+            'avg_interval': sum(intervals) / len(intervals) if intervals else 0,
+            'next_due_in': max(0.0, min(self._due_at.values()) - now) if self._due_at else 0,
+        }
+
+    async def run(self):
+        """调度主循环"""
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        slots = asyncio.Semaphore(self.max_concurrent)
+        tasks = set()
+
+        try:
+            while True:
+                address = await self._next_due()
+                await slots.acquire()
+                await self.budget.acquire_async(self.request_cost(address))
+
+                self._inflight.add(address)
+                task = asyncio.create_task(self._refresh_one(address, slots))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+        finally:
+            for task in tasks:
+                task.cancel()
+            self._loop = None
+
+    async def _next_due(self) -> str:
+        """等待并取出下一个到期的地址"""
+        while True:
+            self._wakeup.clear()
+            while self._heap:
+                due, address = self._heap[0]
+                if self._due_at.get(address) != due:
+                    heapq.heappop(self._heap)  # 已被重新调度的旧条目
+                    continue
+                break
+
+            if self._heap:
+                wait = self._heap[0][0] - time.time()
+                if wait <= 0:
+                    _, address = heapq.heappop(self._heap)
+                    del self._due_at[address]
+                    return address
+            else:
+                wait = None
+
+            # 有更早的地址被加入时提前唤醒
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=wait)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _refresh_one(self, address: str, slots: asyncio.Semaphore):
+        try:
+            # 调度刷新在全局API权重预算中使用最低优先级，为补齐和通知保留余量
+            with request_priority(Priority.PERIODIC):
+                data = await self.refresh(address)
+            if data:
+                self._position_value[address] = data.get('total_position_value', 0)
+                self.refreshes += 1
+            else:
+                self.failures += 1
+        except Exception as e:
+            self.failures += 1
+            logging.debug(f"调度刷新 {address[:10]}... 失败: {e}")
+        finally:
+            slots.release()
+            self._inflight.discard(address)
+            self._refreshed_at[address] = time.time()
+            self._schedule(address, time.time() + self.interval_for(address))
+
+    def _schedule(self, address: str, due: float):
+        self._due_at[address] = due
+        heapq.heappush(self._heap, (due, address))
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    def _pull_forward(self, address: str):
+        """活跃度提高后按新的间隔提前到期时间（在事件循环中执行）"""
+        current = self._due_at.get(address)
+        if current is None or address in self._inflight:
+            return
+        due = self._refreshed_at.get(address, time.time()) + self.interval_for(address)
+        if due < current:
+            self._schedule(address, due)
+
+    def _decayed_activity(self, address: str, now: float) -> float:
+        """按半衰期衰减后的成交数（调用方需持有锁）"""
+        value, updated_at = self._activity.get(address, (0.0, now))
+        return value * math.pow(0.5, (now - updated_at) / self.ACTIVITY_HALF_LIFE)
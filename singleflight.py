@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+请求合并（singleflight） - 同一个键同时只执行一次获取，并发调用方共享同一个结果
+跨线程、跨事件循环可用：结果通过线程安全的 concurrent.futures.Future 传递给各自事件循环中的等待者
+"""
+import asyncio
+import concurrent.futures
+import threading
+from typing import Any, Awaitable, Callable, Dict
+
+
+class SingleFlight:
+    """跨线程/事件循环的请求合并（线程安全）
+
+    第一个调用方（leader）在自己的事件循环中执行获取，其他调用方等待同一个 Future。
+    等待者被取消（如 wait_for 超时）不会取消正在进行的获取；
+    leader 被取消时等待者重新发起获取
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._inflight: Dict[Any, concurrent.futures.Future] = {}
+        self.executions = 0
+        self.coalesced = 0
+        self.errors = 0
+
+    async def do(self, key: Any, fetch: Callable[[], Awaitable[Any]]) -> Any:
+        """执行或加入键对应的获取
+
+        Args:
+            key: 合并的键（如地址）
+            fetch: 创建获取协程的函数，只有 leader 会调用
+
+        Returns:
+            获取结果（所有并发调用方得到同一个对象）
+        """
+        while True:
+            with self._lock:
+                future = self._inflight.get(key)
+                leader = future is None
+                if leader:
+                    future = self._inflight[key] = concurrent.futures.Future()
+                    self.executions += 1
+                else:
+                    self.coalesced += 1
+
+            if leader:
+                return await self._lead(key, future, fetch)
+
+            try:
+                # shield：等待者被取消时不取消共享的 Future
+                return await asyncio.shield(asyncio.wrap_future(future))
+            except asyncio.CancelledError:
+                if not future.cancelled():
+                    raise
+                # leader 被取消，重新发起
+
+    def inflight(self) -> int:
+        with self._lock:
+            return len(self._inflight)
+
+    def stats(self) -> Dict:
+        """合并统计：实际执行次数、被合并的调用次数、失败次数、正在进行的获取数"""
+        with self._lock:
+            calls = self.executions + self.coalesced
+            return {
+                'executions': self.executions,
+                'coalesced': self.coalesced,
+                'errors': self.errors,
+                'inflight': len(self._inflight),
+                'coalesce_ratio': self.coalesced / calls if calls else 0.0,
+            }
+
+    async def _lead(self, key: Any, future: concurrent.futures.Future, fetch: Callable[[], Awaitable[Any]]) -> Any:
+        try:
+            result = await fetch()
+        except asyncio.CancelledError:
+            self._finish(key, future)
+            future.cancel()
+            raise
+        except BaseException as e:
+            with self._lock:
+                self.errors += 1
+            self._finish(key, future)
+            future.set_exception(e)
+            raise
+        self._finish(key, future)
+        future.set_result(result)
+        return result
+
+    def _finish(self, key: Any, future: concurrent.futures.Future):
+        """获取结束：之后的调用方发起新的获取"""
+        with self._lock:
+            if self._inflight.get(key) is future:
+                del self._inflight[key]
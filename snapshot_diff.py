@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+"""
+快照差异 - 比较同一地址前后两次REST快照，找出实际发生的变化
+- 持仓：开仓、平仓、仓位变化、杠杆变化、爆仓价移动
+- 挂单：新挂单、撤单（或成交）
+账户指纹相同时直接跳过，没有变化的地址不做逐项比较
+"""
+import hashlib
+import math
+import threading
+import time
+from collections import defaultdict, deque
+from typing import Dict, List, Optional
+
+# 变化类型及显示名称
+CHANGE_LABELS = {
+    'position_opened': "开仓",
+    'position_closed': "平仓",
+    'position_resized': "仓位变化",
+    'leverage_changed': "杠杆变化",
+    'liquidation_moved': "爆仓价移动",
+    'order_placed': "新挂单",
+    'order_cancelled': "撤单/成交",
+}
+
+
+def _order_fields(order: Dict) -> Dict:
+    """挂单字段（兼容 {'order': {...}} 和扁平两种格式）"""
+    return order.get('order', order) if isinstance(order, dict) else {}
+
+
+def _order_key(order: Dict) -> str:
+    fields = _order_fields(order)
+    oid = fields.get('oid')
+    if oid is not None:
+        return str(oid)
+    return f"{fields.get('coin')}|{fields.get('side')}|{fields.get('limitPx')}|{fields.get('sz')}"
+
+
+def _liquidation_bucket(liquidation_px: Optional[float], threshold: float) -> Optional[int]:
+    """爆仓价所在的对数分档（相邻分档相差 threshold），移动达到 threshold 时一定跨档"""
+    if not liquidation_px or liquidation_px <= 0 or threshold <= 0:
+        return None
+    return math.floor(math.log(liquidation_px) / math.log1p(threshold))
+
+
+def account_fingerprint(account_data: Optional[Dict], liquidation_threshold: float = 0.01) -> str:
+    """账户指纹：持仓（币种、仓位、入场价、杠杆、爆仓价分档）和挂单的哈希，
+    不包含随标记价格变化的持仓价值和未实现盈亏
+
+    全仓持仓的爆仓价随标记价格持续变化，指纹中只记录按 liquidation_threshold 分档后的值，
+    小幅移动不会改变指纹；跨档但不足阈值的移动由逐项比较过滤
+    """
+    if not account_data:
+        return ""
+    positions = sorted(
+        (
+            p['coin'], p['raw_szi'], p['entry_px'], p.get('leverage', 0),
+            _liquidation_bucket(p.get('liquidation_px'), liquidation_threshold),
+        )
+        for p in account_data.get('positions', [])
+    )
+    orders = sorted(
+        (_order_key(o), str(_order_fields(o).get('sz')), str(_order_fields(o).get('limitPx')))
+        for o in account_data.get('open_orders', [])
+    )
+    return hashlib.blake2b(repr((positions, orders)).encode(), digest_size=16).hexdigest()
+
+
+def diff_accounts(old: Dict, new: Dict, liquidation_threshold: float = 0.01) -> List[Dict]:
+    """比较两次快照
+
+    Args:
+        old: 上一次的账户数据
+        new: 新的账户数据
+        liquidation_threshold: 爆仓价相对移动超过该比例才记为变化
+
+    Returns:
+        变化列表，每项包含 type、coin 及相应的前后值
+    """
+    changes = []
+
+    old_positions = {p['coin']: p for p in old.get('positions', [])}
+    new_positions = {p['coin']: p for p in new.get('positions', [])}
+
+    for coin, pos in new_positions.items():
+        before = old_positions.get(coin)
+        if before is None or before['raw_szi'] * pos['raw_szi'] < 0:
+            if before is not None:
+                changes.append({'type': 'position_closed', 'coin': coin, 'old_szi': before['raw_szi'], 'new_szi': 0})
+            changes.append({
+                'type': 'position_opened', 'coin': coin,
+                'old_szi': 0, 'new_szi': pos['raw_szi'], 'entry_px': pos['entry_px'],
+            })
+            continue
+
+        if abs(pos['raw_szi'] - before['raw_szi']) > 1e-9 * max(1.0, abs(before['raw_szi'])):
+            changes.append({
+                'type': 'position_resized', 'coin': coin,
+                'old_szi': before['raw_szi'], 'new_szi': pos['raw_szi'], 'entry_px': pos['entry_px'],
+            })
+        if pos.get('leverage') and before.get('leverage') and pos['leverage'] != before['leverage']:
+            changes.append({
+                'type': 'leverage_changed', 'coin': coin,
+                'old_leverage': before['leverage'], 'new_leverage': pos['leverage'],
+            })
+        old_liq, new_liq = before.get('liquidation_px') or 0, pos.get('liquidation_px') or 0
+        # 成交推算的新仓位爆仓价为 0（未知），不视为移动
+        if old_liq and new_liq and abs(new_liq - old_liq) / old_liq >= liquidation_threshold:
+            changes.append({
+                'type': 'liquidation_moved', 'coin': coin,
+                'old_liquidation_px': old_liq, 'new_liquidation_px': new_liq,
+            })
+
+    for coin, before in old_positions.items():
+        if coin not in new_positions:
+            changes.append({'type': 'position_closed', 'coin': coin, 'old_szi': before['raw_szi'], 'new_szi': 0})
+
+    old_orders = {_order_key(o): _order_fields(o) for o in old.get('open_orders', [])}
+    new_orders = {_order_key(o): _order_fields(o) for o in new.get('open_orders', [])}
+    for key, fields in new_orders.items():
+        if key not in old_orders:
+            changes.append({
+                'type': 'order_placed', 'coin': fields.get('coin'), 'oid': fields.get('oid'),
+                'side': fields.get('side'), 'sz': fields.get('sz'), 'limit_px': fields.get('limitPx'),
+            })
+    for key, fields in old_orders.items():
+        if key not in new_orders:
+            changes.append({
+                'type': 'order_cancelled', 'coin': fields.get('coin'), 'oid': fields.get('oid'),
+                'side': fields.get('side'), 'sz': fields.get('sz'), 'limit_px': fields.get('limitPx'),
+            })
+
+    return changes
+
+
+def format_change(change: Dict) -> str:
+    """单行文本描述"""
+    kind = change['type']
+    label = CHANGE_LABELS.get(kind, kind)
+    coin = change.get('coin')
+    if kind in ('position_opened', 'position_closed', 'position_resized'):
+        return f"{label} {coin}: {change['old_szi']:,.4f} → {change['new_szi']:,.4f}"
+    if kind == 'leverage_changed':
+        return f"{label} {coin}: {change['old_leverage']:g}x → {change['new_leverage']:g}x"
+    if kind == 'liquidation_moved':
+        return f"{label} {coin}: ${change['old_liquidation_px']:,.4f} → ${change['new_liquidation_px']:,.4f}"
+    side = "买入" if change.get('side') == 'B' else "卖出"
+    return f"{label} {coin} {side} {change.get('sz')} @ {change.get('limit_px')}"
+
+
+class SnapshotDiffer:
+    """按地址比较相邻快照并保留最近的变化（线程安全）"""
+
+    def __init__(self, liquidation_threshold: float = 0.01, history: int = 500):
+        """
+        Args:
+            liquidation_threshold: 爆仓价相对移动超过该比例才记为变化
+            history: 保留的最近变化条数（用于报告）
+        """
+        self.liquidation_threshold = liquidation_threshold
+        self._lock = threading.Lock()
+        # {address: 最近一次快照的指纹}
+        self._fingerprints: Dict[str, str] = {}
+        self._recent: deque = deque(maxlen=history)
+
+        self.compared = 0
+        self.skipped = 0
+        self.counts: Dict[str, int] = defaultdict(int)
+
+    def compare(self, address: str, old: Optional[Dict], new: Dict) -> List[Dict]:
+        """比较地址的前后快照（指纹相同时跳过）
+
+        Args:
+            address: 用户地址
+            old: 上一次的账户数据（没有时只记录指纹）
+            new: 新的账户数据
+
+        Returns:
+            变化列表
+        """
+        fingerprint = account_fingerprint(new, self.liquidation_threshold)
+        with self._lock:
+            previous = self._fingerprints.get(address)
+            self._fingerprints[address] = fingerprint
+        if old is None:
+            return []
+        if previous is None:
+            previous = account_fingerprint(old, self.liquidation_threshold)
+        if previous == fingerprint:
+            with self._lock:
+                self.skipped += 1
+            return []
+
+        changes = diff_accounts(old, new, self.liquidation_threshold)
+        now = time.time()
+        with self._lock:
+            self.compared += 1
+            for change in changes:
+                self.counts[change['type']] += 1
+                self._recent.append(dict(change, address=address, detected_at=now))
+        return changes
+
+    def recent(self, limit: Optional[int] = None) -> List[Dict]:
+        """最近的变化（新的在前）"""
+        with self._lock:
+            items = list(self._recent)
+        items.reverse()
+        return items[:limit] if limit else items
+
+    def forget(self, address: str):
+        with self._lock:
+            self._fingerprints.pop(address, None)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                'compared': self.compared,
+                'skipped': self.skipped,
+                'changes': dict(self.counts),
+            }
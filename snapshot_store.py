@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+账户快照持久化 - 账户数据缓存写穿到本地 SQLite（WAL 模式）
+重启时先加载上次的快照并立即订阅，再在后台重新验证，不必等待全量 REST 获取
+"""
+import json
+import logging
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Iterable, Optional, Tuple
+
+
+class SnapshotStore:
+    """账户快照存储（线程安全）
+
+    save / delete 只记录每个地址的最新操作，由后台线程按间隔批量写入一个事务，
+    成交频繁的地址在一个间隔内只写一次，调用方不会阻塞在磁盘IO上
+    """
+
+    def __init__(self, path: str, flush_interval: float = 1.0):
+        """
+        Args:
+            path: 数据库文件路径（目录不存在时自动创建）
+            flush_interval: 批量写入间隔（秒）
+        """
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.flush_interval = flush_interval
+
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS snapshots ("
+            " address TEXT PRIMARY KEY,"
+            " timestamp REAL NOT NULL,"
+            " data TEXT NOT NULL)"
+        )
+        self._conn.commit()
+        self._db_lock = threading.Lock()
+
+        # 待写入的最新快照 {address: (timestamp, data)}，None 表示待删除
+        self._pending: Dict[str, Optional[Tuple[float, Dict]]] = {}
+        self._cond = threading.Condition()
+        self._running = True
+        self.writes = 0
+        self.flushes = 0
+
+        self._thread = threading.Thread(target=self._writer, name="snapshot-writer", daemon=True)
+        self._thread.start()
+
+    def save(self, address: str, data: Dict, timestamp: float):
+        """记录地址的最新快照（异步写入）"""
+        with self._cond:
+            self._pending[address] = (timestamp, data)
+
+    def load(self, addresses: Iterable[str], max_age: Optional[float] = None) -> Dict[str, Tuple[Dict, float]]:
+        """读取地址的快照
+
+        Args:
+            addresses: 地址列表
+            max_age: 最大年龄（秒），更旧的快照不返回
+
+        Returns:
+            {address: (账户数据, 写入缓存时的时间戳)}
+        """
+        wanted = set(addresses)
+        with self._cond:
+            # 已请求删除但尚未写入的地址
+            wanted -= {address for address, item in self._pending.items() if item is None}
+        cutoff = time.time() - max_age if max_age is not None else 0
+        result = {}
+        with self._db_lock:
+            rows = self._conn.execute(
+                "SELECT address, timestamp, data FROM snapshots WHERE timestamp >= ?", (cutoff,)
+            ).fetchall()
+        for address, timestamp, raw in rows:
+            if address not in wanted:
+                continue
+            try:
+                result[address] = (json.loads(raw), timestamp)
+            except ValueError:
+                logging.debug(f"快照损坏，已忽略: {address[:10]}...")
+        return result
+
+    def delete(self, addresses: Iterable[str]):
+        """删除地址的快照（与写入一样由后台线程批量执行）"""
+        with self._cond:
+            for address in addresses:
+                self._pending[address] = None
+
+    def flush(self):
+        """立即写入所有待写快照"""
+        with self._cond:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return
+
+        rows = []
+        deleted = []
+        for address, item in pending.items():
+            if item is None:
+                deleted.append((address,))
+                continue
+            timestamp, data = item
+            try:
+                rows.append((address, timestamp, json.dumps(data, default=str)))
+            except (TypeError, ValueError) as e:
+                logging.debug(f"快照序列化失败 {address[:10]}...: {e}")
+
+        with self._db_lock:
+            self._conn.executemany(
+                "INSERT INTO snapshots (address, timestamp, data) VALUES (?, ?, ?) "
+                "ON CONFLICT(address) DO UPDATE SET timestamp = excluded.timestamp, data = excluded.data",
+                rows
+            )
+            self._conn.executemany("DELETE FROM snapshots WHERE address = ?", deleted)
+            self._conn.commit()
+        self.writes += len(rows)
+        self.flushes += 1
+
+    def close(self):
+        """写入剩余快照并关闭数据库"""
+        if not self._running:
+            return
+        self._running = False
+        with self._cond:
+            self._cond.notify_all()
+        self._thread.join(timeout=5)
+        self.flush()
+        with self._db_lock:
+            self._conn.close()
+
+    def stats(self) -> Dict:
+        with self._cond:
+            pending = len(self._pending)
+        return {'pending': pending, 'writes': self.writes, 'flushes': self.flushes}
+
+    def _writer(self):
+        while self._running:
+            with self._cond:
+                self._cond.wait(self.flush_interval)
+            try:
+                self.flush()
+            except sqlite3.Error as e:
+                logging.warning(f"⚠️  写入快照失败: {e}")
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+测试成交去重索引和成交水位线
+"""
+import time
+
+from backfill import FillWatermarks, fill_key
+from fill_dedup import FillDeduplicator
+
+
+def _fill(tid=None, ts=1000, oid=1) -> dict:
+    fill = {'hash': "0xabc", 'oid': oid, 'time': ts}
+    if tid is not None:
+        fill['tid'] = tid
+    return fill
+
+
+def test_fill_key_prefers_tid():
+    assert fill_key(_fill(tid=7)) == "7"
+    assert fill_key(_fill(oid=1)) != fill_key(_fill(oid=2))
+
+
+def test_duplicate_is_reported_once_per_address():
+    dedup = FillDeduplicator()
+    assert dedup.add("0xa", _fill(tid=1))
+    assert not dedup.add("0xa", _fill(tid=1))
+    # 不同地址的同一标识互不影响
+    assert dedup.add("0xb", _fill(tid=1))
+    assert dedup.stats() == {'addresses': 2, 'entries': 2, 'duplicates': 1}
+
+    dedup.forget("0xa")
+    assert dedup.add("0xa", _fill(tid=1))
+
+
+def test_index_is_bounded_per_address():
+    dedup = FillDeduplicator(max_per_address=3)
+    for tid in range(5):
+        assert dedup.add("0xa", _fill(tid=tid))
+    assert dedup.stats()['entries'] == 3
+    # 最早的记录已淘汰
+    assert dedup.add("0xa", _fill(tid=0))
+    assert not dedup.add("0xa", _fill(tid=4))
+
+
+def test_entries_expire_after_window():
+    dedup = FillDeduplicator(window=0.05)
+    assert dedup.add("0xa", _fill(tid=1))
+    time.sleep(0.1)
+    assert dedup.add("0xa", _fill(tid=1))
+    assert dedup.stats()['duplicates'] == 0
+
+
+def test_watermark_tracks_fills_at_the_same_millisecond():
+    watermarks = FillWatermarks()
+    assert watermarks.get("0xa") is None
+    assert not watermarks.is_processed("0xa", _fill(tid=1))
+
+    watermarks.advance("0xa", _fill(tid=1, ts=1000))
+    watermarks.advance("0xa", _fill(tid=2, ts=1000))
+    assert watermarks.get("0xa") == 1000
+    assert watermarks.is_processed("0xa", _fill(tid=1, ts=1000))
+    assert watermarks.is_processed("0xa", _fill(tid=2, ts=1000))
+    # 同一毫秒内未处理的成交
+    assert not watermarks.is_processed("0xa", _fill(tid=3, ts=1000))
+    assert watermarks.is_processed("0xa", _fill(tid=9, ts=999))
+    assert not watermarks.is_processed("0xa", _fill(tid=9, ts=1001))
+
+    # 较早的成交不会让水位线倒退
+    watermarks.advance("0xa", _fill(tid=0, ts=500))
+    assert watermarks.get("0xa") == 1000
+
+
+def test_touch_only_moves_forward():
+    watermarks = FillWatermarks()
+    watermarks.advance("0xa", _fill(tid=1, ts=1000))
+    watermarks.touch("0xa", 900)
+    assert watermarks.get("0xa") == 1000 and watermarks.is_processed("0xa", _fill(tid=1, ts=1000))
+
+    watermarks.touch("0xa", 2000)
+    assert watermarks.get("0xa") == 2000
+    assert not watermarks.is_processed("0xa", _fill(tid=5, ts=2000))
+
+
+if __name__ == "__main__":
+    for name, func in list(globals().items()):
+        if name.startswith("test_") and callable(func):
+            func()
+            print(f"✅ {name}")
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+测试成交驱动的持仓计算：开仓、加权平均入场价、减仓、反向和平仓
+"""
+import time
+
+from fill_ledger import UnknownEntryError, apply_fill, is_perp_coin
+
+
+def _fill(side: str, sz: float, px: float, start: float, closed_pnl: float = 0, coin: str = "BTC") -> dict:
+    return {
+        'coin': coin, 'side': side, 'sz': str(sz), 'px': str(px),
+        'startPosition': str(start), 'closedPnl': str(closed_pnl), 'time': 1,
+    }
+
+
+def test_open_long():
+    position = apply_fill(None, _fill('B', 2, 100, 0))
+    assert position['coin'] == "BTC"
+    assert position['raw_szi'] == 2 and position['size'] == 2
+    assert position['entry_px'] == 100
+    assert position['direction_short'] == "Long"
+    assert position['liquidation_px'] == 0
+
+
+def test_add_uses_weighted_average_entry():
+    position = apply_fill(None, _fill('B', 2, 100, 0))
+    position = apply_fill(position, _fill('B', 3, 200, 2))
+    assert position['raw_szi'] == 5
+    # (2 × 100 + 3 × 200) / 5
+    assert abs(position['entry_px'] - 160) < 1e-9
+    assert abs(position['unrealized_pnl'] - (200 - 160) * 5) < 1e-9
+
+    short = apply_fill(None, _fill('A', 1, 50, 0))
+    short = apply_fill(short, _fill('A', 3, 30, -1))
+    assert short['raw_szi'] == -4 and short['direction_short'] == "Short"
+    assert abs(short['entry_px'] - 35) < 1e-9
+
+
+def test_reduce_keeps_entry_and_accumulates_realized_pnl():
+    position = apply_fill(None, _fill('B', 4, 100, 0))
+    reduced = apply_fill(position, _fill('A', 1, 120, 4, closed_pnl=20))
+    assert reduced['raw_szi'] == 3
+    assert reduced['entry_px'] == 100
+    assert reduced['realized_pnl'] == 20
+    # 不修改传入的持仓
+    assert position['raw_szi'] == 4 and position['realized_pnl'] == 0
+
+
+def test_flip_resets_entry_and_close_returns_none():
+    position = apply_fill(None, _fill('B', 2, 100, 0))
+    position['liquidation_px'] = 80
+    flipped = apply_fill(position, _fill('A', 5, 90, 2, closed_pnl=-20))
+    assert flipped['raw_szi'] == -3
+    assert flipped['entry_px'] == 90
+    assert flipped['liquidation_px'] == 0
+
+    assert apply_fill(flipped, _fill('B', 3, 95, -3)) is None
+
+
+def test_missing_start_position_uses_current_size():
+    position = apply_fill(None, _fill('B', 2, 100, 0))
+    fill = _fill('B', 2, 300, 0)
+    del fill['startPosition']
+    position = apply_fill(position, fill)
+    assert position['raw_szi'] == 4
+    assert abs(position['entry_px'] - 200) < 1e-9
+
+
+def test_unknown_entry_is_not_guessed():
+    # 没有本地持仓但成交前已有仓位：加仓和减仓都无法计算入场价
+    for fill in (_fill('A', 2, 60000, 10), _fill('B', 2, 60000, 10)):
+        try:
+            apply_fill(None, fill)
+        except UnknownEntryError:
+            pass
+        else:
+            raise AssertionError("入场价未知时不应返回持仓")
+
+    # 反向开仓的入场价为成交价，不依赖之前的入场价
+    flipped = apply_fill(None, _fill('A', 12, 60000, 10))
+    assert flipped['raw_szi'] == -2 and flipped['entry_px'] == 60000
+    # 全部平仓同样不需要入场价
+    assert apply_fill(None, _fill('A', 10, 60000, 10)) is None
+
+
+def test_position_manager_defers_unknown_entry_to_snapshot():
+    from position_manager import PositionManager
+
+    manager = PositionManager(info_class=None, constants=None, base_url="http://127.0.0.1:9")
+    manager._write_entry("0xa", {
+        'data': {'positions': [], 'pnl_summary': {}, 'snapshot_time': 0},
+        'timestamp': time.time(),
+        'fills': [],
+    })
+    fill = dict(_fill('A', 2, 60000, 10), time=1000)
+    assert not manager.apply_fill("0xa", fill)
+
+    entry = manager.account_data_cache.peek("0xa")
+    assert entry['data']['positions'] == []
+    # 成交留在待重放列表中，下一次快照时应用
+    assert entry['fills'] == [fill]
+
+
+def test_total_pnl_follows_unrealized_only_without_history():
+    from position_manager import PositionManager
+
+    manager = PositionManager(info_class=None, constants=None, base_url="http://127.0.0.1:9")
+    position = apply_fill(None, _fill('B', 1, 100, 0))
+    fill = _fill('B', 1, 110, 1)
+    for has_history, expected_total in ((False, 10.0), (True, 0.0)):
+        # 有历史时 Total PnL 恰好等于未实现盈亏也不应被覆盖
+        data = {'positions': [position], 'pnl_summary': {
+            'total_pnl': 0.0, 'unrealized_pnl': 0.0, 'has_history': has_history,
+        }}
+        summary = manager._apply_fill_to_data(data, fill)['pnl_summary']
+        assert summary['unrealized_pnl'] == 10.0
+        assert summary['total_pnl'] == expected_total
+
+
+def test_is_perp_coin():
+    assert is_perp_coin("BTC")
+    assert not is_perp_coin("@107")
+    assert not is_perp_coin("PURR/USDC")
+    assert not is_perp_coin(None)
+
+
+if __name__ == "__main__":
+    for name, func in list(globals().items()):
+        if name.startswith("test_") and callable(func):
+            func()
+            print(f"✅ {name}")
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+测试事件接收队列的溢出处理和成交水位线冻结
+"""
+import threading
+import time
+
+from backfill import FillWatermarks
+from ingest_queue import IngestQueue, OverflowPolicy
+
+
+def _blocked_queue(policy: str, max_size: int = 2, block_timeout: float = 0.05):
+    """单工作线程的队列，处理函数阻塞到 release 被设置"""
+    release = threading.Event()
+    handled = []
+    dropped = []
+
+    def handler(address, event):
+        release.wait(5)
+        handled.append(event['n'])
+
+    queue = IngestQueue(
+        handler, max_size=max_size, workers=1, overflow_policy=policy,
+        block_timeout=block_timeout, on_drop=lambda address, event: dropped.append(event['n'])
+    )
+    queue.start()
+    # 第一个事件被工作线程取出后阻塞，之后的事件留在队列中
+    queue.put("0xa", {'n': 0})
+    deadline = time.time() + 2
+    while queue.depth() and time.time() < deadline:
+        time.sleep(0.01)
+    return queue, release, handled, dropped
+
+
+def test_default_policy_does_not_block():
+    queue = IngestQueue(lambda address, event: None)
+    assert queue.overflow_policy == OverflowPolicy.DROP_OLDEST
+
+
+def test_drop_oldest_reports_dropped_event():
+    queue, release, handled, dropped = _blocked_queue(OverflowPolicy.DROP_OLDEST)
+    for n in (1, 2, 3):
+        assert queue.put("0xa", {'n': n})
+    assert dropped == [1]
+
+    release.set()
+    queue.stop()
+    assert handled == [0, 2, 3]
+    assert queue.stats()['dropped'] == 1
+
+
+def test_drop_newest_reports_dropped_event():
+    queue, release, handled, dropped = _blocked_queue(OverflowPolicy.DROP_NEWEST)
+    assert queue.put("0xa", {'n': 1})
+    assert queue.put("0xa", {'n': 2})
+    assert not queue.put("0xa", {'n': 3})
+    assert dropped == [3]
+
+    release.set()
+    queue.stop()
+    assert handled == [0, 1, 2]
+
+
+def test_block_waits_then_drops_on_timeout():
+    queue, release, handled, dropped = _blocked_queue(OverflowPolicy.BLOCK)
+    queue.put("0xa", {'n': 1})
+    queue.put("0xa", {'n': 2})
+
+    start = time.monotonic()
+    assert not queue.put("0xa", {'n': 3})
+    assert time.monotonic() - start >= 0.04
+    assert dropped == [3]
+
+    # 有空位后 BLOCK 策略正常入队
+    release.set()
+    assert queue.put("0xa", {'n': 4})
+    queue.stop()
+    assert handled == [0, 1, 2, 4]
+
+
+def test_held_watermark_does_not_advance():
+    watermarks = FillWatermarks()
+    watermarks.touch("0xa", 1000)
+    watermarks.hold("0xa")
+
+    watermarks.advance("0xa", {'tid': 1, 'time': 2000})
+    assert watermarks.get("0xa") == 1000
+    assert not watermarks.is_processed("0xa", {'tid': 2, 'time': 1500})
+
+    watermarks.release("0xa")
+    watermarks.advance("0xa", {'tid': 1, 'time': 2000})
+    assert watermarks.get("0xa") == 2000
+
+
+if __name__ == "__main__":
+    for name, func in list(globals().items()):
+        if name.startswith("test_") and callable(func):
+            func()
+            print(f"✅ {name}")
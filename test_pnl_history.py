@@ -0,0 +1,39 @@
+#!/usr/bin/env python3
+"""
+测试PnL历史缓存：阶段性PnL计算和无效响应的请求间隔
+"""
+import time
+
+from pnl_history import PnlHistoryCache
+
+HOUR_MS = 3600 * 1000
+
+
+def test_summary_from_portfolio():
+    now = int(time.time() * 1000)
+    cache = PnlHistoryCache()
+    cache.merge("0xa", [
+        ['allTime', {'pnlHistory': [[now - 40 * 24 * HOUR_MS, "0"], [now, "500"]]}],
+        ['day', {'pnlHistory': [[now - 24 * HOUR_MS, "0"], [now, "100"]]}],
+    ])
+    summary = cache.summary("0xa")
+    assert summary['total_pnl'] == 500
+    assert abs(summary['pnl_24h'] - 100) < 1e-6
+    assert not cache.needs_refresh("0xa")
+
+
+def test_empty_or_invalid_response_is_not_retried_within_interval():
+    cache = PnlHistoryCache(refresh_interval=600)
+    for response in ([], None, [['day', {'pnlHistory': [["bad", "1"]]}]]):
+        cache.forget("0xa")
+        assert cache.needs_refresh("0xa")
+        cache.merge("0xa", response)
+        assert cache.summary("0xa") is None
+        assert not cache.needs_refresh("0xa")
+
+
+if __name__ == "__main__":
+    for name, func in list(globals().items()):
+        if name.startswith("test_") and callable(func):
+            func()
+            print(f"✅ {name}")
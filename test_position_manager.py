@@ -4,6 +4,7 @@
 """
 import asyncio
 import logging
+import sys
 from position_manager import PositionManager
 
 # 设置日志
@@ -12,8 +13,12 @@ logging.basicConfig(
     format='%(asctime)s - %(levelname)s - %(message)s'
 )
 
-async def test_position_manager():
-    """测试持仓管理器"""
+async def test_position_manager(base_url=None):
+    """测试持仓管理器
+    
+    Args:
+        base_url: API地址（默认主网，可传入本地模拟服务地址，如 http://127.0.0.1:8080）
+    """
     try:
         from hyperliquid.info import Info
         from hyperliquid.utils import constants
@@ -25,7 +30,7 @@ async def test_position_manager():
     test_address = "0x5d2f4460ac3514ada79f5d9838916e508ab39bb7"
     
     # 创建持仓管理器
-    manager = PositionManager(Info, constants)
+    manager = PositionManager(Info, constants, base_url=base_url)
     
     print("\n" + "=" * 80)
     print("测试1: 首次获取账户数据（应该从API获取）")
@@ -88,5 +93,5 @@ async def test_position_manager():
         print(f"   账户价值: ${account_data_3['account_value']:,.2f}")
 
 if __name__ == "__main__":
-    asyncio.run(test_position_manager())
+    asyncio.run(test_position_manager(sys.argv[1] if len(sys.argv) > 1 else None))
 
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+测试全局API权重预算：窗口限额、优先级份额和未来预留的叠加
+"""
+import random
+import time
+
+from rate_limiter import Priority, WeightBudget
+
+
+def _max_window_weight(budget: WeightBudget) -> float:
+    """以每条记录为终点的窗口中最大的总权重"""
+    entries = list(budget._entries)
+    return max(
+        (sum(w for ts, w in entries if end - budget.window < ts <= end) for end, _ in entries),
+        default=0.0
+    )
+
+
+def test_reserve_waits_for_window():
+    budget = WeightBudget(limit=10, window=1)
+    assert budget.reserve(10, Priority.BACKFILL) == 0
+    wait = budget.reserve(1, Priority.BACKFILL)
+    assert 0.9 < wait <= 1.0
+
+
+def test_periodic_share_leaves_room_for_higher_priorities():
+    budget = WeightBudget(limit=100, window=60)
+    assert budget.reserve(70, Priority.PERIODIC) == 0
+    assert budget.reserve(1, Priority.PERIODIC) > 0
+    # 被限速的定期刷新不会挡住通知和补齐
+    assert budget.reserve(19, Priority.NOTIFY) == 0
+    assert budget.reserve(10, Priority.BACKFILL) == 0
+
+
+def test_backfill_not_blocked_by_queued_periodic_reservations():
+    budget = WeightBudget(limit=100, window=60)
+    for _ in range(10):
+        budget.reserve(35, Priority.PERIODIC)
+    assert budget.reserve(30, Priority.BACKFILL) == 0
+    assert _max_window_weight(budget) <= budget.limit
+
+
+def test_future_reservations_never_exceed_limit():
+    random.seed(7)
+    budget = WeightBudget(limit=50, window=2)
+    priorities = list(Priority)
+    for _ in range(300):
+        budget.reserve(random.choice((2, 2, 2, 20)), random.choice(priorities))
+    assert _max_window_weight(budget) <= budget.limit + 1e-9
+
+
+def test_charge_items_adds_weight_for_fill_endpoints():
+    budget = WeightBudget(limit=1000, window=60)
+    budget.charge_items('userFillsByTime', [{}] * 45)
+    budget.charge_items('clearinghouseState', [{}] * 45)
+    assert budget.used() == 45 // WeightBudget.ITEMS_PER_WEIGHT
+
+
+def test_reserve_is_fast_with_many_pending_reservations():
+    budget = WeightBudget(limit=1200, window=60)
+    for _ in range(500):
+        budget.reserve(2, Priority.PERIODIC)
+    started = time.perf_counter()
+    budget.reserve(2, Priority.NOTIFY)
+    assert time.perf_counter() - started < 0.5
+
+
+if __name__ == "__main__":
+    for name, func in list(globals().items()):
+        if name.startswith("test_") and callable(func):
+            func()
+            print(f"✅ {name}")
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+测试快照差异：持仓和挂单的变化识别、指纹跳过
+"""
+from snapshot_diff import SnapshotDiffer, account_fingerprint, diff_accounts, format_change
+
+
+def _position(coin: str, szi: float, entry_px: float = 100, leverage: float = 10,
+              liquidation_px: float = 50, unrealized_pnl: float = 0) -> dict:
+    return {
+        'coin': coin, 'raw_szi': szi, 'entry_px': entry_px, 'leverage': leverage,
+        'liquidation_px': liquidation_px, 'unrealized_pnl': unrealized_pnl, 'position_value': abs(szi) * entry_px,
+    }
+
+
+def _order(oid: int, coin: str = "BTC", side: str = "B", sz: str = "1", px: str = "90") -> dict:
+    return {'order': {'oid': oid, 'coin': coin, 'side': side, 'sz': sz, 'limitPx': px}}
+
+
+def _account(positions=(), orders=()) -> dict:
+    return {'positions': list(positions), 'open_orders': list(orders)}
+
+
+def _types(changes) -> list:
+    return sorted((c['type'], c.get('coin')) for c in changes)
+
+
+def test_position_changes():
+    old = _account([_position("BTC", 1), _position("ETH", 2), _position("SOL", -3)])
+    new = _account([
+        _position("BTC", 1.5),
+        _position("ETH", 2, leverage=20, liquidation_px=60),
+        _position("SOL", 4),
+        _position("DOGE", 100),
+    ])
+    assert _types(diff_accounts(old, new)) == [
+        ('leverage_changed', 'ETH'),
+        ('liquidation_moved', 'ETH'),
+        ('position_closed', 'SOL'),
+        ('position_opened', 'DOGE'),
+        ('position_opened', 'SOL'),
+        ('position_resized', 'BTC'),
+    ]
+    assert _types(diff_accounts(new, _account([_position("BTC", 1.5)]))) == [
+        ('position_closed', 'DOGE'), ('position_closed', 'ETH'), ('position_closed', 'SOL'),
+    ]
+
+
+def test_small_or_unknown_liquidation_moves_are_ignored():
+    old = _account([_position("BTC", 1, liquidation_px=50)])
+    assert diff_accounts(old, _account([_position("BTC", 1, liquidation_px=50.4)])) == []
+    # 成交推算的仓位爆仓价为 0（未知）
+    assert diff_accounts(old, _account([_position("BTC", 1, liquidation_px=0)])) == []
+
+
+def test_order_changes():
+    old = _account(orders=[_order(1), _order(2)])
+    new = _account(orders=[_order(2), {'oid': 3, 'coin': "ETH", 'side': "A", 'sz': "5", 'limitPx': "4000"}])
+    changes = diff_accounts(old, new)
+    assert _types(changes) == [('order_cancelled', 'BTC'), ('order_placed', 'ETH')]
+    placed = next(c for c in changes if c['type'] == 'order_placed')
+    assert format_change(placed) == "新挂单 ETH 卖出 5 @ 4000"
+
+
+def test_fingerprint_ignores_mark_dependent_fields():
+    account = _account([_position("BTC", 1)], [_order(1)])
+    moved = _account([_position("BTC", 1, unrealized_pnl=500)], [_order(1)])
+    moved['positions'][0]['position_value'] = 12345
+    assert account_fingerprint(account) == account_fingerprint(moved)
+    assert account_fingerprint(account) != account_fingerprint(_account([_position("BTC", 2)], [_order(1)]))
+    assert account_fingerprint(None) == ""
+
+
+def test_fingerprint_buckets_liquidation_price():
+    base = account_fingerprint(_account([_position("BTC", 1, liquidation_px=50)]))
+    # 全仓爆仓价随标记价格的小幅移动不改变指纹
+    assert account_fingerprint(_account([_position("BTC", 1, liquidation_px=50.001)])) == base
+    # 达到阈值的移动一定改变指纹（向上和向下）
+    for liquidation_px in (50.5, 49.5, 60, 0):
+        moved = _account([_position("BTC", 1, liquidation_px=liquidation_px)])
+        assert account_fingerprint(moved) != base, liquidation_px
+
+    coarse = account_fingerprint(_account([_position("BTC", 1, liquidation_px=50)]), liquidation_threshold=0.2)
+    assert account_fingerprint(_account([_position("BTC", 1, liquidation_px=50.5)]), 0.2) == coarse
+
+
+def test_differ_skips_unchanged_and_records_recent():
+    differ = SnapshotDiffer()
+    first = _account([_position("BTC", 1)])
+    assert differ.compare("0xa", None, first) == []
+
+    drifted = _account([_position("BTC", 1, unrealized_pnl=10, liquidation_px=50.01)])
+    assert differ.compare("0xa", first, drifted) == []
+    assert differ.stats() == {'compared': 0, 'skipped': 1, 'changes': {}}
+
+    resized = _account([_position("BTC", 3)])
+    changes = differ.compare("0xa", first, resized)
+    assert _types(changes) == [('position_resized', 'BTC')]
+    assert differ.stats()['changes'] == {'position_resized': 1}
+    assert differ.recent(1)[0]['address'] == "0xa"
+    assert format_change(changes[0]) == "仓位变化 BTC: 1.0000 → 3.0000"
+
+
+if __name__ == "__main__":
+    for name, func in list(globals().items()):
+        if name.startswith("test_") and callable(func):
+            func()
+            print(f"✅ {name}")
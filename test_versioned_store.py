@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+测试版本化快照存储：版本隔离、删除和分片表的结构共享
+"""
+import threading
+
+from versioned_store import Table, VersionedStore
+
+
+def test_snapshot_is_isolated_from_later_publishes():
+    store = VersionedStore()
+    store.put('accounts', '0xa', {'v': 1})
+    before = store.snapshot()
+
+    store.put('accounts', '0xa', {'v': 2})
+    store.put('accounts', '0xb', {'v': 3})
+
+    assert before.get('accounts', '0xa') == {'v': 1}
+    assert '0xb' not in before.table('accounts')
+    assert store.snapshot().get('accounts', '0xa') == {'v': 2}
+    assert store.version == before.version + 2
+
+
+def test_publish_batch_is_one_version_and_none_deletes():
+    store = VersionedStore()
+    store.publish('accounts', {'0xa': 1, '0xb': 2, '0xc': 3})
+    assert store.version == 1
+    assert len(store.snapshot().table('accounts')) == 3
+
+    store.publish('accounts', {'0xa': None, '0xmissing': None, '0xb': 20})
+    table = store.snapshot().table('accounts')
+    assert dict(table) == {'0xb': 20, '0xc': 3}
+    assert len(table) == 2
+
+
+def test_missing_table_is_empty():
+    snapshot = VersionedStore().snapshot()
+    assert len(snapshot.table('positions')) == 0
+    assert snapshot.get('positions', '0xa', 'default') == 'default'
+
+
+def test_update_copies_only_touched_shard():
+    table = Table().updated({f"0x{i}": i for i in range(1000)})
+    updated = table.updated({'0x1': -1})
+
+    assert updated['0x1'] == -1 and table['0x1'] == 1
+    shared = sum(1 for a, b in zip(table._shards, updated._shards) if a is b)
+    assert shared == Table.SHARDS - 1
+
+
+def test_concurrent_writers_do_not_lose_updates():
+    store = VersionedStore()
+
+    def writer(prefix):
+        for i in range(200):
+            store.put('accounts', f"{prefix}{i}", i)
+
+    threads = [threading.Thread(target=writer, args=(f"w{n}-",)) for n in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(store.snapshot().table('accounts')) == 800
+    assert store.version == 800
+
+
+if __name__ == "__main__":
+    for name, func in list(globals().items()):
+        if name.startswith("test_") and callable(func):
+            func()
+            print(f"✅ {name}")
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+测试连接池对握手卡住的连接的处理：超时后移出连接池，订阅改投其他连接
+"""
+import base64
+import hashlib
+import socket
+import threading
+import time
+
+from ws_pool import WebSocketPool
+
+WS_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+
+
+class StallingServer:
+    """前 stall 条连接接受后不响应握手，之后的连接完成握手并保持打开"""
+
+    def __init__(self, stall: int):
+        self.stall = stall
+        self.accepted = 0
+        self.sock = socket.socket()
+        self.sock.bind(("127.0.0.1", 0))
+        self.sock.listen(16)
+        self.port = self.sock.getsockname()[1]
+        self.clients = []
+        threading.Thread(target=self._serve, daemon=True).start()
+
+    def _serve(self):
+        while True:
+            try:
+                client, _ = self.sock.accept()
+            except OSError:
+                return
+            self.accepted += 1
+            self.clients.append(client)
+            if self.accepted > self.stall:
+                threading.Thread(target=self._handshake, args=(client,), daemon=True).start()
+
+    @staticmethod
+    def _handshake(client):
+        request = b""
+        while b"\r\n\r\n" not in request:
+            request += client.recv(4096)
+        key = next(
+            line.split(b":", 1)[1].strip() for line in request.split(b"\r\n")
+            if line.lower().startswith(b"sec-websocket-key")
+        )
+        accept = base64.b64encode(hashlib.sha1(key + WS_GUID.encode()).digest())
+        client.sendall(
+            b"HTTP/1.1 101 Switching Protocols\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n"
+            b"Sec-WebSocket-Accept: " + accept + b"\r\n\r\n"
+        )
+
+    def close(self):
+        self.sock.close()
+        for client in self.clients:
+            client.close()
+
+
+def _pool(server: StallingServer, **kwargs) -> WebSocketPool:
+    return WebSocketPool(
+        f"http://127.0.0.1:{server.port}", on_event=lambda address, event: None,
+        connect_timeout=0.5, ping_interval=60, **kwargs
+    )
+
+
+def test_stuck_handshake_is_rerouted():
+    server = StallingServer(stall=1)
+    pool = _pool(server)
+    try:
+        addresses = [f"0x{i:040x}" for i in range(3)]
+        results = []
+        threads = [threading.Thread(target=lambda a=a: results.append(pool.subscribe(a))) for a in addresses]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(5)
+
+        assert results == [True, True, True]
+        assert all(pool.is_subscribed(a) for a in addresses)
+        # 卡住的连接已移出，只剩改投后的连接
+        assert pool.stats()['connections'] == 1
+        assert 1 not in pool._connections
+    finally:
+        pool.close()
+        server.close()
+
+
+def test_stuck_connection_is_not_picked_again():
+    server = StallingServer(stall=10)
+    pool = _pool(server)
+    try:
+        start = time.monotonic()
+        assert not pool.subscribe("0xa")
+        # 只改投一次
+        assert time.monotonic() - start < 2
+        assert server.accepted == 2
+        stats = pool.stats()
+        assert stats['connections'] == 0 and stats['subscriptions'] == 0
+    finally:
+        pool.close()
+        server.close()
+
+
+if __name__ == "__main__":
+    for name, func in list(globals().items()):
+        if name.startswith("test_") and callable(func):
+            func()
+            print(f"✅ {name}")
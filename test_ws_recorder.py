@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+测试流量回放：录制的成交经离线监控器处理，全程不访问网络
+"""
+import json
+import os
+import socket
+import tempfile
+import time
+
+from monitor_utils import Config
+from ws_recorder import OfflineWhaleMonitor, TrafficRecorder, iter_recording, replay
+
+USER = "0x5d2f4460ac3514ada79f5d9838916e508ab39bb7"
+
+
+def _fill_frame(tid: int, coin: str, side: str, sz: str, px: str, start_position: str, ts_ms: int) -> str:
+    fill = {
+        'coin': coin, 'side': side, 'sz': sz, 'px': px, 'tid': tid, 'oid': tid,
+        'hash': f"0x{tid:064x}", 'time': ts_ms, 'startPosition': start_position,
+        'closedPnl': "0", 'dir': "Open Long", 'crossed': True, 'fee': "0",
+    }
+    return json.dumps({'channel': 'userFills', 'data': {'user': USER, 'fills': [fill]}})
+
+
+def _record(path: str):
+    recorder = TrafficRecorder(path=path)
+    now_ms = int(time.time() * 1000)
+    recorder.record(json.dumps({'channel': 'subscriptionResponse', 'data': {}}))
+    recorder.record(_fill_frame(1, "BTC", "B", "50", "60000", "0", now_ms + 1000))
+    recorder.record(_fill_frame(2, "@107", "B", "100000", "30", "0", now_ms + 1001))
+    recorder.record(_fill_frame(2, "@107", "B", "100000", "30", "0", now_ms + 1001))
+    recorder.close()
+
+
+def test_replay_is_offline():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "traffic.jsonl.gz")
+        _record(path)
+        assert sum(1 for _ in iter_recording(path)) == 4
+
+        config = Config(os.path.join(tmp, "missing.json"))
+        config.config['api'] = {'base_url': "http://127.0.0.1:9"}
+        config.config['monitor']['max_addresses'] = 1
+        config.config.setdefault('notification', {})['console'] = True
+
+        connects = []
+        original_connect = socket.socket.connect
+
+        def guarded_connect(sock, address):
+            connects.append(address)
+            raise OSError("回放中不应建立网络连接")
+
+        socket.socket.connect = guarded_connect
+        try:
+            monitor = OfflineWhaleMonitor([USER], config)
+            assert monitor.position_manager is None and monitor.snapshot_store is None
+            stats = replay(path, monitor, speed=None)
+        finally:
+            socket.socket.connect = original_connect
+
+        assert connects == []
+        assert monitor.http_requests() == 0
+        assert stats['events'] == 3 and stats['fills'] == 3
+        assert stats['latency_max_ms'] < 1000
+        # 重复成交只处理一次
+        assert monitor.fill_dedup.stats()['duplicates'] == 1
+        assert monitor.tracker.positions[USER]['BTC'] == 50
+
+
+if __name__ == "__main__":
+    for name, func in list(globals().items()):
+        if name.startswith("test_") and callable(func):
+            func()
+            print(f"✅ {name}")
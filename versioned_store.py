@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+版本化快照存储 - 写入方原子地发布新版本，读取方无锁读取一致的版本
+持仓管理器写入；报告、通知、看板读取，渲染不会阻塞写入，也不会读到更新了一半的状态
+"""
+import threading
+import time
+from dataclasses import dataclass, field
+from types import MappingProxyType
+from typing import Any, Dict, Iterator, Mapping, Optional, Tuple
+
+_EMPTY: Mapping = MappingProxyType({})
+_MISSING = object()
+
+
+class Table(Mapping):
+    """持久化的只读表：键按哈希分到固定数量的分片，更新时只复制被修改的分片，
+    未修改的分片在新旧版本之间共享，单个键的写入不随表的大小变慢
+    """
+
+    SHARDS = 64
+
+    __slots__ = ('_shards', '_len')
+
+    def __init__(self, shards: Optional[Tuple[Dict, ...]] = None, length: int = 0):
+        self._shards = shards or tuple({} for _ in range(self.SHARDS))
+        self._len = length
+
+    def __getitem__(self, key: Any) -> Any:
+        return self._shards[hash(key) % len(self._shards)][key]
+
+    def __iter__(self) -> Iterator:
+        for shard in self._shards:
+            yield from shard
+
+    def __len__(self) -> int:
+        return self._len
+
+    def updated(self, updates: Dict[Any, Optional[Any]]) -> "Table":
+        """返回应用更新后的新表（值为 None 表示删除该键），当前表不变"""
+        shards = list(self._shards)
+        copied: Dict[int, Dict] = {}
+        length = self._len
+        for key, value in updates.items():
+            idx = hash(key) % len(shards)
+            shard = copied.get(idx)
+            if shard is None:
+                shard = copied[idx] = shards[idx] = dict(shards[idx])
+            if value is None:
+                if shard.pop(key, _MISSING) is not _MISSING:
+                    length -= 1
+            else:
+                if key not in shard:
+                    length += 1
+                shard[key] = value
+        return Table(tuple(shards), length)
+
+
+_EMPTY_TABLE = Table()
+
+
+@dataclass(frozen=True)
+class Snapshot:
+    """一个只读版本：{表名: {键: 值}}
+
+    值按约定不可修改（写入方总是替换，从不原地修改）
+    """
+    version: int = 0
+    published_at: float = field(default_factory=time.time)
+    tables: Mapping[str, Mapping[str, Any]] = field(default_factory=lambda: _EMPTY)
+
+    def table(self, name: str) -> Mapping[str, Any]:
+        return self.tables.get(name, _EMPTY_TABLE)
+
+    def get(self, name: str, key: str, default: Any = None) -> Any:
+        return self.table(name).get(key, default)
+
+
+class VersionedStore:
+    """写时复制的版本化存储（线程安全）
+
+    写入方之间用锁串行化，每次发布只复制被修改的表中受影响的分片，并替换当前版本的引用；
+    读取方调用 snapshot() 取得当前版本后无需加锁，该版本之后不会再变化。
+    同一批更新应通过一次 publish 写入，共享一个版本
+    """
+
+    def __init__(self):
+        self._write_lock = threading.Lock()
+        self._current = Snapshot()
+
+    @property
+    def version(self) -> int:
+        return self._current.version
+
+    def snapshot(self) -> Snapshot:
+        """当前版本（无锁）"""
+        return self._current
+
+    def publish(self, name: str, updates: Dict[str, Optional[Any]]) -> Snapshot:
+        """发布一张表的更新
+
+        Args:
+            name: 表名
+            updates: {键: 新值}，值为 None 表示删除该键
+
+        Returns:
+            新版本
+        """
+        with self._write_lock:
+            current = self._current
+            tables = dict(current.tables)
+            tables[name] = current.table(name).updated(updates)
+            self._current = Snapshot(
+                version=current.version + 1,
+                tables=MappingProxyType(tables)
+            )
+            return self._current
+
+    def put(self, name: str, key: str, value: Optional[Any]) -> Snapshot:
+        """发布单个键的更新（None 表示删除）"""
+        return self.publish(name, {key: value})
@@ -0,0 +1,482 @@
+#!/usr/bin/env python3
+"""
+WebSocket 连接池 - 在少量连接上复用多个地址的订阅
+每条连接承载多个地址的成交订阅，整个连接池只使用固定数量的socket和线程
+"""
+import json
+import logging
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+import websocket
+
+from rate_limiter import TokenBucket
+
+
+def api_url_to_ws_url(base_url: str) -> str:
+    """将REST API地址转换为WebSocket地址（与SDK保持一致）
+
+    Args:
+        base_url: REST API地址，如 https://api.hyperliquid.xyz
+
+    Returns:
+        WebSocket地址，如 wss://api.hyperliquid.xyz/ws
+    """
+    return "ws" + base_url[len("http"):] + "/ws"
+
+
+def build_subscription(address: str) -> Dict:
+    """构造单个地址的订阅配置
+
+    SDK的 userEvents 频道推送的数据不带用户地址，同一连接上无法区分多个用户，
+    因此连接池使用 userFills 频道（数据中带 user 字段）来复用连接
+    """
+    return {"type": "userFills", "user": address}
+
+
+def parse_ws_message(raw: str) -> Optional[Tuple[str, Dict]]:
+    """解析连接池收到的原始消息
+
+    Args:
+        raw: 原始WebSocket文本帧
+
+    Returns:
+        (用户地址(小写), 与 userEvents 回调一致的事件数据)，非成交消息返回 None
+    """
+    try:
+        msg = json.loads(raw)
+    except (ValueError, TypeError):
+        logging.debug(f"无法解析的WebSocket消息: {raw[:200] if isinstance(raw, str) else raw}")
+        return None
+
+    if not isinstance(msg, dict) or msg.get('channel') != 'userFills':
+        return None
+
+    data = msg.get('data') or {}
+    user = data.get('user')
+    if not user:
+        return None
+
+    # 转换为 _handle_user_event 所需的 userEvents 格式
+    event_data = {'fills': data.get('fills', [])}
+    if data.get('isSnapshot'):
+        event_data['isSnapshot'] = True
+
+    return user.lower(), {'channel': 'user', 'data': event_data}
+
+
+class ConnectionHealth:
+    """连接活性追踪：应用层心跳 + 最后收到消息的时间
+
+    半开连接不会触发任何错误，只能通过"发出心跳后迟迟收不到消息"来识别
+    """
+
+    def __init__(self, ping_interval: float, ping_timeout: float):
+        """
+        Args:
+            ping_interval: 心跳间隔（秒）
+            ping_timeout: 心跳超时（秒），发出心跳后超过该时间仍无任何消息视为僵尸连接
+        """
+        self.ping_interval = ping_interval
+        self.ping_timeout = ping_timeout
+        now = time.monotonic()
+        self.last_message_at = now
+        self.last_ping_at = now
+
+    @property
+    def stale_after(self) -> float:
+        """无任何消息的最长容忍时间（秒）"""
+        return self.ping_interval + self.ping_timeout
+
+    def mark_message(self):
+        """收到任意消息（包括pong）"""
+        self.last_message_at = time.monotonic()
+
+    def mark_ping(self):
+        """已发送心跳"""
+        self.last_ping_at = time.monotonic()
+
+    def ping_due(self, now: Optional[float] = None) -> bool:
+        """是否需要发送心跳"""
+        now = now if now is not None else time.monotonic()
+        return now - self.last_ping_at >= self.ping_interval
+
+    def silence(self, now: Optional[float] = None) -> float:
+        """距最后一条消息的时间（秒）"""
+        now = now if now is not None else time.monotonic()
+        return now - self.last_message_at
+
+    def is_stale(self, now: Optional[float] = None) -> bool:
+        """连接是否已失活"""
+        now = now if now is not None else time.monotonic()
+        # 心跳已发出，但超时仍未收到任何消息
+        if self.last_ping_at > self.last_message_at and now - self.last_ping_at > self.ping_timeout:
+            return True
+        return self.silence(now) > self.stale_after
+
+
+class PooledConnection:
+    """连接池中的单条WebSocket连接"""
+
+    def __init__(self, conn_id: int, url: str, pool: 'WebSocketPool'):
+        self.conn_id = conn_id
+        self.url = url
+        self.pool = pool
+
+        # 该连接上承载的地址
+        self.addresses = set()
+        self.health = ConnectionHealth(pool.ping_interval, pool.ping_timeout)
+
+        self.opened = threading.Event()
+        self.closed = False
+        # 握手超时被移出连接池（连接既未建立也未断开）
+        self.stuck = False
+        self.created_at = time.monotonic()
+        self.send_lock = threading.Lock()
+
+        self.ws = websocket.WebSocketApp(
+            url,
+            on_open=self._on_open,
+            on_message=self._on_message,
+            on_error=self._on_error,
+            on_close=self._on_close,
+        )
+        self.thread = threading.Thread(
+            target=self.ws.run_forever,
+            name=f"ws-pool-{conn_id}",
+            daemon=True
+        )
+
+    @property
+    def connected(self) -> bool:
+        """连接是否已建立且未关闭"""
+        return self.opened.is_set() and not self.closed
+
+    def start(self):
+        """启动连接的读线程"""
+        self.thread.start()
+
+    def wait_open(self, timeout: float) -> bool:
+        """等待连接建立
+
+        Returns:
+            连接是否已可用
+        """
+        self.opened.wait(timeout)
+        return self.connected
+
+    def send(self, message: Dict):
+        """发送JSON消息（线程安全）"""
+        with self.send_lock:
+            self.ws.send(json.dumps(message))
+
+    def close(self):
+        """主动关闭连接"""
+        self.closed = True
+        try:
+            self.ws.close()
+        except Exception:
+            pass
+
+    def abort(self):
+        """强制断开（僵尸连接不等待关闭握手），读线程随即退出并触发断开处理"""
+        try:
+            if self.ws.sock:
+                self.ws.sock.abort()
+        except Exception as e:
+            logging.debug(f"强制断开连接 #{self.conn_id} 失败: {e}")
+
+    def _on_open(self, ws):
+        logging.debug(f"连接池连接 #{self.conn_id} 已建立")
+        self.health.mark_message()
+        self.health.mark_ping()
+        self.opened.set()
+
+    def _on_message(self, ws, message):
+        self.health.mark_message()
+        self.pool._dispatch(self, message)
+
+    def _on_error(self, ws, error):
+        logging.warning(f"⚠️  连接池连接 #{self.conn_id} 出错: {error}")
+
+    def _on_close(self, ws, *args):
+        self.closed = True
+        # 唤醒可能仍在等待连接建立的订阅者
+        self.opened.set()
+        self.pool._handle_connection_lost(self)
+
+
+class WebSocketPool:
+    """WebSocket连接池，每条连接承载多个地址的订阅"""
+
+    # 心跳线程的检查周期（秒）
+    HEALTH_CHECK_INTERVAL = 1
+
+    def __init__(
+        self,
+        base_url: str,
+        on_event: Callable[[str, Dict], None],
+        subscriptions_per_connection: int = 50,
+        max_connections: int = 10,
+        connect_timeout: float = 10,
+        on_disconnect: Optional[Callable[[List[str]], None]] = None,
+        ping_interval: float = 20,
+        ping_timeout: float = 10,
+        limiter: Optional[TokenBucket] = None,
+        on_raw_frame: Optional[Callable[[str], None]] = None
+    ):
+        """初始化连接池
+
+        Args:
+            base_url: REST API地址（自动转换为WebSocket地址）
+            on_event: 事件回调 (address, event_data)
+            subscriptions_per_connection: 每条连接最多承载的订阅数
+            max_connections: 最大连接数
+            connect_timeout: 建立连接的超时时间（秒）
+            on_disconnect: 连接断开时的回调，参数为该连接上失去订阅的地址列表
+            ping_interval: 应用层心跳间隔（秒）
+            ping_timeout: 心跳超时（秒），超时未收到任何消息的连接会被强制重连
+            limiter: 订阅请求限速器（连接数由 max_connections 限制）
+            on_raw_frame: 原始帧回调（用于流量录制），在解析之前调用
+        """
+        self.url = api_url_to_ws_url(base_url)
+        self.on_event = on_event
+        self.subscriptions_per_connection = max(1, subscriptions_per_connection)
+        self.max_connections = max(1, max_connections)
+        self.connect_timeout = connect_timeout
+        self.on_disconnect = on_disconnect
+        self.ping_interval = ping_interval
+        self.ping_timeout = ping_timeout
+        self.limiter = limiter
+        self.on_raw_frame = on_raw_frame
+
+        self._lock = threading.RLock()
+        # {conn_id: PooledConnection}
+        self._connections: Dict[int, PooledConnection] = {}
+        # {address: PooledConnection}
+        self._address_conn: Dict[str, PooledConnection] = {}
+        # {address.lower(): address}，服务端推送的地址为小写
+        self._canonical: Dict[str, str] = {}
+        self._next_conn_id = 1
+
+        self._running = True
+        self._stop_event = threading.Event()
+        self._keepalive_thread = threading.Thread(
+            target=self._keepalive_loop,
+            name="ws-pool-keepalive",
+            daemon=True
+        )
+        self._keepalive_thread.start()
+
+    def subscribe(self, address: str) -> bool:
+        """订阅单个地址（必要时创建新连接）
+
+        Args:
+            address: 用户地址
+
+        Returns:
+            是否订阅成功
+        """
+        # 连接握手卡住时移除该连接，订阅改投到另一条连接（只改投一次）
+        for attempt in range(2):
+            with self._lock:
+                if not self._running:
+                    return False
+
+                conn = self._address_conn.get(address)
+                if conn and not conn.closed:
+                    return True
+
+                conn = self._pick_connection()
+                if conn is None:
+                    logging.error(
+                        f"❌ 连接池已满 ({self.max_connections} 条连接 × "
+                        f"{self.subscriptions_per_connection} 个订阅)，无法订阅 {address[:10]}..."
+                    )
+                    return False
+
+                # 先占位，避免并发订阅超出单连接容量
+                conn.addresses.add(address)
+                self._address_conn[address] = conn
+                self._canonical[address.lower()] = address
+
+            if conn.wait_open(self.connect_timeout):
+                break
+
+            self._drop_stuck_connection(conn)
+            self._release(address, conn)
+            if not conn.stuck or attempt > 0:
+                logging.warning(f"⚠️  连接池连接 #{conn.conn_id} 未能建立，订阅 {address[:10]}... 失败")
+                return False
+            logging.info(f"🔀 连接 #{conn.conn_id} 握手超时，订阅 {address[:10]}... 改投其他连接")
+
+        if self.limiter:
+            self.limiter.acquire()
+
+        try:
+            conn.send({"method": "subscribe", "subscription": build_subscription(address)})
+        except Exception as e:
+            logging.warning(f"⚠️  发送订阅请求失败 {address[:10]}...: {e}")
+            self._release(address, conn)
+            return False
+
+        logging.debug(f"地址 {address[:10]}... 已订阅到连接 #{conn.conn_id}")
+        return True
+
+    def unsubscribe(self, address: str):
+        """取消单个地址的订阅"""
+        with self._lock:
+            conn = self._address_conn.pop(address, None)
+            self._canonical.pop(address.lower(), None)
+            if conn is None:
+                return
+            conn.addresses.discard(address)
+
+        if conn.connected:
+            try:
+                conn.send({"method": "unsubscribe", "subscription": build_subscription(address)})
+            except Exception as e:
+                logging.debug(f"发送取消订阅请求失败 {address[:10]}...: {e}")
+
+    def is_subscribed(self, address: str) -> bool:
+        """地址是否订阅在一条可用的连接上"""
+        conn = self._address_conn.get(address)
+        return conn is not None and conn.connected
+
+    def stats(self) -> Dict:
+        """连接池统计信息"""
+        with self._lock:
+            connections = list(self._connections.values())
+            live = [c for c in connections if c.connected]
+            return {
+                'connections': len(connections),
+                'connected': len(live),
+                'subscriptions': len(self._address_conn),
+                'capacity': self.max_connections * self.subscriptions_per_connection,
+                'max_silence': max((c.health.silence() for c in live), default=0.0),
+            }
+
+    def close(self):
+        """关闭所有连接"""
+        with self._lock:
+            self._running = False
+            connections = list(self._connections.values())
+            self._connections.clear()
+            self._address_conn.clear()
+
+        self._stop_event.set()
+        for conn in connections:
+            conn.close()
+            logging.debug(f"已关闭连接池连接 #{conn.conn_id}")
+
+    def _pick_connection(self) -> Optional[PooledConnection]:
+        """选择一条有空余容量的连接，没有则新建（调用方需持有锁）"""
+        for conn in self._connections.values():
+            if not conn.closed and len(conn.addresses) < self.subscriptions_per_connection:
+                return conn
+
+        if len(self._connections) >= self.max_connections:
+            return None
+
+        conn = PooledConnection(self._next_conn_id, self.url, self)
+        self._next_conn_id += 1
+        self._connections[conn.conn_id] = conn
+        conn.start()
+        logging.info(f"🔌 连接池新建连接 #{conn.conn_id} (当前 {len(self._connections)} 条)")
+        return conn
+
+    def _drop_stuck_connection(self, conn: PooledConnection):
+        """移除握手超时（既未建立也未断开）的连接，唤醒等待它的订阅者改投其他连接
+
+        这种连接不会触发断开回调，心跳线程也只检查已建立的连接，不移除会一直被选中
+        """
+        with self._lock:
+            if conn.opened.is_set() or self._connections.get(conn.conn_id) is not conn:
+                return
+            del self._connections[conn.conn_id]
+            conn.stuck = True
+            conn.closed = True
+            pending = len(conn.addresses)
+
+        logging.warning(f"⚠️  连接池连接 #{conn.conn_id} 握手超时，已移出连接池 ({pending} 个待订阅地址改投)")
+        # 等待中的订阅者看到 closed 后各自释放占位并改投
+        conn.opened.set()
+        conn.abort()
+        conn.close()
+
+    def _release(self, address: str, conn: PooledConnection):
+        """释放地址在连接上的占位"""
+        with self._lock:
+            conn.addresses.discard(address)
+            if self._address_conn.get(address) is conn:
+                del self._address_conn[address]
+
+    def _dispatch(self, conn: PooledConnection, raw: str):
+        """分发连接上收到的消息"""
+        if self.on_raw_frame:
+            try:
+                self.on_raw_frame(raw)
+            except Exception as e:
+                logging.debug(f"录制原始帧失败: {e}")
+
+        parsed = parse_ws_message(raw)
+        if parsed is None:
+            return
+
+        user, event = parsed
+        address = self._canonical.get(user, user)
+        try:
+            self.on_event(address, event)
+        except Exception as e:
+            logging.error(f"处理 {address[:10]}... 的事件失败: {e}", exc_info=True)
+
+    def _handle_connection_lost(self, conn: PooledConnection):
+        """连接断开：移除连接，并通知其上所有地址失去订阅"""
+        with self._lock:
+            if self._connections.get(conn.conn_id) is not conn:
+                return
+            del self._connections[conn.conn_id]
+
+            orphaned = [addr for addr in conn.addresses if self._address_conn.get(addr) is conn]
+            for addr in orphaned:
+                del self._address_conn[addr]
+            running = self._running
+
+        if not running:
+            return
+
+        logging.warning(f"⚠️  连接池连接 #{conn.conn_id} 断开，影响 {len(orphaned)} 个地址")
+        if orphaned and self.on_disconnect:
+            try:
+                self.on_disconnect(orphaned)
+            except Exception as e:
+                logging.error(f"处理连接断开回调失败: {e}")
+
+    def _keepalive_loop(self):
+        """整个连接池共用一个心跳线程：定期发送心跳，并强制断开僵尸连接"""
+        while not self._stop_event.wait(self.HEALTH_CHECK_INTERVAL):
+            with self._lock:
+                connections = [c for c in self._connections.values() if c.connected]
+                connecting = [c for c in self._connections.values() if not c.opened.is_set()]
+
+            now = time.monotonic()
+            for conn in connecting:
+                if now - conn.created_at > self.connect_timeout:
+                    self._drop_stuck_connection(conn)
+
+            for conn in connections:
+                if conn.health.is_stale(now):
+                    logging.warning(
+                        f"🧟 连接池连接 #{conn.conn_id} 已 {conn.health.silence(now):.1f} 秒无消息，"
+                        f"判定为僵尸连接，强制重连 ({len(conn.addresses)} 个地址)"
+                    )
+                    conn.abort()
+                    continue
+
+                if conn.health.ping_due(now):
+                    try:
+                        conn.send({"method": "ping"})
+                        conn.health.mark_ping()
+                    except Exception as e:
+                        logging.debug(f"连接 #{conn.conn_id} 发送心跳失败: {e}")
@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+"""
+WebSocket流量录制与回放
+录制: 将每一帧原始消息连同接收时间追加写入 gzip 压缩的 JSON Lines 文件
+回放: 按 1x / Nx / 最大速度把录制的消息送入离线监控器的 _handle_user_event，统计吞吐和处理延迟
+     （离线监控器不访问网络：不维护账户数据，币种名称使用原始标识，通知不附带账户汇总）
+
+用法:
+    python3 ws_recorder.py recordings/20251021_120000.jsonl.gz --speed 10
+    python3 ws_recorder.py recordings/20251021_120000.jsonl.gz --speed max --quiet
+"""
+import argparse
+import gzip
+import json
+import logging
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterator, Optional, Tuple
+
+from monitor_utils import Config, setup_logging
+from monitor_whales import WhaleMonitor
+from ws_pool import parse_ws_message
+
+
+class TrafficRecorder:
+    """原始WebSocket帧录制器（线程安全，只追加）"""
+
+    # 刷盘间隔（秒）
+    FLUSH_INTERVAL = 1.0
+
+    def __init__(self, path: Optional[str] = None, record_dir: str = "recordings"):
+        """
+        Args:
+            path: 录制文件路径（为空时自动生成到 record_dir 目录）
+            record_dir: 录制文件目录
+        """
+        if not path:
+            record_path = Path(record_dir)
+            record_path.mkdir(parents=True, exist_ok=True)
+            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            path = str(record_path / f"{timestamp}.jsonl.gz")
+        else:
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+
+        self.path = path
+        self.frames = 0
+        self._lock = threading.Lock()
+        # 追加模式：每次启动写入一个新的 gzip 成员，读取时会被透明拼接
+        self._file = gzip.open(path, 'at', encoding='utf-8')
+        self._last_flush = time.monotonic()
+
+    def record(self, raw: str):
+        """追加一帧原始消息"""
+        line = json.dumps({'t': time.time(), 'frame': raw}, ensure_ascii=False)
+        with self._lock:
+            if self._file is None:
+                return
+            self._file.write(line + '\n')
+            self.frames += 1
+
+            now = time.monotonic()
+            if now - self._last_flush >= self.FLUSH_INTERVAL:
+                self._file.flush()
+                self._last_flush = now
+
+    def close(self):
+        """关闭录制文件"""
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+        logging.info(f"📼 已录制 {self.frames} 帧: {self.path}")
+
+
+class OfflineWhaleMonitor(WhaleMonitor):
+    """回放用的监控器：只运行成交处理链路（去重、仓位追踪、交易识别、通知格式），不访问网络"""
+
+    track_accounts = False
+
+    def _get_rest_info(self):
+        raise RuntimeError("离线回放不访问API")
+
+    def _get_coin_name(self, coin_id: str) -> str:
+        """币种名称：只使用已缓存的名称，否则直接使用原始标识（如 @107）"""
+        return self.asset_name_cache.get(coin_id, coin_id)
+
+    def _get_account_summary(self, user_addr: str) -> Optional[Dict]:
+        return None
+
+    def http_requests(self) -> int:
+        """已发出的 /info 请求数（离线回放应始终为 0）"""
+        return sum(s['count'] for s in self.http_client.latency.snapshot().values())
+
+
+def iter_recording(path: str) -> Iterator[Tuple[float, str]]:
+    """逐条读取录制文件
+
+    Yields:
+        (接收时间戳, 原始帧)
+    """
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError:
+                # 进程异常退出时最后一行可能不完整
+                logging.debug(f"跳过无法解析的录制行: {line[:100]}")
+                continue
+            yield record['t'], record['frame']
+
+
+def _percentile(sorted_values, pct: float) -> float:
+    """计算已排序列表的百分位数"""
+    if not sorted_values:
+        return 0.0
+    idx = min(len(sorted_values) - 1, int(len(sorted_values) * pct / 100))
+    return sorted_values[idx]
+
+
+def replay(path: str, monitor, speed: Optional[float] = 1.0) -> Dict:
+    """回放录制文件
+
+    Args:
+        path: 录制文件路径
+        monitor: OfflineWhaleMonitor 实例（事件送入其 _handle_user_event）
+        speed: 回放倍速，None 表示不等待、以最大速度回放
+
+    Returns:
+        回放统计：帧数、事件数、耗时、吞吐、处理延迟分位数（毫秒）
+
+    Raises:
+        RuntimeError: 回放过程中发出了 /info 请求
+    """
+    frames = 0
+    events = 0
+    fills = 0
+    latencies = []
+
+    replay_start = time.perf_counter()
+    first_ts = None
+
+    for ts, raw in iter_recording(path):
+        frames += 1
+
+        if first_ts is None:
+            first_ts = ts
+            # 与实时监控一致：录制开始之前的成交（订阅快照中的历史成交）不作为新交易
+            for address in monitor.addresses:
+                monitor.fill_watermarks.touch(address, int(first_ts * 1000))
+
+        # 按录制时的时间间隔（除以倍速）对齐
+        if speed:
+            target = (ts - first_ts) / speed
+            delay = target - (time.perf_counter() - replay_start)
+            if delay > 0:
+                time.sleep(delay)
+
+        parsed = parse_ws_message(raw)
+        if parsed is None:
+            continue
+
+        address, event = parsed
+        events += 1
+        fills += len(event['data'].get('fills', []))
+
+        started = time.perf_counter()
+        monitor._handle_user_event(address, event)
+        latencies.append((time.perf_counter() - started) * 1000)
+
+    elapsed = time.perf_counter() - replay_start
+    latencies.sort()
+
+    if monitor.http_requests():
+        raise RuntimeError(f"回放过程中发出了 {monitor.http_requests()} 个 /info 请求")
+
+    return {
+        'frames': frames,
+        'events': events,
+        'fills': fills,
+        'elapsed': elapsed,
+        'events_per_sec': events / elapsed if elapsed > 0 else 0.0,
+        'fills_per_sec': fills / elapsed if elapsed > 0 else 0.0,
+        'latency_p50_ms': _percentile(latencies, 50),
+        'latency_p95_ms': _percentile(latencies, 95),
+        'latency_p99_ms': _percentile(latencies, 99),
+        'latency_max_ms': latencies[-1] if latencies else 0.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="回放录制的WebSocket流量")
+    parser.add_argument('recording', help="录制文件路径 (.jsonl.gz)")
+    parser.add_argument('--speed', default='1', help="回放倍速，如 1、10，或 max 表示最大速度")
+    parser.add_argument('--quiet', action='store_true', help="关闭控制台通知，只统计吞吐和延迟")
+    parser.add_argument('--config', default="jsons/config.json", help="配置文件路径")
+    args = parser.parse_args()
+
+    config = Config(args.config)
+    if args.quiet:
+        config.config.setdefault('notification', {})['console'] = False
+    setup_logging(log_suffix="_replay", debug=config.get('debug', default=False))
+    if args.quiet:
+        logging.getLogger().setLevel(logging.WARNING)
+
+    speed = None if args.speed == 'max' else float(args.speed)
+
+    # 录制中出现的地址即为回放时的监控地址
+    addresses = sorted({
+        parsed[0] for _, raw in iter_recording(args.recording)
+        for parsed in [parse_ws_message(raw)] if parsed
+    })
+    config.config.setdefault('monitor', {})['max_addresses'] = max(len(addresses), 1)
+
+    monitor = OfflineWhaleMonitor(addresses, config)
+
+    stats = replay(args.recording, monitor, speed)
+
+    print(f"\n{'='*80}")
+    print(f"📼 回放完成: {args.recording} (倍速: {args.speed})")
+    print(f"{'='*80}")
+    print(f"帧数: {stats['frames']} | 事件数: {stats['events']} | 成交数: {stats['fills']}")
+    print(f"耗时: {stats['elapsed']:.2f}秒 | 吞吐: {stats['events_per_sec']:,.1f} 事件/秒, {stats['fills_per_sec']:,.1f} 成交/秒")
+    print(
+        f"处理延迟: p50 {stats['latency_p50_ms']:.3f}ms | p95 {stats['latency_p95_ms']:.3f}ms | "
+        f"p99 {stats['latency_p99_ms']:.3f}ms | max {stats['latency_max_ms']:.3f}ms"
+    )
+    print(f"{'='*80}\n")
+
+
+if __name__ == "__main__":
+    main()